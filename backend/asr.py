@@ -0,0 +1,199 @@
+import abc
+import asyncio
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from threadpool import run_blocking
+
+# ASR engines behind a common interface. upload_chunk, async jobs and the
+# stream endpoint all call asr.transcribe(); ASR_BACKEND picks the engine per
+# deployment:
+#
+#   openai  hosted whisper-1 (default)
+#   local   Whisper on CPU via transformers, int8-quantized, with concurrent
+#           same-language segments batched into one inference call, and
+#           audio longer than Whisper's 30 s window decoded window by window
+#
+# `model` is part of the transcript cache key, so switching engines never
+# serves another engine's text.
+
+
+class ASRBackend(abc.ABC):
+    name = "base"
+    model = ""
+
+    @abc.abstractmethod
+    async def transcribe(
+        self, audio: bytes, filename: str, content_type: str, language_code: str
+    ) -> Optional[str]:
+        ...
+
+    async def warmup(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class OpenAIWhisperBackend(ASRBackend):
+    name = "openai"
+
+    def __init__(self, model: str = "whisper-1", timeout_s: float = 120.0, max_retries: int = 2):
+        self.model = model
+        self.timeout_s = timeout_s
+        self.max_retries = max_retries
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        # Built on first use (warmup() in the app lifespan) on a pooled, metered
+        # httpx client
+        with self._client_lock:
+            if self._client is None:
+                from openai import OpenAI
+
+                import http_pool
+
+                self._client = OpenAI(
+                    api_key=os.environ["OPENAI_API_KEY"],
+                    http_client=http_pool.make_client("openai", self.timeout_s),
+                    max_retries=self.max_retries,
+                )
+            return self._client
+
+    def _transcribe(self, audio: bytes, filename: str, content_type: str, language_code: str):
+        # The SDK accepts a (filename, bytes, content_type) tuple, so the audio goes
+        # to Whisper straight from memory. The extension tells Whisper the container.
+        transcription = self.client.audio.transcriptions.create(
+            model=self.model,
+            file=(filename, audio, content_type),
+            language=language_code,
+        )
+        return getattr(transcription, "text", None)
+
+    async def transcribe(self, audio, filename, content_type, language_code):
+        return await run_blocking(self._transcribe, audio, filename, content_type, language_code)
+
+    async def warmup(self):
+        # Imports the SDK and opens a keep-alive connection, so the first chunk
+        # skips both
+        await run_blocking(self.client.models.retrieve, self.model)
+
+    async def close(self):
+        if self._client is not None:
+            await run_blocking(self._client.close)
+            self._client = None
+
+
+WHISPER_WINDOW_S = 30
+
+
+class LocalWhisperBackend(ASRBackend):
+    name = "local"
+
+    def __init__(
+        self,
+        model_name: str = "openai/whisper-small",
+        batch_size: int = 8,
+        batch_wait_ms: int = 50,
+        quantize: bool = True,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.batch_wait_s = batch_wait_ms / 1000
+        self.quantize = quantize
+        self.model = f"local:{model_name}{':int8' if quantize else ''}"
+
+        self._pipe = None
+        self._load_lock = threading.Lock()
+        # One inference at a time; torch already spreads a batch over every core
+        self._infer_lock = threading.Lock()
+        self._pending: Dict[str, List[Tuple[bytes, asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}  # flush deadline of each pending batch
+
+    def _load(self):
+        with self._load_lock:
+            if self._pipe is None:
+                import torch
+                from transformers import pipeline
+
+                pipe = pipeline("automatic-speech-recognition", model=self.model_name, device="cpu")
+                if self.quantize:
+                    pipe.model = torch.quantization.quantize_dynamic(
+                        pipe.model, {torch.nn.Linear}, dtype=torch.qint8
+                    )
+                self._pipe = pipe
+        return self._pipe
+
+    def _infer(self, audios: List[bytes], language_code: str) -> List[Optional[str]]:
+        pipe = self._load()
+        with self._infer_lock:
+            # The pipeline decodes raw container bytes with ffmpeg. Segments up
+            # to SPLIT_THRESHOLD_MS (45 s) reach here unsplit, so anything over
+            # Whisper's 30 s window is chunked instead of truncated; batch_size
+            # counts windows across the whole call
+            outputs = pipe(
+                list(audios),
+                chunk_length_s=WHISPER_WINDOW_S,
+                batch_size=self.batch_size,
+                generate_kwargs={"language": language_code.split("-")[0], "task": "transcribe"},
+            )
+        return [(o.get("text") or "").strip() or None for o in outputs]
+
+    async def warmup(self):
+        await run_blocking(self._load)
+
+    async def transcribe(self, audio, filename, content_type, language_code):
+        # Requests for the same language that arrive within batch_wait_ms share
+        # one inference call (up to batch_size)
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        batch = self._pending.setdefault(language_code, [])
+        batch.append((audio, fut))
+        if len(batch) >= self.batch_size:
+            self._flush(language_code)
+        elif len(batch) == 1:
+            self._timers[language_code] = loop.call_later(self.batch_wait_s, self._flush, language_code)
+        return await fut
+
+    def _flush(self, language_code: str):
+        # A batch flushed by size takes its timer with it, so the timer cannot
+        # cut the next batch short
+        timer = self._timers.pop(language_code, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(language_code, None)
+        if batch:
+            asyncio.ensure_future(self._run_batch(language_code, batch))
+
+    async def _run_batch(self, language_code: str, batch: List[Tuple[bytes, asyncio.Future]]):
+        try:
+            texts = await run_blocking(self._infer, [audio for audio, _ in batch], language_code)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), text in zip(batch, texts):
+            if not fut.done():
+                fut.set_result(text)
+
+
+def create_asr_backend() -> ASRBackend:
+    kind = os.getenv("ASR_BACKEND", "openai")
+    if kind == "openai":
+        return OpenAIWhisperBackend(
+            model=os.getenv("OPENAI_ASR_MODEL", "whisper-1"),
+            timeout_s=float(os.getenv("OPENAI_TIMEOUT_S", "120")),
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "2")),
+        )
+    if kind == "local":
+        return LocalWhisperBackend(
+            model_name=os.getenv("LOCAL_ASR_MODEL", "openai/whisper-small"),
+            batch_size=int(os.getenv("LOCAL_ASR_BATCH_SIZE", "8")),
+            batch_wait_ms=int(os.getenv("LOCAL_ASR_BATCH_WAIT_MS", "50")),
+            quantize=os.getenv("LOCAL_ASR_QUANTIZE", "1") == "1",
+        )
+    raise ValueError(f"Unknown ASR_BACKEND: {kind}")
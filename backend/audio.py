@@ -0,0 +1,162 @@
+import io
+import subprocess
+import wave
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Audio helpers built on the ffmpeg CLI. Everything goes through pipes, so
+# decoding never touches the filesystem. Decoded audio is 16 kHz mono int16,
+# the format Whisper works in.
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+
+
+class AudioDecodeError(Exception):
+    pass
+
+
+def _ffmpeg(args, data: bytes) -> bytes:
+    try:
+        proc = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", *args],
+            input=data,
+            capture_output=True,
+            check=True,
+        )
+    except FileNotFoundError as e:
+        raise AudioDecodeError("ffmpeg not found") from e
+    except subprocess.CalledProcessError as e:
+        raise AudioDecodeError(e.stderr.decode(errors="replace").strip() or "ffmpeg failed") from e
+    return proc.stdout
+
+
+def decode_pcm(blob: bytes) -> np.ndarray:
+    out = _ffmpeg(["-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"], blob)
+    return np.frombuffer(out, dtype=np.int16)
+
+
+_PCM_IN = ["-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-i", "pipe:0"]
+
+
+# Same samples in, same bytes out (no random Ogg stream serial, no encoder
+# version tag), so content-addressed storage sees repeats as one object
+_BITEXACT = ["-fflags", "+bitexact", "-flags:a", "+bitexact"]
+
+
+def encode_opus(samples: np.ndarray, bitrate: str = "24k") -> bytes:
+    # Ogg/Opus tuned for speech: compact enough for archival and accepted by Whisper
+    return _ffmpeg(
+        [*_PCM_IN, "-c:a", "libopus", "-b:a", bitrate, "-application", "voip", *_BITEXACT, "-f", "ogg", "pipe:1"],
+        samples.astype(np.int16).tobytes(),
+    )
+
+
+def encode_flac(samples: np.ndarray) -> bytes:
+    return _ffmpeg([*_PCM_IN, "-c:a", "flac", "-compression_level", "8", *_BITEXACT, "-f", "flac", "pipe:1"],
+                   samples.astype(np.int16).tobytes())
+
+
+def encode_wav(samples: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(samples.astype(np.int16).tobytes())
+    return buf.getvalue()
+
+
+def duration_ms(samples: np.ndarray) -> int:
+    return int(len(samples) * 1000 / SAMPLE_RATE)
+
+
+def frame_energy_db(samples: np.ndarray, frame_ms: int = FRAME_MS) -> np.ndarray:
+    """RMS level in dBFS of each consecutive frame_ms frame."""
+    frame = SAMPLE_RATE * frame_ms // 1000
+    n = len(samples) // frame
+    if n == 0:
+        return np.zeros(0)
+    frames = samples[: n * frame].astype(np.float32).reshape(n, frame) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def detect_speech(
+    samples: np.ndarray,
+    threshold_db: float = -45.0,
+    min_speech_ms: int = 250,
+    pad_ms: int = 200,
+) -> Optional[Tuple[int, int]]:
+    """Energy-based VAD. Returns (start_sample, end_sample) around the speech,
+    padded by pad_ms, or None when there is less than min_speech_ms of it."""
+    energy = frame_energy_db(samples)
+    if len(energy) == 0:
+        return None
+
+    # A frame is speech if it clears the absolute floor and sits well above the
+    # chunk's own noise floor. The relative part is capped below the loudest
+    # frame so continuous speech (no quiet frames) still counts.
+    noise_floor = float(np.percentile(energy, 10))
+    threshold = max(threshold_db, min(noise_floor + 10, float(energy.max()) - 10))
+    voiced = np.flatnonzero(energy > threshold)
+    if len(voiced) * FRAME_MS < min_speech_ms:
+        return None
+
+    frame = SAMPLE_RATE * FRAME_MS // 1000
+    pad = SAMPLE_RATE * pad_ms // 1000
+    return max(0, int(voiced[0]) * frame - pad), min(len(samples), (int(voiced[-1]) + 1) * frame + pad)
+
+
+@dataclass
+class PreparedAudio:
+    duration_ms: int
+    speech: Optional[Tuple[int, int]]  # None when VAD found no speech
+    asr_samples: Optional[np.ndarray] = None  # what ASR should hear: the speech span or the whole chunk
+    trimmed_ms: int = 0  # silence cut from asr_samples
+    archive: Optional[bytes] = None  # Ogg/Opus of the whole chunk, when transcoding
+    asr_audio: Optional[bytes] = None  # encoded asr_samples, when they differ from the upload
+    asr_format: str = "wav"  # container of asr_audio: wav | flac | ogg
+
+
+def prepare_audio(
+    blob: bytes,
+    vad: bool = True,
+    threshold_db: float = -45.0,
+    min_speech_ms: int = 250,
+    min_trim_ms: int = 1000,
+    transcode: bool = False,
+    asr_format: str = "flac",
+    archive_bitrate: str = "24k",
+) -> PreparedAudio:
+    """Decode once, run VAD and, optionally, transcode for storage and ASR.
+    CPU-bound; the backend runs it in a process pool."""
+    samples = decode_pcm(blob)
+    total_ms = duration_ms(samples)
+
+    speech = (0, len(samples))
+    if vad:
+        speech = detect_speech(samples, threshold_db=threshold_db, min_speech_ms=min_speech_ms)
+        if speech is None:
+            return PreparedAudio(duration_ms=total_ms, speech=None)
+
+    start, end = speech
+    trimmed_ms = total_ms - duration_ms(samples[start:end])
+    if trimmed_ms >= min_trim_ms:
+        asr_samples = samples[start:end]
+    else:
+        asr_samples, trimmed_ms = samples, 0
+
+    prepared = PreparedAudio(duration_ms=total_ms, speech=speech, asr_samples=asr_samples, trimmed_ms=trimmed_ms)
+    if transcode:
+        prepared.archive = encode_opus(samples, archive_bitrate)
+        if asr_format == "ogg":
+            prepared.asr_audio = encode_opus(asr_samples, archive_bitrate) if trimmed_ms else prepared.archive
+        else:
+            prepared.asr_audio = encode_flac(asr_samples) if asr_format == "flac" else encode_wav(asr_samples)
+        prepared.asr_format = asr_format
+    elif trimmed_ms:
+        prepared.asr_audio = encode_wav(asr_samples)
+    return prepared
@@ -0,0 +1,97 @@
+"""
+Compare ASR backends on the evaluate_trials.py trials.
+
+Expects the trial audio exported as one file per segment:
+
+    <audio_dir>/<trial_key>/<start_ms>-<end_ms>-<lang>.<ext>
+
+where trial_key matches a key of evaluate_trials.TRIALS (e.g.
+trial_3_sentence_switch/0-8120-en.webm). For each backend, every segment of
+every trial is submitted concurrently (so the local engine can batch
+same-language segments), the tagged [EN]/[ZH] hypothesis is rebuilt in
+start_ms order and scored against the trial's reference.
+
+    cd backend && python bench/asr_backends.py /path/to/trial_audio --backends openai local
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve()
+sys.path.insert(0, str(HERE.parent.parent))
+sys.path.insert(0, str(HERE.parent.parent.parent))
+
+from evaluate_trials import TRIALS, fmt, score_trial  # noqa: E402
+
+CONTENT_TYPES = {".webm": "audio/webm", ".ogg": "audio/ogg", ".wav": "audio/wav", ".mp3": "audio/mpeg"}
+
+
+def load_segments(audio_dir: Path):
+    trials = {}
+    for trial_dir in sorted(p for p in audio_dir.iterdir() if p.is_dir()):
+        if trial_dir.name not in TRIALS:
+            print("skipping unknown trial:", trial_dir.name)
+            continue
+        segs = []
+        for f in trial_dir.iterdir():
+            start_ms, end_ms, lang = f.stem.split("-", 2)
+            segs.append((int(start_ms), int(end_ms), lang, f))
+        trials[trial_dir.name] = sorted(segs)
+    return trials
+
+
+async def run_backend(backend, trials):
+    async def one(start_ms, end_ms, lang, path):
+        t0 = time.perf_counter()
+        text = await backend.transcribe(
+            path.read_bytes(), path.name, CONTENT_TYPES.get(path.suffix, "application/octet-stream"), lang
+        )
+        return text, time.perf_counter() - t0
+
+    await backend.warmup()
+    # Every segment of every trial at once, so a batching engine sees real concurrency
+    flat = [(key, seg) for key, segs in trials.items() for seg in segs]
+    t0 = time.perf_counter()
+    outs = await asyncio.gather(*(one(*seg) for _, seg in flat))
+    wall = time.perf_counter() - t0
+
+    results = {}
+    for (key, seg), out in zip(flat, outs):
+        results.setdefault(key, []).append((seg, out))
+    return results, wall
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("audio_dir", type=Path)
+    ap.add_argument("--backends", nargs="+", default=["openai", "local"])
+    args = ap.parse_args()
+
+    from asr import create_asr_backend
+
+    trials = load_segments(args.audio_dir)
+    audio_s = sum((end - start) / 1000 for segs in trials.values() for start, end, _, _ in segs)
+    n_segments = sum(len(segs) for segs in trials.values())
+    print(f"{len(trials)} trials, {n_segments} segments, {audio_s:.1f}s of audio\n")
+
+    print("backend | model | wall_s | RTF | mean_seg_latency_s | trial | wer_mixed | chrf_mixed | chrf_zh_only")
+    for kind in args.backends:
+        os.environ["ASR_BACKEND"] = kind
+        backend = create_asr_backend()
+        results, wall = asyncio.run(run_backend(backend, trials))
+        latencies = [lat for rows in results.values() for _, (_, lat) in rows]
+        for key, rows in results.items():
+            hyp = "\n".join(f"[{lang[:2].upper()}] {text or ''}" for (_, _, lang, _), (text, _) in rows)
+            s = score_trial(TRIALS[key]["reference"], hyp, key)
+            print(
+                f"{kind} | {backend.model} | {wall:.1f} | {wall / audio_s:.3f} | "
+                f"{sum(latencies) / len(latencies):.2f} | {key} | {fmt(s['wer_mixed'])} | "
+                f"{fmt(s['chrf_mixed'])} | {fmt(s['chrf_zh_only'])}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Overload test for ASR admission control: a few sessions dump a backlog of
+chunks at once while steady sessions keep uploading one chunk at a time, and
+the provider allows STUB_ASR_RATE_PER_MIN requests.
+
+Runs the backend in front of bench/stub_services.py twice: with every ASR
+call going straight to the provider (the behaviour before scheduler.py),
+and through the scheduler paced to 90% of the provider quota (pacing right at
+the quota races the provider's own bucket). Reports, per kind of
+session, how requests ended (200 / 429 / 500) and the latency of each
+outcome.
+
+    cd backend && python bench/asr_overload.py --burst-sessions 3 --burst-chunks 60
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Random bytes are not decodable audio; skip the decode attempt
+os.environ.setdefault("VAD_ENABLED", "0")
+os.environ.setdefault("TRANSCRIPT_CACHE_DB", ":memory:")
+os.environ.setdefault("STUB_ASR_LATENCY_S", "0.8")
+os.environ.setdefault("STUB_STORAGE_LATENCY_S", "0.05")
+os.environ.setdefault("STUB_DB_LATENCY_S", "0.01")
+os.environ.setdefault("STUB_ASR_RATE_PER_MIN", "600")
+
+import httpx  # noqa: E402
+
+import stub_services  # noqa: E402
+
+STUB_PORT = 9100
+APP_PORT = 9101
+
+
+class Unscheduled:
+    # Every call straight to the provider
+    async def run(self, session_id, call, background=False):
+        return await call()
+
+
+async def post(http, results, kind: str, sid: str, i: int, audio: bytes):
+    meta = {"session_id": sid, "language_code": "en", "start_ms": i * 1000, "end_ms": i * 1000 + 900}
+    t0 = time.perf_counter()
+    res = await http.post(
+        "/api/upload-chunk",
+        data={"metadata_json": json.dumps(meta)},
+        files={"file": (f"segment-{i}.webm", audio, "audio/webm")},
+    )
+    results[kind][res.status_code].append(time.perf_counter() - t0)
+    return res
+
+
+async def load(base: str, args, tag: str) -> dict:
+    results = defaultdict(lambda: defaultdict(list))
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=1000)
+    async with httpx.AsyncClient(base_url=base, timeout=600, limits=limits) as http:
+        async def burst(s: int):
+            sid = f"{tag}-burst-{s}"
+            await asyncio.gather(*(
+                post(http, results, "burst", sid, i, os.urandom(args.audio_bytes)) for i in range(args.burst_chunks)
+            ))
+
+        async def steady(s: int):
+            # One chunk every interval, the next only after the previous answer
+            # (or after Retry-After, on a 429), like a live recorder
+            sid = f"{tag}-steady-{s}"
+            deadline = time.perf_counter() + args.duration_s
+            i = 0
+            while time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                res = await post(http, results, "steady", sid, i, os.urandom(args.audio_bytes))
+                i += 1
+                pause = float(res.headers.get("retry-after", 0)) if res.status_code == 429 else 0
+                await asyncio.sleep(max(pause, args.interval_s - (time.perf_counter() - t0)))
+
+        await asyncio.gather(
+            *(burst(s) for s in range(args.burst_sessions)),
+            *(steady(s) for s in range(args.steady_sessions)),
+        )
+    return results
+
+
+def pct(xs, q: float) -> float:
+    return statistics.quantiles(xs, n=100, method="inclusive")[q - 1] if len(xs) > 1 else (xs[0] if xs else float("nan"))
+
+
+def report(label: str, results: dict, elapsed: float):
+    print(f"\n{label}  ({elapsed:.1f}s, provider calls={stub_services.calls['asr']}, "
+          f"provider 429s={stub_services.calls['asr_rate_limited']})")
+    print(f"  {'sessions':<8}{'status':>7}{'count':>7}{'p50 s':>8}{'p95 s':>8}{'max s':>8}")
+    for kind in ("burst", "steady"):
+        for status in sorted(results[kind]):
+            xs = results[kind][status]
+            print(f"  {kind:<8}{status:>7}{len(xs):>7}{pct(xs, 50):8.2f}{pct(xs, 95):8.2f}{max(xs):8.2f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--burst-sessions", type=int, default=3)
+    ap.add_argument("--burst-chunks", type=int, default=60)
+    ap.add_argument("--steady-sessions", type=int, default=8)
+    ap.add_argument("--interval-s", type=float, default=2.0)
+    ap.add_argument("--duration-s", type=float, default=20.0)
+    ap.add_argument("--audio-bytes", type=int, default=16_000)
+    args = ap.parse_args()
+
+    stub_services.point_backend_at_stub(STUB_PORT)
+    stub_services.serve_in_thread(stub_services.stub, STUB_PORT)
+    import main as backend  # noqa: E402
+    from scheduler import AsrScheduler  # noqa: E402
+    stub_services.serve_in_thread(backend.app, APP_PORT)
+    base = f"http://127.0.0.1:{APP_PORT}"
+    rate = stub_services.ASR_RATE_PER_MIN
+    paced = 0.9 * rate
+    print(f"provider: {rate:.0f} req/min, {stub_services.ASR_LATENCY_S}s per call; "
+          f"{args.burst_sessions}x{args.burst_chunks} burst chunks, {args.steady_sessions} steady sessions "
+          f"every {args.interval_s}s for {args.duration_s}s")
+
+    configs = {
+        "unscheduled": Unscheduled(),
+        f"scheduled (ASR_RATE_PER_MIN={paced:.0f})": AsrScheduler(
+            max_concurrency=16, per_session=4, rate_per_s=paced / 60, max_wait_s=10,
+        ),
+    }
+    for label, scheduler in configs.items():
+        stub_services.reset()
+        backend.asr_scheduler = scheduler
+        t0 = time.perf_counter()
+        results = asyncio.run(load(base, args, label.split()[0]))
+        report(label, results, time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    main()
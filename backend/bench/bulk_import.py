@@ -0,0 +1,103 @@
+"""
+Import N segments one request at a time vs. in one /api/upload-chunks call.
+
+Runs the backend in front of bench/stub_services.py. Single uploads use a
+client that keeps a few requests in flight (like a mobile client catching
+up); the bulk import should finish in about
+ceil(N / min(BULK_CONCURRENCY, ASR_MAX_CONCURRENCY)) ASR round-trips.
+
+    cd backend && python bench/bulk_import.py --segments 200
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Random bytes are not decodable audio; skip the decode attempt
+os.environ.setdefault("VAD_ENABLED", "0")
+os.environ.setdefault("TRANSCRIPT_CACHE_DB", ":memory:")
+
+import httpx  # noqa: E402
+
+import stub_services  # noqa: E402
+
+STUB_PORT = 9100
+APP_PORT = 9101
+
+
+def items(session_id: str, n: int, offset: int, audio_bytes: int):
+    for i in range(n):
+        start = (offset + i) * 1000
+        meta = {"session_id": session_id, "language_code": "en" if i % 2 else "zh", "start_ms": start, "end_ms": start + 900}
+        yield meta, os.urandom(audio_bytes)
+
+
+async def single(base: str, batch, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base, timeout=300) as http:
+        async def one(i, meta, audio):
+            async with sem:
+                res = await http.post(
+                    "/api/upload-chunk",
+                    data={"metadata_json": json.dumps(meta)},
+                    files={"file": (f"segment-{i}.webm", audio, "audio/webm")},
+                )
+                res.raise_for_status()
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i, m, a) for i, (m, a) in enumerate(batch)))
+        return time.perf_counter() - t0
+
+
+async def bulk(base: str, batch) -> float:
+    async with httpx.AsyncClient(base_url=base, timeout=300) as http:
+        t0 = time.perf_counter()
+        res = await http.post(
+            "/api/upload-chunks",
+            data={"metadata_json": json.dumps([m for m, _ in batch])},
+            files=[("files", (f"segment-{i}.webm", a, "audio/webm")) for i, (_, a) in enumerate(batch)],
+        )
+        res.raise_for_status()
+        body = res.json()
+        assert body["failed"] == 0, body
+        return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--segments", type=int, default=200)
+    ap.add_argument("--client-concurrency", type=int, default=4)
+    ap.add_argument("--audio-bytes", type=int, default=32_000)
+    args = ap.parse_args()
+
+    stub_services.point_backend_at_stub(STUB_PORT)
+    stub_services.serve_in_thread(stub_services.stub, STUB_PORT)
+    import main as backend  # noqa: E402
+    stub_services.serve_in_thread(backend.app, APP_PORT)
+    base = f"http://127.0.0.1:{APP_PORT}"
+    sid = "00000000-0000-0000-0000-000000000001"
+
+    stub_services.reset()
+    t_single = asyncio.run(single(base, list(items(sid, args.segments, 0, args.audio_bytes)), args.client_concurrency))
+    single_calls = dict(stub_services.calls)
+
+    stub_services.reset()
+    t_bulk = asyncio.run(bulk(base, list(items(sid, args.segments, args.segments, args.audio_bytes))))
+    bulk_calls = dict(stub_services.calls)
+
+    parallel = min(backend.BULK_CONCURRENCY, backend.asr_scheduler.max_concurrency)
+    floor = math.ceil(args.segments / parallel) * stub_services.ASR_LATENCY_S
+    print(f"{args.segments} segments, stub asr={stub_services.ASR_LATENCY_S}s storage={stub_services.STORAGE_LATENCY_S}s db={stub_services.DB_LATENCY_S}s")
+    print(f"single uploads (client concurrency {args.client_concurrency}): {t_single:6.2f}s  db calls={single_calls['db']}")
+    print(f"bulk upload (BULK_CONCURRENCY {backend.BULK_CONCURRENCY}):       {t_bulk:6.2f}s  db calls={bulk_calls['db']}"
+          f"  (ASR-bound floor ~{floor:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Storage uploads and bytes with STORAGE_LAYOUT=session vs cas, as the share
+of duplicate audio grows, plus a cleanup pass after the sessions are deleted.
+
+Runs the backend in front of bench/stub_services.py. Each duplicate is an
+earlier clip uploaded again in another session under the other language
+(a re-recorded take, a client retry after its key changed), so the
+transcript cache misses and the upload reaches storage. Each clip is
+duplicated at most once, so the rate is capped at 0.5.
+
+    cd backend && python bench/cas_dedup.py --segments 200 --dup-rates 0,0.25,0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Random bytes are not decodable audio; skip the decode attempt
+os.environ.setdefault("VAD_ENABLED", "0")
+os.environ.setdefault("TRANSCRIPT_CACHE_DB", ":memory:")
+os.environ.setdefault("STUB_ASR_LATENCY_S", "0.01")
+os.environ.setdefault("STUB_STORAGE_LATENCY_S", "0.01")
+os.environ.setdefault("STUB_DB_LATENCY_S", "0.005")
+
+import httpx  # noqa: E402
+
+import stub_services  # noqa: E402
+from cache import TranscriptCache  # noqa: E402
+
+STUB_PORT = 9100
+APP_PORT = 9101
+ORIGINALS = "00000000-0000-0000-0000-00000000000a"
+DUPLICATES = "00000000-0000-0000-0000-00000000000b"
+
+
+def workload(n: int, dup_rate: float, audio_bytes: int, seed: int):
+    """(meta, audio) in upload order; the same for both layouts."""
+    rng = random.Random(seed)
+    dups_left = int(n * dup_rate)
+    originals, unused, out = [], [], []
+    for i in range(n):
+        # Duplicates spread at random through the stream, each after its original
+        dup = bool(unused) and rng.random() < dups_left / (n - i)
+        if dup:
+            dups_left -= 1
+            lang, audio = originals[unused.pop(rng.randrange(len(unused)))]
+            lang, sid = ("zh" if lang == "en" else "en"), DUPLICATES
+        else:
+            lang, audio = rng.choice(("en", "zh")), rng.randbytes(audio_bytes)
+            unused.append(len(originals))
+            originals.append((lang, audio))
+            sid = ORIGINALS
+        meta = {"session_id": sid, "language_code": lang, "start_ms": i * 1000, "end_ms": i * 1000 + 900}
+        out.append((meta, audio))
+    return out
+
+
+async def upload_all(base: str, items, concurrency: int):
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base, timeout=300) as http:
+        async def one(i, meta, audio):
+            async with sem:
+                res = await http.post(
+                    "/api/upload-chunk",
+                    data={"metadata_json": json.dumps(meta)},
+                    files={"file": (f"segment-{i}.webm", audio, "audio/webm")},
+                )
+                res.raise_for_status()
+
+        await asyncio.gather(*(one(i, m, a) for i, (m, a) in enumerate(items)))
+
+
+def run(backend, base: str, layout: str, items, concurrency: int) -> dict:
+    stub_services.reset()
+    backend.transcript_cache = TranscriptCache(db_path=":memory:")
+    backend.STORAGE_LAYOUT = layout
+    before = backend.metrics.snapshot()
+    asyncio.run(upload_all(base, items, concurrency))
+    after = backend.metrics.snapshot()
+    assert len(stub_services.tables["segments"]) == len(items)
+    return {
+        "uploads": after.get("storage_uploads", 0) - before.get("storage_uploads", 0),
+        "upload_bytes": after.get("storage_upload_bytes", 0) - before.get("storage_upload_bytes", 0),
+        "objects": len(stub_services.objects),
+    }
+
+
+def cleanup(backend) -> list:
+    """Delete the duplicates' session, then the originals'; objects left after
+    a cleanup pass following each."""
+    backend.CAS_GC_GRACE_S = 0
+    left = []
+    for sid in (DUPLICATES, ORIGINALS):
+        httpx.delete(f"http://127.0.0.1:{STUB_PORT}/rest/v1/segments", params={"session_id": f"eq.{sid}"}).raise_for_status()
+        asyncio.run(backend._collect_audio_objects())
+        left.append(len(stub_services.objects))
+    return left
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--segments", type=int, default=200)
+    ap.add_argument("--dup-rates", default="0,0.25,0.5")
+    ap.add_argument("--audio-bytes", type=int, default=32_000)
+    ap.add_argument("--client-concurrency", type=int, default=8)
+    args = ap.parse_args()
+
+    stub_services.point_backend_at_stub(STUB_PORT)
+    stub_services.serve_in_thread(stub_services.stub, STUB_PORT)
+    import main as backend  # noqa: E402
+    stub_services.serve_in_thread(backend.app, APP_PORT)
+    base = f"http://127.0.0.1:{APP_PORT}"
+
+    print(f"{args.segments} segments of {args.audio_bytes} bytes")
+    print(f"{'dup rate':>8}  {'layout':<8}{'uploads':>8}{'uploaded MB':>13}{'objects':>9}")
+    for rate in (float(r) for r in args.dup_rates.split(",")):
+        if not 0 <= rate <= 0.5:
+            ap.error("duplicate rates must be between 0 and 0.5")
+        items = workload(args.segments, rate, args.audio_bytes, seed=1)
+        results = {layout: run(backend, base, layout, items, args.client_concurrency) for layout in ("session", "cas")}
+        for layout, r in results.items():
+            print(f"{rate:8.2f}  {layout:<8}{r['uploads']:8.0f}{r['upload_bytes'] / 1e6:13.2f}{r['objects']:9d}")
+        s, c = results["session"], results["cas"]
+        print(f"{'':8}  cas saves {1 - c['uploads'] / s['uploads']:.0%} of uploads, "
+              f"{1 - c['upload_bytes'] / s['upload_bytes']:.0%} of bytes")
+
+    after_dups, after_all = cleanup(backend)
+    print(f"cleanup: {after_dups} objects left after deleting the duplicates' session, {after_all} after both")
+
+
+if __name__ == "__main__":
+    main()
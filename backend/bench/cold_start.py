@@ -0,0 +1,132 @@
+"""
+Cold start: time from launching a fresh backend process to its first
+successful /api/upload-chunk, as on a scale-from-zero request.
+
+Each run starts `uvicorn main:app` in a new process against
+bench/stub_services.py, polls /api/health until the port answers, then sends
+one real (ffmpeg-made) chunk, with VAD on as in production. The stub charges
+STUB_CONNECT_LATENCY_S (default 0.3s) on each new connection, standing in
+for DNS, TCP and TLS setup to Supabase and OpenAI. It reports the
+medians of:
+  listening    the port answers /api/health
+  ready        /api/ready returns 200 (n/a on trees without it)
+  first chunk  the first upload-chunk returns 200, sent as soon as the port answers
+  warm chunk   a second chunk in the same process, for reference
+
+--app-dir runs another checkout of backend/, e.g. a `git worktree` of an
+older commit, for a before/after comparison.
+
+    cd backend && python bench/cold_start.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("STUB_CONNECT_LATENCY_S", "0.3")
+
+import httpx  # noqa: E402
+
+import stub_services  # noqa: E402
+
+STUB_PORT = 9100
+APP_PORT = 9101
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def speech_chunk(seconds: float, seed: int) -> bytes:
+    # Pink-noise bursts with pauses in WebM/Opus, like a MediaRecorder chunk
+    src = (
+        f"anoisesrc=d={seconds}:c=pink:a=0.3:seed={seed},lowpass=f=3500,"
+        f"volume='if(lt(mod(t,4),3),1,0.01)':eval=frame"
+    )
+    return subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", src,
+         "-ac", "1", "-ar", "48000", "-c:a", "libopus", "-b:a", "32k", "-f", "webm", "pipe:1"],
+        capture_output=True, check=True,
+    ).stdout
+
+
+def upload(http: httpx.Client, run: int, index: int, audio: bytes) -> httpx.Response:
+    meta = {"session_id": f"cold-start-{run}", "language_code": "en",
+            "start_ms": index * 5000, "end_ms": index * 5000 + 4900}
+    return http.post(
+        "/api/upload-chunk",
+        data={"metadata_json": json.dumps(meta)},
+        files={"file": (f"segment-{index}.webm", audio, "audio/webm")},
+    )
+
+
+def one_run(app_dir: str, run: int, audio: list) -> dict:
+    env = dict(os.environ, TRANSCRIPT_CACHE_DB=":memory:", JOBS_DB_PATH=":memory:", PYTHONDONTWRITEBYTECODE="1")
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(APP_PORT), "--log-level", "warning"],
+        cwd=app_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    out = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=120) as http:
+            while True:
+                try:
+                    if http.get("/api/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if proc.poll() is not None:
+                    raise RuntimeError(f"backend exited with {proc.returncode}")
+                time.sleep(0.005)
+            out["listening"] = time.perf_counter() - t0
+
+            res = upload(http, run, 0, audio[0])
+            res.raise_for_status()
+            out["first chunk"] = time.perf_counter() - t0
+
+            while "ready" not in out:
+                res = http.get("/api/ready")
+                if res.status_code == 404:
+                    break
+                if res.status_code == 200:
+                    out["ready"] = time.perf_counter() - t0
+                time.sleep(0.005)
+
+            t1 = time.perf_counter()
+            upload(http, run, 1, audio[1]).raise_for_status()
+            out["warm chunk"] = time.perf_counter() - t1
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--chunk-s", type=float, default=5.0)
+    ap.add_argument("--app-dir", default=BACKEND_DIR, help="backend directory to start")
+    args = ap.parse_args()
+
+    stub_services.point_backend_at_stub(STUB_PORT)
+    stub_services.serve_in_thread(stub_services.stub, STUB_PORT)
+    # Two different chunks, so the second is not a transcript cache hit
+    audio = [speech_chunk(args.chunk_s, seed) for seed in (1, 2)]
+
+    runs = [one_run(os.path.abspath(args.app_dir), i, audio) for i in range(args.runs)]
+    print(f"{args.app_dir}: {args.runs} cold starts, {args.chunk_s:.0f}s chunk, stub asr={stub_services.ASR_LATENCY_S}s "
+          f"storage={stub_services.STORAGE_LATENCY_S}s db={stub_services.DB_LATENCY_S}s "
+          f"new connection={stub_services.CONNECT_LATENCY_S}s")
+    for name in ("listening", "ready", "first chunk", "warm chunk"):
+        xs = [r[name] for r in runs if name in r]
+        if not xs:
+            print(f"  {name:<12}     n/a")
+            continue
+        print(f"  {name:<12} {statistics.median(xs):7.2f}s   (min {min(xs):.2f}s, max {max(xs):.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Load benchmark for /api/upload-chunk against local stand-in services.
+
+Runs the backend in a single uvicorn worker (the production shape) in front
+of bench/stub_services.py and reports chunks/sec at increasing client
+concurrency. With a blocking pipeline throughput stays flat at roughly
+1 / (storage + ASR + DB latency); with the async pipeline it should scale
+with concurrency until the I/O pool (IO_WORKERS) saturates.
+
+Every chunk is fresh random audio and the transcript cache is kept in memory,
+so each upload goes through storage and ASR instead of hitting the cache.
+
+    cd backend && python bench/load_upload_chunk.py --chunks 64 --concurrency 1 2 4 8 16 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Random bytes are not decodable audio; skip the decode attempt
+os.environ.setdefault("VAD_ENABLED", "0")
+os.environ.setdefault("TRANSCRIPT_CACHE_DB", ":memory:")
+
+import httpx  # noqa: E402
+
+import stub_services  # noqa: E402
+
+STUB_PORT = 9100
+APP_PORT = 9101
+
+
+async def run_level(base: str, session_id: str, chunks: int, concurrency: int, audio_bytes: int, async_mode: bool) -> float:
+    sem = asyncio.Semaphore(concurrency)
+    audio = [os.urandom(audio_bytes) for _ in range(chunks)]
+
+    async with httpx.AsyncClient(base_url=base, timeout=120) as http:
+        async def one(i: int):
+            meta = {"session_id": session_id, "language_code": "en", "start_ms": i * 1000, "end_ms": i * 1000 + 900}
+            async with sem:
+                res = await http.post(
+                    "/api/upload-chunk",
+                    data={"metadata_json": json.dumps(meta), "async_mode": str(async_mode).lower()},
+                    files={"file": (f"segment-{i}.webm", audio[i], "audio/webm")},
+                )
+                res.raise_for_status()
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(chunks)))
+        return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=64)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    ap.add_argument("--audio-bytes", type=int, default=64_000)
+    ap.add_argument("--async-mode", action="store_true", help="measure time to response in async mode")
+    args = ap.parse_args()
+
+    stub_services.point_backend_at_stub(STUB_PORT)
+    stub_services.serve_in_thread(stub_services.stub, STUB_PORT)
+
+    import main as backend  # noqa: E402  (imported after env is pointed at the stub)
+    stub_services.serve_in_thread(backend.app, APP_PORT)
+
+    base = f"http://127.0.0.1:{APP_PORT}"
+    print(
+        f"stub latency: asr={stub_services.ASR_LATENCY_S}s storage={stub_services.STORAGE_LATENCY_S}s "
+        f"db={stub_services.DB_LATENCY_S}s, chunks per level={args.chunks}"
+    )
+    print("concurrency | seconds | chunks/sec")
+    for c in args.concurrency:
+        stub_services.reset()
+        elapsed = asyncio.run(run_level(base, "00000000-0000-0000-0000-000000000001", args.chunks, c, args.audio_bytes, args.async_mode))
+        print(f"{c:>11} | {elapsed:7.2f} | {args.chunks / elapsed:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
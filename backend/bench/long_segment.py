@@ -0,0 +1,83 @@
+"""
+Wall-clock ASR latency for one long segment, split vs. unsplit.
+
+Synthesises a speech-like signal (noise bursts separated by short pauses),
+then transcribes it through main._transcribe_audio against the stub
+services' fake ASR, whose latency grows with audio length
+(STUB_ASR_RTF). With splitting the latency should approach that of the
+longest sub-chunk rather than the whole segment.
+
+    cd backend && python bench/long_segment.py --minutes 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("STUB_ASR_RTF", "0.1")
+os.environ.setdefault("STUB_ASR_LATENCY_S", "0.3")
+os.environ.setdefault("TRANSCRIPT_CACHE_DB", ":memory:")
+
+import stub_services  # noqa: E402
+
+STUB_PORT = 9100
+
+
+def synth_speech(seconds: float, sr: int = 16000) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    out = np.zeros(int(seconds * sr), dtype=np.int16)
+    pos = 0
+    while pos < len(out):
+        burst = int(rng.uniform(1.5, 6.0) * sr)
+        pause = int(rng.uniform(0.2, 0.8) * sr)
+        out[pos:pos + burst] = (rng.standard_normal(min(burst, len(out) - pos)) * 4000).astype(np.int16)
+        pos += burst + pause
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--minutes", type=float, default=5.0)
+    args = ap.parse_args()
+
+    stub_services.point_backend_at_stub(STUB_PORT)
+    stub_services.serve_in_thread(stub_services.stub, STUB_PORT)
+    import main as backend  # noqa: E402
+    from audio import encode_wav
+
+    duration_ms = int(args.minutes * 60_000)
+    wav = encode_wav(synth_speech(args.minutes * 60))
+
+    async def timed():
+        t0 = time.perf_counter()
+        await backend._transcribe_audio(backend.AsrInput(wav, "segment.wav", "audio/wav"), "en", duration_ms)
+        return time.perf_counter() - t0
+
+    backend.SPLIT_THRESHOLD_MS = backend.SPLIT_THRESHOLD_BYTES = 10 ** 12
+    stub_services.reset()
+    unsplit = asyncio.run(timed())
+
+    backend.SPLIT_THRESHOLD_MS, backend.SPLIT_THRESHOLD_BYTES = 45_000, 8 * 1024 * 1024
+    stub_services.reset()
+    split = asyncio.run(timed())
+    n_chunks = stub_services.calls["asr"]
+
+    longest_chunk_s = stub_services.ASR_LATENCY_S + stub_services.ASR_RTF * (
+        backend.SPLIT_CHUNK_MS + 2 * backend.SPLIT_OVERLAP_MS
+    ) / 1000
+    print(f"{args.minutes:.1f} min segment, fake ASR = {stub_services.ASR_LATENCY_S}s + {stub_services.ASR_RTF} x audio")
+    print(f"unsplit: {unsplit:.2f}s")
+    print(
+        f"split:   {split:.2f}s over {n_chunks} sub-chunks, concurrency cap {backend.SPLIT_CONCURRENCY} "
+        f"(longest sub-chunk alone ~{longest_chunk_s:.2f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
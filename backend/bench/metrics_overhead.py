@@ -0,0 +1,62 @@
+"""
+Per-call cost of the metrics hooks on the chunk pipeline.
+
+A chunk records roughly ten stage timings and histogram observations; this
+times each hook in a tight loop and reports the per-chunk total next to a
+typical chunk latency.
+
+    cd backend && python bench/metrics_overhead.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+
+N = 200_000
+HOOKS_PER_CHUNK = 10
+
+
+def per_call(fn) -> float:
+    t0 = time.perf_counter()
+    for _ in range(N):
+        fn()
+    return (time.perf_counter() - t0) / N
+
+
+def stage():
+    with metrics.stage("asr", "en"):
+        pass
+
+
+def observe():
+    metrics.observe("chunk_request_bytes", 123_456, metrics.BYTES_BUCKETS)
+
+
+def render():
+    metrics.render()
+
+
+def main():
+    stage_s = per_call(stage)
+    observe_s = per_call(observe)
+    for lang in ("en", "zh"):
+        for name in ("read", "cache", "prepare", "storage", "asr", "db_lookup", "db_insert", "total"):
+            with metrics.stage(name, lang):
+                pass
+    t0 = time.perf_counter()
+    for _ in range(100):
+        render()
+    render_s = (time.perf_counter() - t0) / 100
+
+    per_chunk = HOOKS_PER_CHUNK * max(stage_s, observe_s)
+    print(f"stage():   {stage_s * 1e6:6.2f} us")
+    print(f"observe(): {observe_s * 1e6:6.2f} us")
+    print(f"per chunk (~{HOOKS_PER_CHUNK} hooks): {per_chunk * 1e6:6.1f} us = {per_chunk * 100:.4f}% of a 1 s chunk")
+    print(f"render() for a scrape: {render_s * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
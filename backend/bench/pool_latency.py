@@ -0,0 +1,96 @@
+"""
+Upload latency percentiles with pooled keep-alive connections vs. a new
+connection per outbound request (HTTP_MAX_KEEPALIVE=0), plus the pool
+stats from /api/stats.
+
+Each configuration runs in a fresh process, since http_pool reads its
+settings at import. Against the local stub a new connection costs a TCP
+handshake only; over TLS to Supabase/OpenAI the gap is larger.
+
+    cd backend && python bench/pool_latency.py --chunks 256 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("VAD_ENABLED", "0")
+os.environ.setdefault("TRANSCRIPT_CACHE_DB", ":memory:")
+
+STUB_PORT = 9100
+APP_PORT = 9101
+
+
+async def run(base: str, chunks: int, concurrency: int):
+    import httpx
+
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+    async with httpx.AsyncClient(base_url=base, timeout=300) as http:
+        async def one(i: int):
+            meta = {"session_id": "00000000-0000-0000-0000-000000000001", "language_code": "en",
+                    "start_ms": i * 1000, "end_ms": i * 1000 + 900}
+            async with sem:
+                t0 = time.perf_counter()
+                res = await http.post(
+                    "/api/upload-chunk",
+                    data={"metadata_json": json.dumps(meta)},
+                    files={"file": (f"segment-{i}.webm", os.urandom(16_000), "audio/webm")},
+                )
+                res.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+
+        await asyncio.gather(*(one(i) for i in range(chunks)))
+        pools = (await http.get("/api/stats")).json()["http_pools"]
+    return sorted(latencies), pools
+
+
+def child(chunks: int, concurrency: int):
+    import stub_services
+
+    stub_services.point_backend_at_stub(STUB_PORT)
+    stub_services.serve_in_thread(stub_services.stub, STUB_PORT)
+    import main as backend  # noqa: E402
+    stub_services.serve_in_thread(backend.app, APP_PORT)
+
+    lat, pools = asyncio.run(run(f"http://127.0.0.1:{APP_PORT}", chunks, concurrency))
+    pct = lambda p: lat[min(len(lat) - 1, int(p * len(lat)))]  # noqa: E731
+    print(json.dumps({
+        "p50": pct(0.50), "p99": pct(0.99), "max": lat[-1],
+        "pools": {k: {f: v[f] for f in ("peak_in_flight", "wait_s_avg", "wait_s_max", "connections_open")}
+                  for k, v in pools.items()},
+    }))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=256)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        return child(args.chunks, args.concurrency)
+
+    print(f"{args.chunks} uploads at client concurrency {args.concurrency}")
+    print("config              |  p50 s |  p99 s |  max s | pools (peak in flight / avg wait s / open conns)")
+    for label, keepalive in [("new conn / request", "0"), ("pooled keep-alive", "")]:
+        env = dict(os.environ)
+        if keepalive:
+            env["HTTP_MAX_KEEPALIVE"] = keepalive
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", "--chunks", str(args.chunks), "--concurrency", str(args.concurrency)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout.strip().splitlines()[-1]
+        r = json.loads(out)
+        pools = ", ".join(f"{k} {v['peak_in_flight']}/{v['wait_s_avg']}/{v['connections_open']}" for k, v in r["pools"].items())
+        print(f"{label:<19} | {r['p50']:6.2f} | {r['p99']:6.2f} | {r['max']:6.2f} | {pools}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Segment query latency and plans at scale, against a local Postgres.
+
+Loads sql/schema.sql into a scratch schema, fills it with synthetic sessions
+and segments (generate_series, server side), and times the queries the app
+and eval_stream.py issue, first with the segments indexes dropped and then
+with the schema's indexes:
+  - transcript rebuild      one session's segments in start_ms order
+                            (rebuild_session_transcript, session_transcripts)
+  - list page               /api/session/{id}/segments, first and a later page
+  - corpus page, keyset     eval_stream.py paging (session_id, start_ms, end_ms)
+  - corpus page, offset     the same page fetched with OFFSET, for comparison
+  - time range              count(*) over one hour of created_at
+The filters are the SQL PostgREST generates for those requests.
+
+    pip install "psycopg[binary]"
+    DATABASE_URL=postgresql://postgres@localhost/postgres \\
+        python bench/segment_queries.py --sessions 50000 --segments-per-session 40
+
+The scratch schema is dropped at the end unless --keep is given.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+import psycopg
+
+SCHEMA = "segbench"
+SCHEMA_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "sql", "schema.sql")
+SEGMENT_INDEXES = ("segments_session_range_key", "segments_created_at_brin")
+REPEATS = 20
+PAGE = 100
+CORPUS_PAGE = 1000
+
+QUERIES = {
+    "transcript rebuild": (
+        "select string_agg('[' || language_code || '] ' || coalesce(asr_text, ''), ' ' order by start_ms) "
+        "from segments where session_id = %(sid)s"
+    ),
+    "list page (first)": (
+        "select id, asr_text, audio_path, status, language_code, start_ms, end_ms from segments "
+        "where session_id = %(sid)s order by start_ms, end_ms limit %(page)s"
+    ),
+    "list page (cursor)": (
+        "select id, asr_text, audio_path, status, language_code, start_ms, end_ms from segments "
+        "where session_id = %(sid)s and start_ms >= %(start)s "
+        "and (start_ms > %(start)s or (start_ms = %(start)s and end_ms > %(end)s)) "
+        "order by start_ms, end_ms limit %(page)s"
+    ),
+    "corpus page, keyset": (
+        "select id, session_id, language_code, start_ms, end_ms, asr_text, status from segments "
+        "where session_id >= %(sid)s and (session_id > %(sid)s "
+        "or (session_id = %(sid)s and start_ms > %(start)s) "
+        "or (session_id = %(sid)s and start_ms = %(start)s and end_ms > %(end)s)) "
+        "order by session_id, start_ms, end_ms limit %(corpus_page)s"
+    ),
+    "corpus page, offset": (
+        "select id, session_id, language_code, start_ms, end_ms, asr_text, status from segments "
+        "order by session_id, start_ms, end_ms offset %(offset)s limit %(corpus_page)s"
+    ),
+    "time range (1 hour)": (
+        "select count(*) from segments where created_at >= %(t0)s and created_at < %(t0)s + interval '1 hour'"
+    ),
+}
+
+
+def load(conn, sessions: int, per_session: int):
+    conn.execute(f"drop schema if exists {SCHEMA} cascade")
+    conn.execute(f"create schema {SCHEMA}")
+    conn.execute(f"set search_path = {SCHEMA}, public")
+    with open(SCHEMA_SQL) as f:
+        schema_sql = f.read()
+    conn.execute(schema_sql)
+
+    # Load without the secondary indexes or the transcript triggers
+    for name in SEGMENT_INDEXES:
+        conn.execute(f"drop index if exists {name}")
+    conn.execute("alter table segments disable trigger user")
+
+    t0 = time.perf_counter()
+    conn.execute(
+        "insert into sessions (created_at) "
+        "select now() - interval '1 minute' * (%(n)s - g) from generate_series(1, %(n)s) g",
+        {"n": sessions},
+    )
+    # Rows go in created_at order, like production appends
+    conn.execute(
+        "insert into segments (session_id, created_at, language_code, start_ms, end_ms, asr_text, audio_path) "
+        "select s.id, s.created_at + g * interval '5 seconds', case when g %% 2 = 0 then 'en' else 'zh' end, "
+        "g * 5000, g * 5000 + 4800, 'segment text ' || g, s.id || '/' || g || '.webm' "
+        "from sessions s cross join generate_series(0, %(m)s - 1) g "
+        "order by s.created_at, g",
+        {"m": per_session},
+    )
+    conn.execute("vacuum analyze segments")
+    rows = conn.execute("select count(*) from segments").fetchone()[0]
+    print(f"loaded {rows:,} segments in {sessions:,} sessions in {time.perf_counter() - t0:.1f}s")
+    return schema_sql
+
+
+def params(conn, per_session: int) -> dict:
+    sid = conn.execute("select id from sessions order by random() limit 1").fetchone()[0]
+    t0 = conn.execute("select created_at from sessions where id = %s", (sid,)).fetchone()[0]
+    mid = (per_session // 2) * 5000
+    total = conn.execute("select reltuples::bigint from pg_class where relname = 'segments'").fetchone()[0]
+    return {
+        "sid": sid, "start": mid, "end": mid + 4800, "t0": t0,
+        "page": PAGE, "corpus_page": CORPUS_PAGE, "offset": random.randrange(max(1, total - CORPUS_PAGE)),
+    }
+
+
+def run_queries(conn, per_session: int, label: str) -> dict:
+    results = {}
+    print(f"\n{label}")
+    for name, sql in QUERIES.items():
+        samples = []
+        for _ in range(REPEATS):
+            p = params(conn, per_session)
+            t0 = time.perf_counter()
+            conn.execute(sql, p).fetchall()
+            samples.append((time.perf_counter() - t0) * 1000)
+        # Client-side binding: EXPLAIN takes literal values
+        with psycopg.ClientCursor(conn) as cur:
+            plan = cur.execute("explain " + sql, params(conn, per_session)).fetchone()[0]
+        results[name] = statistics.median(samples)
+        print(f"  {name:<22} p50 {results[name]:9.2f} ms   {plan.split('  (')[0].strip()}")
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=25_000)
+    ap.add_argument("--segments-per-session", type=int, default=40)
+    ap.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    args = ap.parse_args()
+
+    url = os.getenv("DATABASE_URL", "postgresql://postgres@localhost/postgres")
+    with psycopg.connect(url, autocommit=True) as conn:
+        try:
+            schema_sql = load(conn, args.sessions, args.segments_per_session)
+            before = run_queries(conn, args.segments_per_session, "without segment indexes")
+
+            t0 = time.perf_counter()
+            conn.execute(schema_sql)  # idempotent; recreates the indexes
+            conn.execute("analyze segments")
+            print(f"\nbuilt indexes in {time.perf_counter() - t0:.1f}s")
+            after = run_queries(conn, args.segments_per_session, "with sql/schema.sql indexes")
+
+            print()
+            for name in QUERIES:
+                print(f"  {name:<22} {before[name] / after[name]:8.1f}x")
+        finally:
+            if not args.keep:
+                conn.execute(f"drop schema if exists {SCHEMA} cascade")
+
+
+if __name__ == "__main__":
+    main()
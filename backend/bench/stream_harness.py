@@ -0,0 +1,133 @@
+"""
+Harness for the /api/stream WebSocket endpoint with a fake ASR backend.
+
+The backend runs against bench/stub_services.py, whose transcription
+endpoint stands in for Whisper. A simulated recorder streams frames at
+real time (or --speed times faster), switches language part way through,
+and stops. The harness checks the protocol (partials in window order, one
+final per segment, segment rows recorded) and compares time-to-first-text
+with the upload-chunk flow, where the first text arrives only after the
+segment ends and its upload round trip completes.
+
+    cd backend && python bench/stream_harness.py --segment-s 30 --speed 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+import websockets  # noqa: E402
+
+import stub_services  # noqa: E402
+
+STUB_PORT = 9100
+APP_PORT = 9101
+FRAME_MS = 250
+FRAME_BYTES = 4000  # ~128 kbit/s opus-in-webm
+
+
+async def stream_session(session_id: str, segment_s: float, speed: float, window_ms: int):
+    frames_per_segment = int(segment_s * 1000 / FRAME_MS)
+    window_frames = window_ms // FRAME_MS
+    window_full_at = None
+    plan = [("en", frames_per_segment), ("zh", frames_per_segment)]
+    messages = []
+    first_text_at = None
+
+    async with websockets.connect(f"ws://127.0.0.1:{APP_PORT}/api/stream", max_size=None) as ws:
+        async def receive():
+            nonlocal first_text_at
+            async for raw in ws:
+                msg = json.loads(raw)
+                if msg["type"] == "partial" and first_text_at is None:
+                    first_text_at = time.perf_counter()
+                messages.append(msg)
+
+        receiver = asyncio.create_task(receive())
+        clock_ms = 0
+        await ws.send(json.dumps({
+            "type": "start", "session_id": session_id, "language_code": plan[0][0],
+            "start_ms": 0, "frame_ms": FRAME_MS,
+        }))
+        for i, (lang, n_frames) in enumerate(plan):
+            seg_start = clock_ms
+            for f in range(n_frames):
+                # first frame of a recording carries the container header
+                await ws.send((b"HDR" if f == 0 else b"") + os.urandom(FRAME_BYTES))
+                clock_ms += FRAME_MS
+                if i == 0 and f == window_frames - 1:
+                    window_full_at = time.perf_counter()
+                await asyncio.sleep(FRAME_MS / 1000 / speed)
+            control = {"session_id": session_id, "language_code": lang, "start_ms": seg_start, "end_ms": clock_ms}
+            if i + 1 < len(plan):
+                control.update(type="switch", next_language_code=plan[i + 1][0])
+            else:
+                control.update(type="stop")
+            await ws.send(json.dumps(control))
+        await receiver
+
+    # Recorder-time: the first window takes window_ms to fill, then ASR + push back
+    return window_ms / 1000 + (first_text_at - window_full_at), messages
+
+
+async def upload_baseline(session_id: str, segment_s: float) -> float:
+    # Recorder uploads the whole segment when it ends; first text = end + round trip
+    frames = int(segment_s * 1000 / FRAME_MS)
+    blob = os.urandom(FRAME_BYTES * frames)
+    meta = {"session_id": session_id, "language_code": "en", "start_ms": 0, "end_ms": frames * FRAME_MS}
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=120) as http:
+        t0 = time.perf_counter()
+        res = await http.post(
+            "/api/upload-chunk",
+            data={"metadata_json": json.dumps(meta)},
+            files={"file": ("segment.webm", blob, "audio/webm")},
+        )
+        res.raise_for_status()
+        return segment_s + (time.perf_counter() - t0)
+
+
+def check(messages):
+    partials = [m for m in messages if m["type"] == "partial"]
+    finals = [m for m in messages if m["type"] == "final"]
+    errors = [m for m in messages if m["type"] == "error"]
+    assert not errors, errors
+    assert [f["language_code"] for f in finals] == ["en", "zh"], finals
+    for seg_start in {p["start_ms"] for p in partials}:
+        windows = [p["window"] for p in partials if p["start_ms"] == seg_start]
+        assert windows == sorted(windows), f"partials out of order: {windows}"
+    rows = stub_services.tables["segments"]
+    assert len(rows) == 2, rows
+    return len(partials), finals
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--segment-s", type=float, default=30.0, help="length of each language segment")
+    ap.add_argument("--speed", type=float, default=5.0, help="stream faster than real time by this factor")
+    ap.add_argument("--window-ms", type=int, default=5000)
+    args = ap.parse_args()
+
+    os.environ["STREAM_WINDOW_MS"] = str(args.window_ms)
+    os.environ.setdefault("TRANSCRIPT_CACHE_DB", ":memory:")
+    stub_services.point_backend_at_stub(STUB_PORT)
+    stub_services.serve_in_thread(stub_services.stub, STUB_PORT)
+    import main as backend  # noqa: E402
+    stub_services.serve_in_thread(backend.app, APP_PORT)
+
+    stream_ttft, messages = asyncio.run(stream_session("stream-session", args.segment_s, args.speed, args.window_ms))
+    n_partials, finals = check(messages)
+    upload_ttft = asyncio.run(upload_baseline("upload-session", args.segment_s))
+
+    print(f"segments: 2 x {args.segment_s:.0f}s, window {args.window_ms} ms, fake ASR latency {stub_services.ASR_LATENCY_S}s")
+    print(f"partials received: {n_partials}, finals: {len(finals)}")
+    print(f"time to first text (seconds after speech starts): stream={stream_ttft:.1f}s  upload-chunk={upload_ttft:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Local stand-ins for Supabase (PostgREST + Storage) and the OpenAI
+transcription endpoint, for benchmarks that need the backend's real HTTP
+client stack without network access or API cost.
+
+Each external call sleeps for a configurable latency (asyncio.sleep, so the
+stub itself never serialises requests) and keeps its data in memory.
+"""
+import asyncio
+import csv
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+ASR_LATENCY_S = float(os.getenv("STUB_ASR_LATENCY_S", "0.8"))
+STORAGE_LATENCY_S = float(os.getenv("STUB_STORAGE_LATENCY_S", "0.2"))
+DB_LATENCY_S = float(os.getenv("STUB_DB_LATENCY_S", "0.05"))
+# Extra ASR seconds per second of audio (audio length estimated from bytes)
+ASR_RTF = float(os.getenv("STUB_ASR_RTF", "0"))
+# Provider quota: ASR requests per minute (token bucket, one second of
+# burst); over it the stub answers 429 like the OpenAI API. 0 = unlimited
+ASR_RATE_PER_MIN = float(os.getenv("STUB_ASR_RATE_PER_MIN", "0"))
+# First request on each client connection: DNS + TCP + TLS to a real
+# provider, the cost that warm-up and keep-alive take off the first chunk
+CONNECT_LATENCY_S = float(os.getenv("STUB_CONNECT_LATENCY_S", "0"))
+# Client uplink for request bodies sent to ASR and Storage; 0 = unlimited
+UPLINK_MBPS = float(os.getenv("STUB_UPLINK_MBPS", "0"))
+
+# A syntactically valid JWT; supabase-py rejects keys that don't look like one.
+FAKE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.c3R1Yg"
+
+stub = FastAPI(title="stub services")
+tables = {"sessions": [], "segments": [], "audio_objects": []}
+objects = {}
+calls = {"asr": 0, "asr_rate_limited": 0, "storage": 0, "db": 0}
+_asr_bucket = {"tokens": 0.0, "at": 0.0}
+_connections = set()
+
+
+@stub.middleware("http")
+async def connection_setup(request: Request, call_next):
+    if CONNECT_LATENCY_S:
+        peer = (request.client.host, request.client.port)
+        if peer not in _connections:
+            _connections.add(peer)
+            await asyncio.sleep(CONNECT_LATENCY_S)
+    return await call_next(request)
+
+
+@stub.post("/v1/audio/transcriptions")
+async def transcriptions(request: Request):
+    form = await request.form()
+    audio = await form["file"].read()
+    if ASR_RATE_PER_MIN and not _take_asr_token():
+        calls["asr_rate_limited"] += 1
+        return Response(
+            status_code=429, headers={"retry-after": "1"}, media_type="application/json",
+            content='{"error":{"message":"Rate limit reached for requests","type":"requests","code":"rate_limit_exceeded"}}',
+        )
+    calls["asr"] += 1
+    # 16 kHz mono WAV is 32000 B/s; assume ~16 kB/s (128 kbit/s) for compressed containers
+    audio_s = len(audio) / (32000 if audio[:4] == b"RIFF" else 16000)
+    await asyncio.sleep(ASR_LATENCY_S + ASR_RTF * audio_s + _transfer_s(audio))
+    return {"text": f"stub transcript ({form.get('language')}, {len(audio)} bytes)"}
+
+
+def _take_asr_token() -> bool:
+    rate = ASR_RATE_PER_MIN / 60
+    now = time.monotonic()
+    burst = max(1.0, rate)
+    if not _asr_bucket["at"]:
+        _asr_bucket["tokens"] = burst
+    _asr_bucket["tokens"] = min(burst, _asr_bucket["tokens"] + (now - (_asr_bucket["at"] or now)) * rate)
+    _asr_bucket["at"] = now
+    if _asr_bucket["tokens"] < 1:
+        return False
+    _asr_bucket["tokens"] -= 1
+    return True
+
+
+@stub.get("/v1/models/{model}")
+async def model(model: str):
+    return {"id": model, "object": "model", "created": 0, "owned_by": "stub"}
+
+
+@stub.get("/storage/v1/bucket/{bucket}")
+async def storage_bucket(bucket: str):
+    return {"id": bucket, "name": bucket, "owner": "", "public": False, "file_size_limit": None,
+            "allowed_mime_types": None, "created_at": "2024-01-01T00:00:00Z", "updated_at": "2024-01-01T00:00:00Z"}
+
+
+@stub.post("/storage/v1/object/{bucket}/{path:path}")
+async def storage_upload(bucket: str, path: str, request: Request):
+    body = await request.body()
+    calls["storage"] += 1
+    await asyncio.sleep(STORAGE_LATENCY_S + _transfer_s(body))
+    key = f"{bucket}/{path}"
+    if key in objects and request.headers.get("x-upsert") != "true":
+        return Response(status_code=400, content='{"statusCode":"409","error":"Duplicate","message":"The resource already exists"}')
+    objects[key] = body
+    return {"Key": key}
+
+
+@stub.delete("/storage/v1/object/{bucket}")
+async def storage_remove(bucket: str, request: Request):
+    payload = await request.json()
+    calls["storage"] += 1
+    await asyncio.sleep(STORAGE_LATENCY_S)
+    removed = [p for p in payload["prefixes"] if objects.pop(f"{bucket}/{p}", None) is not None]
+    return [{"name": p} for p in removed]
+
+
+@stub.post("/rest/v1/rpc/{fn}")
+async def rest_rpc(fn: str, request: Request):
+    args = await request.json()
+    calls["db"] += 1
+    await asyncio.sleep(DB_LATENCY_S)
+    objs = tables["audio_objects"]
+    if fn == "claim_audio_object":
+        obj = next((o for o in objs if o["path"] == args["p"]), None)
+        if obj is not None and obj.get("deleting_since"):
+            return None
+        if obj is None:
+            obj = {"path": args["p"], "size_bytes": args["size"], "refcount": 0, "unreferenced_since": time.time()}
+            objs.append(obj)
+        elif obj["refcount"] == 0:
+            obj["unreferenced_since"] = time.time()
+        return obj["refcount"] == 0
+    if fn == "collect_audio_objects":
+        cutoff = time.time() - args["grace_s"]
+        stuck = time.time() - 600
+        dead = [
+            o for o in objs
+            if o["refcount"] == 0 and (
+                (not o.get("deleting_since") and o["unreferenced_since"] < cutoff)
+                or (o.get("deleting_since") or time.time()) < stuck
+            )
+        ][: args["max_objects"]]
+        for o in dead:
+            o["deleting_since"] = time.time()
+        return [o["path"] for o in dead]
+    if fn == "forget_audio_objects":
+        paths = set(args["paths"])
+        objs[:] = [o for o in objs if not (o["path"] in paths and o.get("deleting_since") and o["refcount"] == 0)]
+        skipped = [o for o in objs if o["path"] in paths]
+        for o in skipped:
+            o["deleting_since"] = None
+        return [o["path"] for o in skipped]
+    if fn == "release_audio_objects":
+        for o in objs:
+            if o["path"] in args["paths"]:
+                o["deleting_since"] = None
+        return None
+    return Response(status_code=404)
+
+
+@stub.post("/rest/v1/{table}")
+async def rest_insert(table: str, request: Request):
+    payload = await request.json()
+    calls["db"] += 1
+    await asyncio.sleep(DB_LATENCY_S)
+    rows = payload if isinstance(payload, list) else [payload]
+    # Upsert with resolution=ignore-duplicates: skip rows that collide on on_conflict
+    conflict_cols = [c for c in request.query_params.get("on_conflict", "").split(",") if c]
+    out = []
+    for row in rows:
+        row = dict(row)
+        if conflict_cols and any(
+            all(str(r.get(c)) == str(row.get(c)) for c in conflict_cols) for r in tables.get(table, [])
+        ):
+            continue
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+        tables.setdefault(table, []).append(row)
+        out.append(row)
+        if table == "segments":
+            _count_ref(row.get("audio_path"), 1)
+    return Response(status_code=201, media_type="application/json", content=_json(out))
+
+
+@stub.get("/rest/v1/{table}")
+async def rest_select(table: str, request: Request):
+    calls["db"] += 1
+    await asyncio.sleep(DB_LATENCY_S)
+    rows = _filter(tables.get(table, []), request.query_params)
+    order = request.query_params.get("order")
+    if order:
+        # Stable sorts, last key first: "a.asc,b.desc" orders by a, then b
+        for term in reversed(order.split(",")):
+            col = term.split(".")[0]
+            rows = sorted(rows, key=lambda r: r.get(col) or 0, reverse=term.endswith(".desc"))
+    limit = request.query_params.get("limit")
+    if limit:
+        rows = rows[: int(limit)]
+    return Response(media_type="application/json", content=_json(rows))
+
+
+@stub.patch("/rest/v1/{table}")
+async def rest_update(table: str, request: Request):
+    patch = await request.json()
+    calls["db"] += 1
+    await asyncio.sleep(DB_LATENCY_S)
+    rows = _filter(tables.get(table, []), request.query_params)
+    for row in rows:
+        if table == "segments" and "audio_path" in patch:
+            _count_ref(row.get("audio_path"), -1)
+            _count_ref(patch["audio_path"], 1)
+        row.update(patch)
+    return Response(media_type="application/json", content=_json(rows))
+
+
+@stub.delete("/rest/v1/{table}")
+async def rest_delete(table: str, request: Request):
+    calls["db"] += 1
+    await asyncio.sleep(DB_LATENCY_S)
+    rows = _filter(tables.get(table, []), request.query_params)
+    if table == "sessions":
+        # on delete cascade
+        ids = {str(r["id"]) for r in rows}
+        for seg in [s for s in tables["segments"] if str(s["session_id"]) in ids]:
+            _count_ref(seg.get("audio_path"), -1)
+            tables["segments"].remove(seg)
+    for row in rows:
+        if table == "segments":
+            _count_ref(row.get("audio_path"), -1)
+        tables[table].remove(row)
+    return Response(media_type="application/json", content=_json(rows))
+
+
+def _count_ref(path, delta: int):
+    # The segments_audio_object_refs trigger
+    for obj in tables["audio_objects"]:
+        if obj["path"] == path:
+            obj["refcount"] += delta
+            obj["unreferenced_since"] = time.time() if obj["refcount"] == 0 else None
+
+
+def _split_top(s: str):
+    # "a,and(b,c),d" -> ["a", "and(b,c)", "d"]
+    parts, depth, cur = [], 0, ""
+    for ch in s:
+        if ch == "," and depth == 0:
+            parts.append(cur)
+            cur = ""
+            continue
+        depth += (ch == "(") - (ch == ")")
+        cur += ch
+    return parts + [cur] if cur else parts
+
+
+def _match(row, cond: str) -> bool:
+    # One PostgREST logic-tree term: col.op.value, and(...) or or(...)
+    for tree, combine in (("and(", all), ("or(", any)):
+        if cond.startswith(tree):
+            return combine(_match(row, c) for c in _split_top(cond[len(tree):-1]))
+    col, op, value = cond.split(".", 2)
+    have = row.get(col)
+    if isinstance(have, (int, float)):
+        value = type(have)(value)
+    else:
+        have = str(have)
+    return {"eq": have == value, "gt": have > value, "gte": have >= value,
+            "lt": have < value, "lte": have <= value}[op]
+
+
+def _filter(rows, params):
+    for key, value in params.items():
+        if key in ("select", "order", "limit", "offset"):
+            continue
+        if key == "or":
+            rows = [r for r in rows if _match(r, f"or{value}")]
+        elif value.startswith("eq."):
+            rows = [r for r in rows if str(r.get(key)) == value[3:]]
+        elif value.startswith("in.("):
+            wanted = set(next(csv.reader([value[4:-1]])))
+            rows = [r for r in rows if str(r.get(key)) in wanted]
+    return rows
+
+
+def _transfer_s(body: bytes) -> float:
+    return len(body) * 8 / (UPLINK_MBPS * 1e6) if UPLINK_MBPS else 0.0
+
+
+def _json(obj) -> str:
+    import json
+    return json.dumps(obj, default=str)
+
+
+def reset():
+    for rows in tables.values():
+        rows.clear()
+    objects.clear()
+    for k in calls:
+        calls[k] = 0
+    _asr_bucket["at"] = 0.0
+
+
+def serve_in_thread(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError(f"server on port {port} did not start")
+        time.sleep(0.05)
+    return server
+
+
+def point_backend_at_stub(port: int):
+    # Must run before the backend modules are imported: clients read these at import.
+    base = f"http://127.0.0.1:{port}"
+    os.environ["SUPABASE_URL"] = base
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = FAKE_KEY
+    os.environ["OPENAI_API_KEY"] = "sk-stub"
+    os.environ["OPENAI_BASE_URL"] = f"{base}/v1"
+    os.environ.setdefault("JOBS_DB_PATH", ":memory:")
+
+
+if __name__ == "__main__":
+    uvicorn.run(stub, host="127.0.0.1", port=int(os.getenv("PORT", 9100)))
@@ -0,0 +1,107 @@
+"""
+Bytes per segment and upload time, with and without server-side transcoding.
+
+Synthesises browser-like chunks (48 kHz stereo Opus in WebM at 128 kbit/s,
+like MediaRecorder's default) and posts them to /api/upload-chunk against
+the stub services, once as uploaded and once with TRANSCODE_ENABLED. The
+stub charges ASR and Storage for transfer time at STUB_UPLINK_MBPS, so
+smaller bodies show up as lower latency.
+
+    cd backend && python bench/transcode.py --chunks 16 --seconds 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("STUB_UPLINK_MBPS", "2")
+os.environ.setdefault("TRANSCRIPT_CACHE_DB", ":memory:")
+
+import httpx  # noqa: E402
+
+import stub_services  # noqa: E402
+
+STUB_PORT = 9100
+APP_PORT = 9101
+
+
+def browser_chunk(seconds: float, seed: int) -> bytes:
+    # Band-limited noise bursts with pauses: roughly speech-shaped for the codecs
+    # and the VAD, and different per chunk so the transcript cache stays cold
+    src = (
+        f"anoisesrc=d={seconds}:c=pink:a=0.3:seed={seed},lowpass=f=3500,"
+        f"volume='if(lt(mod(t,4),3),1,0.01)':eval=frame"
+    )
+    return subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", src,
+         "-ac", "2", "-ar", "48000", "-c:a", "libopus", "-b:a", "128k", "-f", "webm", "pipe:1"],
+        capture_output=True, check=True,
+    ).stdout
+
+
+async def run(base: str, chunks, seconds: float):
+    async with httpx.AsyncClient(base_url=base, timeout=300) as http:
+        latencies = []
+        for i, audio in enumerate(chunks):
+            start = i * int(seconds * 1000)
+            meta = {"session_id": "00000000-0000-0000-0000-000000000001", "language_code": "en",
+                    "start_ms": start, "end_ms": start + int(seconds * 1000)}
+            t0 = time.perf_counter()
+            res = await http.post(
+                "/api/upload-chunk",
+                data={"metadata_json": json.dumps(meta)},
+                files={"file": (f"segment-{i}.webm", audio, "audio/webm")},
+            )
+            res.raise_for_status()
+            latencies.append(time.perf_counter() - t0)
+        return latencies
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=16)
+    ap.add_argument("--seconds", type=float, default=20.0)
+    args = ap.parse_args()
+
+    stub_services.point_backend_at_stub(STUB_PORT)
+    stub_services.serve_in_thread(stub_services.stub, STUB_PORT)
+    import main as backend  # noqa: E402
+    stub_services.serve_in_thread(backend.app, APP_PORT)
+
+    base = f"http://127.0.0.1:{APP_PORT}"
+    modes = [("as uploaded", False, "ogg"), ("transcode, ASR ogg", True, "ogg"), ("transcode, ASR flac", True, "flac")]
+    # Fresh audio per mode so the transcript cache never answers
+    batches = [[browser_chunk(args.seconds, m * args.chunks + i) for i in range(args.chunks)] for m in range(len(modes))]
+    upload_bytes = sum(len(b) for batch in batches for b in batch) / (len(modes) * args.chunks)
+    print(f"{args.chunks} chunks of {args.seconds:.0f}s, uplink {stub_services.UPLINK_MBPS} Mbit/s, "
+          f"browser upload {upload_bytes / 1024:.0f} KiB/chunk")
+    print("mode                 | stored KiB/chunk | ASR KiB/chunk | p50 latency s")
+
+    for (label, transcode, fmt), uploads in zip(modes, batches):
+        backend.TRANSCODE_ENABLED, backend.TRANSCODE_ASR_FORMAT = transcode, fmt
+        stub_services.reset()
+        asr_bytes = []
+        original = backend.asr.transcribe
+
+        async def counting(audio, *a, **kw):
+            asr_bytes.append(len(audio))
+            return await original(audio, *a, **kw)
+
+        backend.asr.transcribe = counting
+        try:
+            latencies = asyncio.run(run(base, uploads, args.seconds))
+        finally:
+            backend.asr.transcribe = original
+        stored = sum(map(len, stub_services.objects.values())) / len(stub_services.objects)
+        p50 = sorted(latencies)[len(latencies) // 2]
+        print(f"{label:<20} | {stored / 1024:16.0f} | {sum(asr_bytes) / len(uploads) / 1024:13.0f} | {p50:13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import metrics
+
+# Transcription cache keyed by (audio hash, language, model).
+#
+# Tier 1 is an in-process LRU; tier 2 is a SQLite file shared by every worker
+# on the host and kept across restarts. A hit returns the cached text and the
+# storage path of the object that was uploaded the first time.
+
+_SCHEMA = """
+create table if not exists transcripts (
+    key text primary key,
+    text text,
+    audio_path text not null,
+    created_at timestamp not null default current_timestamp
+);
+"""
+
+
+def audio_key(blob: bytes, language_code: str, model: str) -> str:
+    return f"{hashlib.sha256(blob).hexdigest()}:{language_code}:{model}"
+
+
+class TranscriptCache:
+    def __init__(self, db_path: str = "transcript_cache.sqlite3", max_entries: int = 1024):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[str, Tuple[Optional[str], str]]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            if self.db_path != ":memory:":
+                conn.execute("pragma journal_mode=wal")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key: str, value: Tuple[Optional[str], str]):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Tuple[Optional[str], str]]:
+        """Return (text, audio_path) or None. Blocking; call via run_blocking."""
+        with self._lock:
+            hit = self._lru.get(key)
+            if hit is not None:
+                self._lru.move_to_end(key)
+                metrics.inc("transcript_cache_memory_hits")
+                return hit
+
+            row = self._connect().execute(
+                "select text, audio_path from transcripts where key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                metrics.inc("transcript_cache_misses")
+                return None
+
+            value = (row[0], row[1])
+            self._remember(key, value)
+            metrics.inc("transcript_cache_persistent_hits")
+            return value
+
+    def put(self, key: str, text: Optional[str], audio_path: str):
+        with self._lock:
+            self._remember(key, (text, audio_path))
+            self._connect().execute(
+                "insert or replace into transcripts (key, text, audio_path) values (?, ?, ?)",
+                (key, text, audio_path),
+            )
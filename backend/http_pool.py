@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+
+import metrics
+
+# Outbound HTTP clients for Supabase (PostgREST, Storage) and OpenAI.
+#
+# Every client gets explicit pool limits, keep-alive, HTTP/2 and timeouts, and
+# a metered transport: at most HTTP_MAX_CONNECTIONS requests are in flight per
+# client, and time spent waiting for a slot is recorded. stats() feeds
+# /api/stats and /api/metrics; a client whose wait time grows is undersized
+# for the worker's IO_WORKERS.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", os.getenv("IO_WORKERS", "32")))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", str(HTTP_MAX_CONNECTIONS)))
+HTTP_KEEPALIVE_EXPIRY_S = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_S", "60"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv("HTTP_CONNECT_TIMEOUT_S", "5"))
+
+try:
+    import h2  # noqa: F401
+except ImportError:
+    HTTP2_ENABLED = False
+
+
+class _Release(httpx.SyncByteStream):
+    # Holds the transport slot until the response body has been read and closed
+    def __init__(self, stream: httpx.SyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class MeteredTransport(httpx.HTTPTransport):
+    def __init__(self, name: str, max_connections: int, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.max_in_flight = max_connections
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self.wait_s_total = 0.0
+        self.wait_s_max = 0.0
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        t0 = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+        self._slots.acquire()
+        waited = time.perf_counter() - t0
+        with self._lock:
+            self.waiting -= 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.requests += 1
+            self.wait_s_total += waited
+            self.wait_s_max = max(self.wait_s_max, waited)
+        metrics.observe("http_pool_wait_seconds", waited, client=self.name)
+        try:
+            response = super().handle_request(request)
+        except BaseException:
+            self._release()
+            raise
+        response.stream = _Release(response.stream, self._release)
+        return response
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        connections = getattr(self._pool, "connections", [])
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "utilisation": round(self.in_flight / self.max_in_flight, 3),
+                "waiting": self.waiting,
+                "requests": self.requests,
+                "wait_s_total": round(self.wait_s_total, 3),
+                "wait_s_avg": round(self.wait_s_total / self.requests, 4) if self.requests else 0.0,
+                "wait_s_max": round(self.wait_s_max, 3),
+                "connections_open": len(connections),
+                "connections_idle": sum(1 for c in connections if c.is_idle()),
+            }
+
+
+_transports: Dict[str, MeteredTransport] = {}
+_clients: Dict[str, httpx.Client] = {}
+
+
+def make_client(
+    name: str,
+    timeout_s: float,
+    base_url: str = "",
+    headers: Optional[dict] = None,
+    client_class=httpx.Client,
+) -> httpx.Client:
+    """A pooled client registered under `name` for stats() and close_all()."""
+    transport = MeteredTransport(
+        name,
+        HTTP_MAX_CONNECTIONS,
+        http2=HTTP2_ENABLED,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_S,
+        ),
+    )
+    client = client_class(
+        base_url=base_url,
+        headers=headers,
+        timeout=httpx.Timeout(timeout_s, connect=HTTP_CONNECT_TIMEOUT_S),
+        transport=transport,
+        follow_redirects=True,
+    )
+    _transports[name] = transport
+    _clients[name] = client
+    return client
+
+
+def stats() -> dict:
+    return {name: t.stats() for name, t in _transports.items()}
+
+
+def close_all():
+    for client in _clients.values():
+        client.close()
+    _clients.clear()
+    _transports.clear()
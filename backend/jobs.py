@@ -0,0 +1,181 @@
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from threadpool import run_blocking
+
+# Local, persistent transcription backlog for async uploads.
+#
+# Jobs live in a SQLite file so a restart (or crash) does not lose queued
+# audio. A claimed job holds a lease; if the process dies mid-job the lease
+# expires and any worker picks it up again. Pass db_path=":memory:" for an
+# in-process stand-in.
+
+_SCHEMA = """
+create table if not exists jobs (
+    id integer primary key autoincrement,
+    segment_id text not null unique,
+    storage_path text not null,
+    language_code text not null,
+    filename text not null,
+    content_type text not null,
+    audio blob not null,
+    status text not null default 'queued',   -- queued | running | failed
+    attempts integer not null default 0,
+    next_run_at real not null,
+    lease_until real,
+    last_error text,
+    created_at real not null
+);
+create index if not exists jobs_due_idx on jobs (status, next_run_at);
+"""
+
+
+@dataclass
+class Job:
+    id: int
+    segment_id: str
+    storage_path: str
+    language_code: str
+    filename: str
+    content_type: str
+    audio: bytes
+    attempts: int
+
+
+class JobQueue:
+    def __init__(
+        self,
+        handler: Callable[[Job], Awaitable[None]],
+        on_failure: Callable[[Job, Exception], Awaitable[None]],
+        db_path: str = "jobs.sqlite3",
+        concurrency: int = 4,
+        max_attempts: int = 5,
+        backoff_s: float = 2.0,
+        lease_s: float = 300.0,
+        poll_interval_s: float = 1.0,
+    ):
+        self.handler = handler
+        self.on_failure = on_failure
+        self.db_path = db_path
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_s = backoff_s
+        self.lease_s = lease_s
+        self.poll_interval_s = poll_interval_s
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: list = []
+
+    # ---------- lifecycle ----------
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            if self.db_path != ":memory:":
+                conn.execute("pragma journal_mode=wal")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def start(self):
+        await run_blocking(self._connect)
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ---------- producer side ----------
+    def _enqueue(self, segment_id, storage_path, language_code, filename, content_type, audio) -> int:
+        now = time.time()
+        with self._lock:
+            cur = self._connect().execute(
+                "insert into jobs (segment_id, storage_path, language_code, filename, content_type, audio,"
+                " next_run_at, created_at) values (?, ?, ?, ?, ?, ?, ?, ?)",
+                (segment_id, storage_path, language_code, filename, content_type, audio, now, now),
+            )
+            return cur.lastrowid
+
+    async def enqueue(
+        self,
+        segment_id: str,
+        storage_path: str,
+        language_code: str,
+        filename: str,
+        content_type: str,
+        audio: bytes,
+    ) -> int:
+        job_id = await run_blocking(
+            self._enqueue, segment_id, storage_path, language_code, filename, content_type, audio
+        )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    def backlog(self) -> int:
+        with self._lock:
+            return self._connect().execute("select count(*) from jobs where status != 'failed'").fetchone()[0]
+
+    # ---------- consumer side ----------
+    def _claim(self) -> Optional[Job]:
+        now = time.time()
+        with self._lock:
+            row = self._connect().execute(
+                "update jobs set status = 'running', lease_until = ?, attempts = attempts + 1"
+                " where id = (select id from jobs"
+                "   where (status = 'queued' and next_run_at <= ?) or (status = 'running' and lease_until < ?)"
+                "   order by next_run_at limit 1)"
+                " returning id, segment_id, storage_path, language_code, filename, content_type, audio, attempts",
+                (now + self.lease_s, now, now),
+            ).fetchone()
+        return Job(*row) if row else None
+
+    def _complete(self, job: Job):
+        with self._lock:
+            self._connect().execute("delete from jobs where id = ?", (job.id,))
+
+    def _retry_or_fail(self, job: Job, err: Exception) -> bool:
+        failed = job.attempts >= self.max_attempts
+        # Exponential backoff with jitter: backoff_s, 2*backoff_s, 4*backoff_s, ...
+        delay = self.backoff_s * (2 ** (job.attempts - 1)) * random.uniform(0.8, 1.2)
+        with self._lock:
+            self._connect().execute(
+                "update jobs set status = ?, next_run_at = ?, lease_until = null, last_error = ? where id = ?",
+                ("failed" if failed else "queued", time.time() + delay, str(err)[:500], job.id),
+            )
+        return failed
+
+    async def _worker(self):
+        while True:
+            job = await run_blocking(self._claim)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval_s)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self.handler(job)
+            except Exception as e:
+                print("job failed:", "segment_id=", job.segment_id, "attempt=", job.attempts, "error=", e)
+                if await run_blocking(self._retry_or_fail, job, e):
+                    try:
+                        await self.on_failure(job, e)
+                    except Exception as cb_err:
+                        print("job on_failure error:", cb_err)
+            else:
+                await run_blocking(self._complete, job)
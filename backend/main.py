@@ -1,23 +1,79 @@
+import asyncio
+import hashlib
+import hmac
+import math
 import os
-import tempfile
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+import numpy as np
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import ValidationError
-
-from openai import OpenAI
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import TypeAdapter, ValidationError
+from starlette.formparsers import MultiPartParser
 
 from models import (
     StartSessionRequest,
     StartSessionResponse,
     ChunkMetadata,
     SegmentResponse,
+    SegmentListItem,
+    SegmentPage,
     EndSessionRequest,
+    StreamControl,
+    BulkChunkMetadata,
+    BulkChunkResult,
+    BulkUploadResponse,
+    DebugSettings,
 )
-from supabase_client import supabase
+from supabase_client import close_supabase, get_supabase, warmup_supabase
+from threadpool import prewarm_cpu_pool, run_blocking, run_cpu, shutdown_cpu_pool
+from jobs import Job, JobQueue
+from scheduler import AsrScheduler, Overloaded
+from cache import TranscriptCache, audio_key
+from streaming import StreamSession
+from asr import create_asr_backend
+from audio import AudioDecodeError, decode_pcm, encode_wav, prepare_audio
+from audio import duration_ms as audio_duration_ms
+from segmenter import merge_texts, plan_chunks
+import metrics
+import tracing
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm-up runs in the background so the port opens as soon as the app is
+    # imported; /api/ready reports when it is done
+    if WEB_CONCURRENCY > 1:
+        print(
+            f"WEB_CONCURRENCY={WEB_CONCURRENCY} is not supported yet: /api/ready, /api/metrics "
+            "and /api/stats report on whichever worker answers, and CPU_WORKERS and the ASR "
+            "limits apply to each worker"
+        )
+    warmup_task = asyncio.create_task(_warm_up(WARMUP_COMPONENTS))
+    await jobs.start()
+    gc_task = None
+    if STORAGE_LAYOUT == "cas" and CAS_GC_INTERVAL_S > 0:
+        gc_task = asyncio.create_task(_audio_gc_loop())
+    yield
+    if gc_task is not None:
+        gc_task.cancel()
+    warmup_task.cancel()
+    await jobs.stop()
+    tracing.flush()
+    shutdown_cpu_pool()
+    await asr.close()
+    close_supabase()
+    import http_pool  # imported lazily, with httpx, by the SDK clients
 
-app = FastAPI(title="Bilingual ASR Backend")
+    http_pool.close_all()
+
+
+app = FastAPI(title="Bilingual ASR Backend", lifespan=lifespan)
 
 # --- CORS ---
 origins_env = os.getenv("CORS_ORIGINS", "*")
@@ -30,7 +86,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+asr = create_asr_backend()
 
 # ---------- Session endpoints ----------
 @app.post("/api/start-session", response_model=StartSessionResponse)
@@ -40,7 +96,7 @@ def start_session(payload: StartSessionRequest):
         "user_agent": payload.user_agent,
         "note": payload.note,
     }
-    res = supabase.table("sessions").insert(data).execute()
+    res = get_supabase().table("sessions").insert(data).execute()
     if not res.data or len(res.data) == 0:
         raise HTTPException(status_code=500, detail="Failed to create session")
     return StartSessionResponse(session_id=res.data[0]["id"])
@@ -48,24 +104,525 @@ def start_session(payload: StartSessionRequest):
 
 @app.post("/api/end-session")
 def end_session(payload: EndSessionRequest):
-    view = (
-        supabase.table("segments")
-        .select("*")
+    # session_transcript_state is kept current by a trigger on segments
+    # (sql/schema.sql); only out-of-order or edited sessions, and sessions
+    # without a state row yet, need a rebuild.
+    res = (
+        get_supabase().table("session_transcript_state")
+        .select("transcript, stale")
         .eq("session_id", payload.session_id)
-        .order("start_ms")
+        .limit(1)
         .execute()
     )
-    text = " ".join(
-        [f"[{row['language_code']}] {row.get('asr_text') or ''}" for row in (view.data or [])]
-    )
+    if not res.data or res.data[0]["stale"]:
+        text = get_supabase().rpc("rebuild_session_transcript", {"sid": payload.session_id}).execute().data or ""
+    else:
+        text = res.data[0]["transcript"]
     return {"session_id": payload.session_id, "transcript": text}
 
 
+# ---------- Audio storage ----------
+# STORAGE_LAYOUT=session (default): one object per segment, under
+# sessions/<session_id>/. STORAGE_LAYOUT=cas: objects are named by the SHA-256
+# of their bytes under sharded prefixes (cas/ab/cd/<hash>.<ext>), so identical
+# audio is stored once however many segments point at it. audio_objects
+# (sql/schema.sql) counts those segments: the upload is skipped when the
+# object is already referenced, and objects left unreferenced (their sessions
+# deleted) are removed by the cleanup job after CAS_GC_GRACE_S.
+STORAGE_LAYOUT = os.getenv("STORAGE_LAYOUT", "session")
+CAS_PREFIX = "cas/"
+CAS_GC_INTERVAL_S = float(os.getenv("CAS_GC_INTERVAL_S", "3600"))  # 0 disables the cleanup job
+CAS_GC_GRACE_S = int(os.getenv("CAS_GC_GRACE_S", "86400"))
+CAS_GC_BATCH = 100  # objects per collect call and storage remove
+CAS_CLAIM_ATTEMPTS = 20  # claims of an object the cleanup job is removing wait ...
+CAS_CLAIM_RETRY_S = 0.5  # ... this long between attempts
+
+
+def _cas_path(blob: bytes, ext: str) -> str:
+    h = hashlib.sha256(blob).hexdigest()
+    return f"{CAS_PREFIX}{h[:2]}/{h[2:4]}/{h}{ext}"
+
+
+async def _upload_audio(blob: bytes, storage_path: str, content_type: str, upsert: bool = False):
+    if not storage_path.startswith(CAS_PREFIX):
+        await _put_object(blob, storage_path, content_type, upsert)
+        return
+    # Concurrent uploads of the same object from this process share one
+    pending = _cas_uploads.get(storage_path)
+    if pending is not None:
+        await asyncio.shield(pending)
+        _count_dedup(blob)
+        return
+    pending = _cas_uploads[storage_path] = asyncio.ensure_future(_upload_cas_object(blob, storage_path, content_type))
+    try:
+        await asyncio.shield(pending)
+    finally:
+        _cas_uploads.pop(storage_path, None)
+
+
+_cas_uploads: Dict[str, asyncio.Future] = {}
+
+
+async def _upload_cas_object(blob: bytes, storage_path: str, content_type: str):
+    for _ in range(CAS_CLAIM_ATTEMPTS):
+        claim = get_supabase().rpc("claim_audio_object", {"p": storage_path, "size": len(blob)})
+        try:
+            must_upload = (await run_blocking(claim.execute)).data
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Storage upload failed: {e}")
+        if must_upload is not None:
+            break
+        # The cleanup job is removing this object; uploading now would be
+        # undone, so wait until its row is gone and claim a fresh one
+        await asyncio.sleep(CAS_CLAIM_RETRY_S)
+    else:
+        raise HTTPException(status_code=503, detail="Storage object is being cleaned up; retry")
+    if not must_upload:
+        # Already referenced by a segment: the bytes are in storage
+        _count_dedup(blob)
+        return
+    # Same name, same bytes: overwrite whatever an earlier attempt left
+    await _put_object(blob, storage_path, content_type, upsert=True)
+
+
+async def _put_object(blob: bytes, storage_path: str, content_type: str, upsert: bool):
+    file_options = {"content-type": content_type}
+    if upsert:
+        file_options["upsert"] = "true"
+    try:
+        await run_blocking(
+            get_supabase().storage.from_("segments").upload,
+            path=storage_path,
+            file=blob,
+            file_options=file_options,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Storage upload failed: {e}")
+    metrics.inc("storage_uploads")
+    metrics.inc("storage_upload_bytes", len(blob))
+
+
+def _count_dedup(blob: bytes):
+    metrics.inc("storage_dedup_hits")
+    metrics.inc("storage_dedup_bytes", len(blob))
+
+
+async def _cas_object_referenced(storage_path: str) -> bool:
+    res = await run_blocking(
+        get_supabase().table("audio_objects").select("refcount").eq("path", storage_path).limit(1).execute
+    )
+    return bool(res.data) and res.data[0]["refcount"] > 0
+
+
+async def _collect_audio_objects() -> int:
+    """One cleanup pass; returns the number of objects removed."""
+    removed = 0
+    while True:
+        res = await run_blocking(
+            get_supabase().rpc(
+                "collect_audio_objects", {"grace_s": CAS_GC_GRACE_S, "max_objects": CAS_GC_BATCH}
+            ).execute
+        )
+        paths = res.data or []
+        if not paths:
+            return removed
+        try:
+            await run_blocking(get_supabase().storage.from_("segments").remove, paths)
+        except Exception as e:
+            # Their rows stay, so the next pass tries again
+            print("audio gc: storage remove failed:", e, paths)
+            await run_blocking(get_supabase().rpc("release_audio_objects", {"paths": paths}).execute)
+            raise
+        res = await run_blocking(get_supabase().rpc("forget_audio_objects", {"paths": paths}).execute)
+        skipped = res.data or []
+        if skipped:
+            # Referenced while being removed: their segments point at missing audio
+            print("audio gc: objects referenced during removal, audio lost:", skipped)
+            metrics.inc("storage_gc_lost", len(skipped))
+        removed += len(paths)
+        metrics.inc("storage_gc_removed", len(paths))
+
+
+async def _audio_gc_loop():
+    while True:
+        await asyncio.sleep(CAS_GC_INTERVAL_S)
+        try:
+            removed = await _collect_audio_objects()
+            if removed:
+                print("audio gc: removed", removed, "objects")
+        except Exception as e:
+            print("audio gc failed:", e)
+
+
 # ---------- Chunk upload & ASR ----------
+# Whisper rejects files over 25 MB. Uploads up to that size stay in memory
+# instead of being spooled to a temp file by the multipart parser.
+WHISPER_MAX_BYTES = 25 * 1024 * 1024
+MultiPartParser.max_file_size = WHISPER_MAX_BYTES
+# Larger segments are still accepted; they are split before ASR
+MAX_AUDIO_BYTES = int(os.getenv("MAX_AUDIO_BYTES", str(100 * 1024 * 1024)))
+
+# Segments longer than SPLIT_THRESHOLD_MS (or bigger than SPLIT_THRESHOLD_BYTES)
+# are cut at silences into ~SPLIT_CHUNK_MS sub-chunks, transcribed in parallel
+# and merged back into one text
+SPLIT_THRESHOLD_MS = int(os.getenv("SPLIT_THRESHOLD_MS", "45000"))
+SPLIT_THRESHOLD_BYTES = int(os.getenv("SPLIT_THRESHOLD_BYTES", str(8 * 1024 * 1024)))
+SPLIT_CHUNK_MS = int(os.getenv("SPLIT_CHUNK_MS", "30000"))
+SPLIT_OVERLAP_MS = int(os.getenv("SPLIT_OVERLAP_MS", "500"))
+SPLIT_CONCURRENCY = int(os.getenv("SPLIT_CONCURRENCY", "16"))
+
+transcript_cache = TranscriptCache(
+    db_path=os.getenv("TRANSCRIPT_CACHE_DB", "transcript_cache.sqlite3"),
+    max_entries=int(os.getenv("TRANSCRIPT_CACHE_SIZE", "1024")),
+)
+
+
+@dataclass
+class AsrInput:
+    audio: bytes
+    filename: str
+    content_type: str
+    samples: Optional[np.ndarray] = None  # `audio` decoded to 16 kHz PCM, when already available
+
+
+# ---------- ASR admission ----------
+# Every ASR call goes through the scheduler (scheduler.py): global and
+# per-session concurrency limits, round-robin across sessions, and pacing to
+# the provider quota (ASR_RATE_PER_MIN, 0 = unpaced). Calls that would wait
+# longer than ASR_MAX_WAIT_S are answered with 429 and Retry-After.
+# ASR_SESSION_CONCURRENCY and ASR_SESSION_QUEUE limit a session's uploaded
+# segments and stream windows; the sub-chunks of a split segment and the items
+# of a bulk import are bounded by SPLIT_CONCURRENCY and BULK_CONCURRENCY and
+# only count against ASR_MAX_CONCURRENCY and ASR_MAX_QUEUE.
+asr_scheduler = AsrScheduler(
+    max_concurrency=int(os.getenv("ASR_MAX_CONCURRENCY", "16")),
+    per_session=int(os.getenv("ASR_SESSION_CONCURRENCY", "8")),
+    rate_per_s=float(os.getenv("ASR_RATE_PER_MIN", "0")) / 60,
+    burst=int(os.getenv("ASR_BURST", "0")),
+    max_queue=int(os.getenv("ASR_MAX_QUEUE", "256")),
+    max_session_queue=int(os.getenv("ASR_SESSION_QUEUE", "32")),
+    max_wait_s=float(os.getenv("ASR_MAX_WAIT_S", "30")),
+)
+# Async jobs queue as one session: a backlog of them gets one session's share
+JOBS_SESSION = "async-jobs"
+
+
+async def _asr_transcribe(
+    session_id: str,
+    audio: bytes,
+    filename: str,
+    content_type: str,
+    language_code: str,
+    background: bool = False,
+    capped: bool = True,
+) -> Optional[str]:
+    return await asr_scheduler.run(
+        session_id, lambda: asr.transcribe(audio, filename, content_type, language_code), background, capped
+    )
+
+
+def _overloaded(e: Overloaded) -> HTTPException:
+    return HTTPException(
+        status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after_s))}
+    )
+
+
+async def _transcribe_audio(
+    inp: AsrInput,
+    language_code: str,
+    duration_ms: Optional[int] = None,
+    session_id: str = "",
+    background: bool = False,
+    capped: bool = True,
+) -> Optional[str]:
+    # The sub-chunks of a split segment are bounded by SPLIT_CONCURRENCY and
+    # only take global ASR slots, so the per-session limit applies to the
+    # segment as it was uploaded rather than to each piece of it
+    async def transcribe(audio: bytes, filename: str, content_type: str, capped: bool = capped) -> Optional[str]:
+        return await _asr_transcribe(session_id, audio, filename, content_type, language_code, background, capped)
+
+    samples = inp.samples
+    if samples is not None:
+        duration_ms = max(duration_ms or 0, audio_duration_ms(samples))
+    if (duration_ms or 0) <= SPLIT_THRESHOLD_MS and len(inp.audio) <= SPLIT_THRESHOLD_BYTES:
+        return await transcribe(inp.audio, inp.filename, inp.content_type)
+
+    if samples is None:
+        try:
+            samples = await run_blocking(decode_pcm, inp.audio)
+        except AudioDecodeError as e:
+            if len(inp.audio) > WHISPER_MAX_BYTES:
+                raise
+            print("split skipped:", e)
+            return await transcribe(inp.audio, inp.filename, inp.content_type)
+
+    chunks = plan_chunks(samples, chunk_ms=SPLIT_CHUNK_MS, overlap_ms=SPLIT_OVERLAP_MS)
+    if len(chunks) == 1:
+        return await transcribe(inp.audio, inp.filename, inp.content_type)
+
+    sem = asyncio.Semaphore(SPLIT_CONCURRENCY)
+
+    async def one(start: int, end: int):
+        async with sem:
+            return await transcribe(encode_wav(samples[start:end]), "chunk.wav", "audio/wav", capped=False)
+
+    tasks = [asyncio.ensure_future(one(a, b)) for a, b in chunks]
+    try:
+        texts = await asyncio.gather(*tasks)
+    finally:
+        # Once one sub-chunk fails (a 429, say) the segment has failed; stop
+        # the others instead of spending ASR quota on them
+        for task in tasks:
+            task.cancel()
+    return merge_texts(texts)
+
+
+async def _store_and_transcribe(
+    blob: bytes,
+    storage_path: str,
+    content_type: str,
+    inp: AsrInput,
+    language_code: str,
+    session_id: str,
+    upsert: bool = False,
+    duration_ms: Optional[int] = None,
+    background: bool = False,
+    capped: bool = True,
+):
+    # 1) Store raw chunk in Supabase Storage and 2) transcribe via the ASR backend,
+    # concurrently.
+    async def upload():
+        with metrics.stage("storage", language_code):
+            await _upload_audio(blob, storage_path, content_type, upsert)
+
+    async def transcribe():
+        audio_ms = audio_duration_ms(inp.samples) if inp.samples is not None else duration_ms
+        t0 = time.perf_counter()
+        with metrics.stage("asr", language_code):
+            try:
+                text = await _transcribe_audio(inp, language_code, duration_ms, session_id, background, capped)
+            except Overloaded as e:
+                raise _overloaded(e)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Transcription failed: {e}")
+        if audio_ms:
+            rtf = (time.perf_counter() - t0) / (audio_ms / 1000)
+            metrics.observe("asr_real_time_factor", rtf, metrics.RTF_BUCKETS, language=language_code)
+        return text
+
+    _, text = await asyncio.gather(upload(), transcribe())
+    return text
+
+
+# ---------- Audio preparation: VAD + transcoding ----------
+# Each chunk is decoded once to 16 kHz mono in a worker process.
+#
+# VAD: chunks with no speech are recorded with an empty transcript and never
+# reach storage or ASR; leading/trailing silence is cut from what ASR receives
+# when that removes at least VAD_MIN_TRIM_MS.
+#
+# Transcoding (TRANSCODE_ENABLED): storage gets a speech-tuned Ogg/Opus file
+# instead of the browser's upload, and ASR gets TRANSCODE_ASR_FORMAT (ogg, flac
+# or wav) of the same 16 kHz mono audio.
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") == "1"
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "-45"))
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "250"))
+VAD_MIN_TRIM_MS = int(os.getenv("VAD_MIN_TRIM_MS", "1000"))
+TRANSCODE_ENABLED = os.getenv("TRANSCODE_ENABLED", "0") == "1"
+TRANSCODE_ASR_FORMAT = os.getenv("TRANSCODE_ASR_FORMAT", "ogg")
+TRANSCODE_BITRATE = os.getenv("TRANSCODE_BITRATE", "24k")
+
+_AUDIO_FORMATS = {"ogg": "audio/ogg", "flac": "audio/flac", "wav": "audio/wav"}
+
+
+@dataclass
+class PreparedChunk:
+    stored: bytes  # what goes to storage
+    stored_ext: str
+    stored_type: str
+    inp: AsrInput  # what goes to ASR
+
+
+async def _prepare_chunk(blob: bytes, ext: str, content_type: str) -> Optional[PreparedChunk]:
+    """Returns None when VAD finds no speech. If the audio cannot be decoded,
+    the upload goes to storage and ASR untouched."""
+    chunk = PreparedChunk(blob, ext, content_type, AsrInput(blob, f"segment{ext}", content_type))
+    if not (VAD_ENABLED or TRANSCODE_ENABLED):
+        return chunk
+    try:
+        with metrics.stage("prepare"):
+            prepared = await run_cpu(
+                prepare_audio, blob,
+                vad=VAD_ENABLED,
+                threshold_db=VAD_THRESHOLD_DB,
+                min_speech_ms=VAD_MIN_SPEECH_MS,
+                min_trim_ms=VAD_MIN_TRIM_MS,
+                transcode=TRANSCODE_ENABLED,
+                asr_format=TRANSCODE_ASR_FORMAT,
+                archive_bitrate=TRANSCODE_BITRATE,
+            )
+    except AudioDecodeError as e:
+        print("audio prep skipped:", e)
+        return chunk
+
+    if prepared.speech is None:
+        metrics.inc("vad_silent_chunks")
+        metrics.inc("vad_saved_asr_seconds", prepared.duration_ms / 1000)
+        return None
+    if prepared.trimmed_ms:
+        metrics.inc("vad_saved_asr_seconds", prepared.trimmed_ms / 1000)
+
+    # The decoded samples are reused if the segment needs splitting
+    chunk.inp.samples = prepared.asr_samples
+    if prepared.asr_audio is not None:
+        fmt = prepared.asr_format
+        chunk.inp = AsrInput(prepared.asr_audio, f"segment.{fmt}", _AUDIO_FORMATS[fmt], prepared.asr_samples)
+    if prepared.archive is not None:
+        chunk.stored, chunk.stored_ext, chunk.stored_type = prepared.archive, ".ogg", "audio/ogg"
+        metrics.inc("transcode_bytes_in", len(blob))
+        metrics.inc("transcode_bytes_stored", len(prepared.archive))
+    return chunk
+
+
+def _storage_path(meta: ChunkMetadata, ext: str, blob: Optional[bytes] = None) -> str:
+    # `blob` is the stored bytes, when known; needed for the cas layout
+    if STORAGE_LAYOUT == "cas" and blob is not None:
+        return _cas_path(blob, ext)
+    ts = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    return f"sessions/{meta.session_id}/{ts}-{meta.start_ms}-{meta.end_ms}{ext}"
+
+
+def _segment_row(meta: ChunkMetadata, storage_path: str, idempotency_key: str) -> dict:
+    return {
+        "session_id": meta.session_id,
+        "language_code": meta.language_code,
+        "start_ms": meta.start_ms,
+        "end_ms": meta.end_ms,
+        "asr_text": None,
+        "audio_path": storage_path,
+        "confidence": None,
+        "idempotency_key": idempotency_key,
+    }
+
+
+# ---------- Async mode: background transcription ----------
+async def _run_transcription_job(job: Job):
+    with tracing.trace(
+        "transcription_job", segment_id=job.segment_id, language_code=job.language_code, attempt=job.attempts
+    ):
+        await _transcribe_job(job)
+
+
+async def _transcribe_job(job: Job):
+    # The job holds the upload as received; VAD and transcoding happen here,
+    # off the request path
+    base, ext = os.path.splitext(job.storage_path)
+    chunk = await _prepare_chunk(job.audio, ext, job.content_type)
+    if chunk is None:
+        update = {"asr_text": "", "audio_path": "", "status": "done"}
+    else:
+        storage_path = base + chunk.stored_ext
+        if STORAGE_LAYOUT == "cas":
+            storage_path = _cas_path(chunk.stored, chunk.stored_ext)
+        # Retries re-upload with upsert, since an earlier attempt may have stored the object
+        text = await _store_and_transcribe(
+            chunk.stored, storage_path, chunk.stored_type, chunk.inp, job.language_code, JOBS_SESSION,
+            upsert=True, background=True,
+        )
+        update = {"asr_text": text, "audio_path": storage_path, "status": "done"}
+    await run_blocking(get_supabase().table("segments").update(update).eq("id", job.segment_id).execute)
+    if update["asr_text"] is not None:
+        key = audio_key(job.audio, job.language_code, asr.model)
+        await run_blocking(transcript_cache.put, key, update["asr_text"], update["audio_path"])
+
+
+async def _fail_transcription_job(job: Job, err: Exception):
+    await run_blocking(
+        get_supabase().table("segments").update({"status": "failed"}).eq("id", job.segment_id).execute
+    )
+
+
+jobs = JobQueue(
+    handler=_run_transcription_job,
+    on_failure=_fail_transcription_job,
+    db_path=os.getenv("JOBS_DB_PATH", "jobs.sqlite3"),
+    concurrency=int(os.getenv("JOB_WORKERS", "4")),
+    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "5")),
+    backoff_s=float(os.getenv("JOB_BACKOFF_S", "2")),
+)
+
+
+# ---------- Idempotency ----------
+SEGMENT_COLUMNS = "id, asr_text, audio_path, status"
+
+# Uploads currently being processed in this worker, by (session_id, idempotency
+# key); keys are client-generated, so they are only unique within a session.
+# A concurrent duplicate waits on the first request instead of redoing the work.
+_inflight: Dict[Tuple[str, str], "asyncio.Future[Optional[SegmentResponse]]"] = {}
+
+
+def _segment_response(row: dict) -> SegmentResponse:
+    return SegmentResponse(
+        segment_id=row["id"],
+        text=row.get("asr_text"),
+        audio_path=row["audio_path"],
+        status=row.get("status") or "done",
+    )
+
+
+async def _find_segment(session_id: str, idempotency_key: str) -> Optional[dict]:
+    with metrics.stage("db_lookup"):
+        res = await run_blocking(
+            get_supabase().table("segments")
+            .select(SEGMENT_COLUMNS)
+            .eq("session_id", session_id)
+            .eq("idempotency_key", idempotency_key)
+            .limit(1)
+            .execute
+        )
+    return res.data[0] if res.data else None
+
+
+async def _insert_segment(seg_row: dict) -> Tuple[dict, bool]:
+    """Insert a segment row, or return the existing row for the same
+    (session_id, start_ms, end_ms). Returns (row, created)."""
+    with metrics.stage("db_insert", seg_row["language_code"]):
+        ins = await run_blocking(
+            get_supabase().table("segments")
+            .upsert(seg_row, on_conflict="session_id,start_ms,end_ms", ignore_duplicates=True)
+            .execute
+        )
+    if ins.data:
+        return ins.data[0], True
+
+    # Lost the race to another worker; the unique index kept their row
+    return await _existing_segment(seg_row), False
+
+
+async def _existing_segment(seg_row: dict) -> dict:
+    existing = await _find_segment(seg_row["session_id"], seg_row["idempotency_key"])
+    if existing is None:
+        res = await run_blocking(
+            get_supabase().table("segments")
+            .select(SEGMENT_COLUMNS)
+            .eq("session_id", seg_row["session_id"])
+            .eq("start_ms", seg_row["start_ms"])
+            .eq("end_ms", seg_row["end_ms"])
+            .limit(1)
+            .execute
+        )
+        existing = res.data[0] if res.data else None
+    if existing is None:
+        raise HTTPException(status_code=500, detail="Failed to record segment")
+    return existing
+
+
 @app.post("/api/upload-chunk", response_model=SegmentResponse)
 async def upload_chunk(
     metadata_json: str = Form(...),
     file: UploadFile = File(...),
+    async_mode: bool = Form(False),
+    idempotency_key: Optional[str] = Header(None),
 ):
     # Parse metadata
     try:
@@ -76,74 +633,500 @@ async def upload_chunk(
     if not meta.session_id:
         raise HTTPException(status_code=400, detail="Missing session_id")
 
-    blob = await file.read()
-    print("upload_chunk:", "bytes=", len(blob), "content_type=", file.content_type, "filename=", file.filename)
-    if not blob:
+    # Without an Idempotency-Key header, a chunk is identified by its time range
+    key = idempotency_key or f"{meta.session_id}:{meta.start_ms}:{meta.end_ms}"
+
+    pending = _inflight.get((meta.session_id, key))
+    if pending is not None:
+        result = await asyncio.shield(pending)
+        if result is not None:
+            return result
+        # The first attempt failed; fall through and try again ourselves
+
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[(meta.session_id, key)] = fut
+    try:
+        with tracing.trace(
+            "upload_chunk",
+            session_id=meta.session_id,
+            language_code=meta.language_code,
+            start_ms=meta.start_ms,
+            end_ms=meta.end_ms,
+            bytes=file.size,
+            async_mode=async_mode,
+        ), metrics.stage("total", meta.language_code):
+            result = await _process_chunk(meta, file, key, async_mode)
+            tracing.annotate(segment_id=result.segment_id, status=result.status)
+    except BaseException:
+        fut.set_result(None)
+        raise
+    else:
+        fut.set_result(result)
+        return result
+    finally:
+        _inflight.pop((meta.session_id, key), None)
+
+
+async def _process_chunk(meta: ChunkMetadata, file: UploadFile, key: str, async_mode: bool) -> SegmentResponse:
+    # A retry of a chunk we already recorded: return the original segment
+    existing = await _find_segment(meta.session_id, key)
+    if existing is not None:
+        return _segment_response(existing)
+
+    print("upload_chunk:", "bytes=", file.size, "content_type=", file.content_type, "filename=", file.filename)
+    metrics.observe("chunk_audio_seconds", (meta.end_ms - meta.start_ms) / 1000, metrics.AUDIO_SECONDS_BUCKETS)
+    blob, ext, content_type = await _read_upload(file)
+    seg_row = _segment_row(meta, _storage_path(meta, ext), key)
+
+    if not async_mode:
+        await _transcribe_segment(meta, seg_row, blob, ext, content_type)
+    elif not await _fill_from_cache(seg_row, blob):
+        # Async mode: record a pending row, hand preparation, storage and ASR to
+        # the job queue and return right away. The client polls /api/segment/{segment_id}.
+        seg_row["status"] = "pending"
+        row, created = await _insert_segment(seg_row)
+        if created:
+            await jobs.enqueue(
+                row["id"], seg_row["audio_path"], meta.language_code, f"segment{ext}", content_type, blob
+            )
+        return _segment_response(row)
+
+    # 3) Insert DB row
+    row, _ = await _insert_segment(seg_row)
+    return _segment_response(row)
+
+
+async def _read_upload(file: UploadFile) -> Tuple[bytes, str, str]:
+    # The form parser has already buffered the body (in memory up to
+    # MultiPartParser.max_file_size, spooled to disk beyond); reject by size
+    # before copying it out
+    if not file.size:
         raise HTTPException(status_code=400, detail="Empty audio blob")
+    if file.size > MAX_AUDIO_BYTES:
+        raise HTTPException(status_code=413, detail=f"Audio blob exceeds {MAX_AUDIO_BYTES} bytes")
+    metrics.observe("chunk_request_bytes", file.size, metrics.BYTES_BUCKETS)
+
+    # Read once; storage, Whisper and the audio worker processes share the same
+    # bytes object. They need real bytes (the SDKs send them, and run_cpu
+    # pickles them), so the spool is copied rather than viewed, then closed
+    # so the two copies only overlap for the read
+    with metrics.stage("read"):
+        blob = await file.read()
+    await file.close()
 
     # Choose extension
     ext = ".webm"
     if file.filename and "." in file.filename:
         ext = "." + file.filename.rsplit(".", 1)[-1].lower()
+    content_type = file.content_type or "application/octet-stream"
+    return blob, ext, content_type
+
+
+async def _fill_from_cache(seg_row: dict, blob: bytes) -> bool:
+    # Identical audio seen before: reuse its transcript and storage object
+    with metrics.stage("cache"):
+        cached = await run_blocking(transcript_cache.get, audio_key(blob, seg_row["language_code"], asr.model))
+    if cached is None:
+        return False
+    text, path = cached
+    if path.startswith(CAS_PREFIX) and not await _cas_object_referenced(path):
+        # Every segment using the object was deleted; cleanup may have removed it
+        return False
+    seg_row["asr_text"], seg_row["audio_path"] = text, path
+    return True
+
+
+async def _transcribe_segment(
+    meta: ChunkMetadata, seg_row: dict, blob: bytes, ext: str, content_type: str, capped: bool = True,
+):
+    """Fill in seg_row's transcript and audio_path, from the transcript cache or
+    by storing and transcribing the audio."""
+    if await _fill_from_cache(seg_row, blob):
+        return
+
+    chunk = await _prepare_chunk(blob, ext, content_type)
+    if chunk is None:
+        seg_row["asr_text"], seg_row["audio_path"] = "", ""
+        return
+    if chunk.stored_ext != ext or STORAGE_LAYOUT == "cas":
+        seg_row["audio_path"] = _storage_path(meta, chunk.stored_ext, chunk.stored)
+
+    text = await _store_and_transcribe(
+        chunk.stored, seg_row["audio_path"], chunk.stored_type, chunk.inp, meta.language_code, meta.session_id,
+        duration_ms=meta.end_ms - meta.start_ms, capped=capped,
+    )
+    if text is not None:
+        key = audio_key(blob, meta.language_code, asr.model)
+        await run_blocking(transcript_cache.put, key, text, seg_row["audio_path"])
+    seg_row["asr_text"] = text
+
+
+@app.get("/api/segment/{segment_id}", response_model=SegmentResponse)
+def get_segment(segment_id: str):
+    res = (
+        get_supabase().table("segments")
+        .select(SEGMENT_COLUMNS)
+        .eq("id", segment_id)
+        .limit(1)
+        .execute()
+    )
+    if not res.data:
+        raise HTTPException(status_code=404, detail="Segment not found")
+    return _segment_response(res.data[0])
+
+
+# ---------- Segment listing ----------
+# Keyset pagination in (start_ms, end_ms) order, the order of
+# segments_session_range_key: every page is one index range scan starting
+# after the cursor, however deep, where an offset page would re-read all the
+# rows before it.
+SEGMENT_PAGE_MAX = int(os.getenv("SEGMENT_PAGE_MAX", "500"))
 
-    # 1) Store raw chunk in Supabase Storage
-    ts = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-    storage_path = f"sessions/{meta.session_id}/{ts}-{meta.start_ms}-{meta.end_ms}{ext}"
 
+def _parse_cursor(cursor: str) -> Tuple[int, int]:
     try:
-        supabase.storage.from_("segments").upload(
-            path=storage_path,
-            file=blob,
-            file_options={"content-type": file.content_type or "application/octet-stream"},
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Storage upload failed: {e}")
+        start_ms, end_ms = cursor.split(":")
+        return int(start_ms), int(end_ms)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 
-    # 2) Transcribe via OpenAI Whisper
-    # On Windows, reopen the temp file to avoid file handle issues.
-    tmp_path = None
-    text = None
+@app.get("/api/session/{session_id}/segments", response_model=SegmentPage)
+def list_segments(
+    session_id: str,
+    limit: int = Query(100, ge=1, le=SEGMENT_PAGE_MAX),
+    cursor: Optional[str] = None,
+):
+    q = (
+        get_supabase().table("segments")
+        .select(SEGMENT_COLUMNS + ", language_code, start_ms, end_ms")
+        .eq("session_id", session_id)
+    )
+    if cursor:
+        start_ms, end_ms = _parse_cursor(cursor)
+        # The gte bounds the index scan; the or() drops rows up to the cursor
+        q = q.gte("start_ms", start_ms).or_(f"start_ms.gt.{start_ms},and(start_ms.eq.{start_ms},end_ms.gt.{end_ms})")
+    # One row past the page tells whether there is a next one
+    rows = q.order("start_ms").order("end_ms").limit(limit + 1).execute().data or []
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1]['start_ms']}:{rows[-1]['end_ms']}"
+    return SegmentPage(
+        segments=[
+            SegmentListItem(
+                segment_id=r["id"],
+                text=r.get("asr_text"),
+                audio_path=r["audio_path"],
+                status=r.get("status") or "done",
+                language_code=r["language_code"],
+                start_ms=r["start_ms"],
+                end_ms=r["end_ms"],
+            )
+            for r in rows
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+# ---------- Bulk ingestion ----------
+# For offline re-imports and clients that buffer while offline: many chunks in
+# one multipart request, with metadata_json a JSON array matched to `files` by
+# position. Each item goes through the upload-chunk pipeline, up to
+# BULK_CONCURRENCY at a time, and all new rows are written with one multi-row
+# upsert (row by row if that statement fails). Items succeed or fail
+# independently.
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "500"))
+# The form parser holds every part of up to 25 MB in memory before the handler
+# (and the BULK_MAX_ITEMS check) runs, so the request body as a whole is capped
+# up front from its Content-Length
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(200 * 1024 * 1024)))
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "16"))
+BULK_LOOKUP_BATCH = 100  # keys per `in` filter; keeps the query string short
+
+_bulk_metadata = TypeAdapter(List[BulkChunkMetadata])
+
+
+@app.middleware("http")
+async def limit_bulk_body(request: Request, call_next):
+    if request.url.path == "/api/upload-chunks" and request.method == "POST":
+        length = request.headers.get("content-length")
+        if length is None or not length.isdigit():
+            return JSONResponse({"detail": "Content-Length required"}, status_code=411)
+        if int(length) > BULK_MAX_BYTES:
+            return JSONResponse({"detail": f"Request body exceeds {BULK_MAX_BYTES} bytes"}, status_code=413)
+    return await call_next(request)
+
+
+async def _find_segments(keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], dict]:
+    # keys are (session_id, idempotency_key); one lookup per session and batch
+    by_session: Dict[str, List[str]] = {}
+    for session_id, key in keys:
+        by_session.setdefault(session_id, []).append(key)
+    found = {}
+    for session_id, session_keys in by_session.items():
+        for i in range(0, len(session_keys), BULK_LOOKUP_BATCH):
+            res = await run_blocking(
+                get_supabase().table("segments")
+                .select(SEGMENT_COLUMNS + ", idempotency_key")
+                .eq("session_id", session_id)
+                .in_("idempotency_key", session_keys[i:i + BULK_LOOKUP_BATCH])
+                .execute
+            )
+            for row in res.data or []:
+                found[(session_id, row["idempotency_key"])] = row
+    return found
+
+
+async def _insert_segments(seg_rows: List[dict]) -> List[Union[dict, BaseException]]:
+    """Multi-row _insert_segment: one upsert, then a lookup for any row that
+    lost a conflict. Returns, in input order, each row or the error that kept
+    it from being recorded."""
+    if not seg_rows:
+        return []
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
-            tmp.write(blob)
-            tmp.flush()
-            tmp_path = tmp.name
-
-        with open(tmp_path, "rb") as audio_f:
-            transcription = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_f,
-                language=meta.language_code,
+        with metrics.stage("db_insert"):
+            ins = await run_blocking(
+                get_supabase().table("segments")
+                .upsert(seg_rows, on_conflict="session_id,start_ms,end_ms", ignore_duplicates=True)
+                .execute
             )
-            text = getattr(transcription, "text", None)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Transcription failed: {e}")
+        # One bad row (unknown session, a key taken by another range) fails
+        # the whole statement; retry row by row so only that item fails
+        print("bulk insert failed, retrying rows one by one:", e)
+        metrics.inc("bulk_insert_fallbacks")
+        outcomes = await asyncio.gather(*(_insert_segment(r) for r in seg_rows), return_exceptions=True)
+        return [out if isinstance(out, BaseException) else out[0] for out in outcomes]
+
+    def triple(r):
+        return str(r["session_id"]), int(r["start_ms"]), int(r["end_ms"])
+
+    inserted = {triple(r): r for r in ins.data or []}
+
+    async def one(seg_row):
+        row = inserted.get(triple(seg_row))
+        return row if row is not None else await _existing_segment(seg_row)
+
+    return await asyncio.gather(*(one(r) for r in seg_rows), return_exceptions=True)
+
+
+def _bulk_error(index: int, err: BaseException) -> BulkChunkResult:
+    if isinstance(err, HTTPException):
+        return BulkChunkResult(index=index, status_code=err.status_code, error=str(err.detail))
+    return BulkChunkResult(index=index, status_code=500, error=str(err))
+
+
+@app.post("/api/upload-chunks", response_model=BulkUploadResponse)
+async def upload_chunks(
+    metadata_json: str = Form(...),
+    files: List[UploadFile] = File(...),
+):
+    try:
+        metas = _bulk_metadata.validate_json(metadata_json)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Bad metadata: {e}")
+    if len(metas) != len(files):
+        raise HTTPException(status_code=400, detail=f"{len(metas)} metadata items but {len(files)} files")
+    if len(metas) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"More than {BULK_MAX_ITEMS} items")
+    print("upload_chunks:", "items=", len(metas), "bytes=", sum(f.size or 0 for f in files))
+
+    with tracing.trace(
+        "upload_chunks", items=len(metas), session_ids=sorted({m.session_id for m in metas})
+    ), metrics.stage("bulk_total"):
+        return await _ingest_bulk(metas, files)
+
+
+async def _ingest_bulk(metas: List[BulkChunkMetadata], files: List[UploadFile]) -> BulkUploadResponse:
+    keys = [(m.session_id, m.idempotency_key or f"{m.session_id}:{m.start_ms}:{m.end_ms}") for m in metas]
+    results: List[Optional[BulkChunkResult]] = [None] * len(metas)
+
+    # Retries of items we already recorded
+    existing = await _find_segments(list(dict.fromkeys(keys)))
+    owner: Dict[Tuple[str, str], int] = {}  # key -> index of the item that does the work
+    for i, key in enumerate(keys):
+        if key in existing:
+            results[i] = BulkChunkResult(index=i, status_code=200, segment=_segment_response(existing[key]))
+        elif key not in owner:
+            owner[key] = i
+
+    # Concurrent single uploads of these keys wait on us, and we on theirs
+    waiting = {key: _inflight[key] for key in owner if key in _inflight}
+    mine = {key: asyncio.get_running_loop().create_future() for key in owner if key not in waiting}
+    _inflight.update(mine)
+
+    sem = asyncio.Semaphore(BULK_CONCURRENCY)
+
+    async def build(i: int):
+        key = keys[i]
+        if key in waiting:
+            result = await asyncio.shield(waiting[key])
+            if result is not None:
+                return result
+        async with sem:
+            meta = metas[i]
+            blob, ext, content_type = await _read_upload(files[i])
+            seg_row = _segment_row(meta, _storage_path(meta, ext), key[1])
+            # BULK_CONCURRENCY bounds the items, not the per-session limit
+            await _transcribe_segment(meta, seg_row, blob, ext, content_type, capped=False)
+            return seg_row
+
+    try:
+        todo = list(owner.values())
+        outcomes = await asyncio.gather(*(build(i) for i in todo), return_exceptions=True)
+
+        new_rows = []
+        for i, out in zip(todo, outcomes):
+            if isinstance(out, BaseException):
+                results[i] = _bulk_error(i, out)
+            elif isinstance(out, SegmentResponse):
+                results[i] = BulkChunkResult(index=i, status_code=200, segment=out)
+            else:
+                new_rows.append((i, out))
+
+        rows = await _insert_segments([row for _, row in new_rows])
+        for (i, _), row in zip(new_rows, rows):
+            if isinstance(row, HTTPException):
+                results[i] = _bulk_error(i, row)
+            elif isinstance(row, BaseException):
+                results[i] = _bulk_error(i, HTTPException(status_code=500, detail=f"Failed to record segment: {row}"))
+            else:
+                results[i] = BulkChunkResult(index=i, status_code=200, segment=_segment_response(row))
     finally:
-        if tmp_path and os.path.exists(tmp_path):
+        for key, fut in mine.items():
+            res = results[owner[key]]
+            fut.set_result(res.segment if res is not None else None)
+            _inflight.pop(key, None)
+
+    # Repeats of a key within the request share the first item's result
+    for i, key in enumerate(keys):
+        if results[i] is None:
+            results[i] = results[owner[key]].model_copy(update={"index": i})
+
+    failed = sum(1 for r in results if r.segment is None)
+    return BulkUploadResponse(results=results, succeeded=len(results) - failed, failed=failed)
+
+
+# ---------- Streaming transcription ----------
+STREAM_WINDOW_MS = int(os.getenv("STREAM_WINDOW_MS", "5000"))
+
+
+def _ext_for_mime(mime_type: str) -> str:
+    return ".ogg" if "ogg" in mime_type else ".webm"
+
+
+async def _transcribe_window(blob: bytes, mime_type: str, language_code: str, session_id: str) -> Optional[str]:
+    content_type = mime_type.split(";")[0]
+    return await _asr_transcribe(session_id, blob, f"window{_ext_for_mime(mime_type)}", content_type, language_code)
+
+
+async def _record_streamed_segment(
+    meta: ChunkMetadata, blob: bytes, mime_type: str, text: Optional[str]
+) -> SegmentResponse:
+    # Same row and storage layout as an uploaded chunk; the text is the joined partials
+    key = f"{meta.session_id}:{meta.start_ms}:{meta.end_ms}"
+    existing = await _find_segment(meta.session_id, key)
+    if existing is not None:
+        return _segment_response(existing)
+
+    if text is None:
+        # A window failed: hand the whole segment to the job queue, as in
+        # async mode, which stores it and transcribes it with retries
+        ext, content_type = _ext_for_mime(mime_type), mime_type.split(";")[0]
+        seg_row = _segment_row(meta, _storage_path(meta, ext), key)
+        seg_row["status"] = "pending"
+        row, created = await _insert_segment(seg_row)
+        if created:
+            await jobs.enqueue(row["id"], seg_row["audio_path"], meta.language_code, f"segment{ext}", content_type, blob)
+        return _segment_response(row)
+
+    storage_path = _storage_path(meta, _ext_for_mime(mime_type), blob)
+    await _upload_audio(blob, storage_path, mime_type.split(";")[0])
+    seg_row = _segment_row(meta, storage_path, key)
+    seg_row["asr_text"] = text
+    row, _ = await _insert_segment(seg_row)
+    return _segment_response(row)
+
+
+@app.websocket("/api/stream")
+async def stream(ws: WebSocket):
+    await ws.accept()
+    session = StreamSession(_transcribe_window, _record_streamed_segment, ws.send_json, STREAM_WINDOW_MS)
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+
+            control = None
             try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
+                if msg.get("bytes") is not None:
+                    await session.handle_audio(msg["bytes"])
+                else:
+                    control = StreamControl.model_validate_json(msg.get("text") or "")
+                    await session.handle_control(control)
+            except (ValidationError, ValueError) as e:
+                await ws.send_json({"type": "error", "detail": str(e)})
+                continue
 
-    # 3) Insert DB row
-    seg_row = {
-        "session_id": meta.session_id,
-        "language_code": meta.language_code,
-        "start_ms": meta.start_ms,
-        "end_ms": meta.end_ms,
-        "asr_text": text,
-        "audio_path": storage_path,
-        "confidence": None,
-    }
-    ins = supabase.table("segments").insert(seg_row).execute()
-    if not ins.data:
-        raise HTTPException(status_code=500, detail="Failed to record segment")
+            if control is not None and control.type == "stop":
+                await session.drain()
+                await ws.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
 
-    return SegmentResponse(
-        segment_id=ins.data[0]["id"],
-        text=text,
-        audio_path=storage_path,
-    )
+
+@app.get("/api/stats")
+def stats():
+    import http_pool
+
+    return {**metrics.snapshot(), "http_pools": http_pool.stats(), "asr_scheduler": asr_scheduler.snapshot()}
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    import http_pool
+
+    # Point-in-time values are sampled at scrape time
+    for client, s in http_pool.stats().items():
+        for field in ("in_flight", "waiting", "connections_open", "connections_idle"):
+            metrics.gauge(f"http_pool_{field}", s[field], client=client)
+        metrics.gauge("http_pool_max_in_flight", s["max_in_flight"], client=client)
+    metrics.gauge("async_jobs_backlog", jobs.backlog())
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# ---------- Runtime debug toggles ----------
+# Flip tracing/profiling without a redeploy. Settings are per process, so with
+# several workers repeat the call until each has been hit. Disabled (404)
+# unless DEBUG_TOKEN is set; callers send it as X-Debug-Token.
+DEBUG_TOKEN = os.getenv("DEBUG_TOKEN")
+
+
+def _check_debug_token(token: Optional[str]):
+    if not DEBUG_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(token or "", DEBUG_TOKEN):
+        raise HTTPException(status_code=403, detail="Bad debug token")
+
+
+@app.get("/api/debug/tracing")
+def get_debug_tracing(x_debug_token: Optional[str] = Header(None)):
+    _check_debug_token(x_debug_token)
+    return tracing.settings()
+
+
+@app.post("/api/debug/tracing")
+def set_debug_tracing(payload: DebugSettings, x_debug_token: Optional[str] = Header(None)):
+    _check_debug_token(x_debug_token)
+    try:
+        return tracing.configure(**payload.model_dump(exclude_none=True))
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/api/health")
@@ -151,6 +1134,82 @@ def health():
     return {"ok": True}
 
 
+# ---------- Warm-up and readiness ----------
+# /api/health is liveness: the process answers. /api/ready is readiness: the
+# SDK clients are built with connections open, the ASR backend is loaded and
+# the audio worker processes are spawned, so the next chunk pays none of it.
+# It goes back to 503 while Supabase or the provider is unreachable.
+# /api/started is the deploy gate (healthCheckPath in render.yaml): 503 until
+# the instance has been ready once, then 200 for as long as the process
+# answers, so a dependency outage does not get healthy instances restarted.
+#
+# All three are per process: with WEB_CONCURRENCY > 1 they answer for
+# whichever worker takes the request, so run one worker per instance.
+# uvicorn reads WEB_CONCURRENCY for --workers; more than 1 is only warned about
+# at startup, and CPU_WORKERS, ASR_MAX_CONCURRENCY and ASR_RATE_PER_MIN then
+# apply to each worker separately.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+WARMUP_COMPONENTS = ("supabase", "asr", "cpu_pool")
+_started_at = time.monotonic()
+_warm: Dict[str, str] = {}  # component -> "warming" | "ok" | "failed: ..."
+_warming: Optional[asyncio.Task] = None
+_was_ready = False
+
+
+async def _warm_component(name: str):
+    _warm[name] = "warming"
+    t0 = time.perf_counter()
+    try:
+        if name == "supabase":
+            await run_blocking(warmup_supabase)
+        elif name == "asr":
+            await asr.warmup()
+        elif VAD_ENABLED or TRANSCODE_ENABLED:
+            await prewarm_cpu_pool()
+    except Exception as e:
+        _warm[name] = f"failed: {e}"
+        print(f"{name} warmup failed:", e)
+    else:
+        _warm[name] = "ok"
+    metrics.gauge("warmup_seconds", time.perf_counter() - t0, component=name)
+
+
+async def _warm_up(components):
+    global _was_ready
+    await asyncio.gather(*(_warm_component(name) for name in components))
+    if all(_warm.get(name) == "ok" for name in WARMUP_COMPONENTS):
+        if not _was_ready:
+            print(f"ready in {time.monotonic() - _started_at:.2f}s after import")
+        _was_ready = True
+
+
+def _readiness() -> dict:
+    global _warming
+    failed = [name for name in WARMUP_COMPONENTS if _warm.get(name, "").startswith("failed")]
+    if failed and (_warming is None or _warming.done()):
+        # Retry what failed (Supabase or the provider briefly unreachable)
+        _warming = asyncio.create_task(_warm_up(failed))
+    return {
+        "ready": all(_warm.get(name) == "ok" for name in WARMUP_COMPONENTS),
+        "components": {name: _warm.get(name, "warming") for name in WARMUP_COMPONENTS},
+        "uptime_s": round(time.monotonic() - _started_at, 3),
+        "worker_pid": os.getpid(),
+    }
+
+
+@app.get("/api/ready")
+async def ready():
+    body = _readiness()
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+@app.get("/api/started")
+async def started():
+    body = _readiness()
+    body["started"] = _was_ready
+    return JSONResponse(body, status_code=200 if _was_ready else 503)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
@@ -0,0 +1,140 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Sequence, Tuple
+
+import tracing
+
+# Process-local metrics. Plain counters are exposed as JSON at /api/stats;
+# /api/metrics serves everything (counters, labelled counters, gauges and
+# histograms) in the Prometheus text format. Recording is a dict lookup and a
+# bisect under one lock, cheap enough to leave on in production.
+_lock = threading.Lock()
+_counters = defaultdict(float)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (16e3, 64e3, 256e3, 1e6, 4e6, 16e6, 64e6)
+AUDIO_SECONDS_BUCKETS = (1, 2, 5, 10, 20, 30, 60, 120, 300, 600)
+RTF_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5)
+
+_labelled: Dict[Tuple[str, Labels], float] = defaultdict(float)
+_gauges: Dict[Tuple[str, Labels], float] = {}
+_histograms: Dict[Tuple[str, Labels], "_Histogram"] = {}
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1.0):
+    with _lock:
+        _counters[name] += value
+
+
+def count(name: str, value: float = 1.0, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _labelled[key] += value
+
+
+def gauge(name: str, value: float, **labels):
+    with _lock:
+        _gauges[(name, _labels(labels))] = value
+
+
+def observe(name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = _Histogram(buckets)
+        h.counts[bisect_left(h.buckets, value)] += 1
+        h.sum += value
+        h.count += 1
+
+
+@contextmanager
+def stage(name: str, language: str = ""):
+    """Time a pipeline stage into chunk_stage_seconds{stage}; exceptions also
+    count towards chunk_stage_failures_total{stage, language}. Also a span of
+    the current trace, if any."""
+    t0 = time.perf_counter()
+    try:
+        with tracing.span(name):
+            yield
+    except BaseException:
+        count("chunk_stage_failures_total", stage=name, language=language or "unknown")
+        raise
+    finally:
+        observe("chunk_stage_seconds", time.perf_counter() - t0, stage=name)
+
+
+def snapshot() -> dict:
+    with _lock:
+        return dict(_counters)
+
+
+# ---------- Prometheus text exposition ----------
+def _fmt_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def render() -> str:
+    with _lock:
+        counters = dict(_counters)
+        labelled = dict(_labelled)
+        gauges = dict(_gauges)
+        histograms = {
+            k: (h.buckets, list(h.counts), h.sum, h.count) for k, h in _histograms.items()
+        }
+
+    lines = []
+    typed = set()
+
+    def header(name: str, kind: str):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for name in sorted(counters):
+        header(name, "counter")
+        lines.append(f"{name} {_fmt_value(counters[name])}")
+    for (name, labels) in sorted(labelled):
+        header(name, "counter")
+        lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(labelled[(name, labels)])}")
+    for (name, labels) in sorted(gauges):
+        header(name, "gauge")
+        lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(gauges[(name, labels)])}")
+    for (name, labels) in sorted(histograms):
+        buckets, counts, total, n = histograms[(name, labels)]
+        header(name, "histogram")
+        cumulative = 0
+        for le, c in zip(buckets + (float("inf"),), counts):
+            cumulative += c
+            le_s = "+Inf" if le == float("inf") else _fmt_value(le)
+            lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', le_s),))} {cumulative}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_value(total)}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {n}")
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Literal, Optional
 
 class StartSessionRequest(BaseModel):
     client_label: Optional[str] = None
@@ -15,10 +15,61 @@ class ChunkMetadata(BaseModel):
     start_ms: int
     end_ms: int
 
+class BulkChunkMetadata(ChunkMetadata):
+    # One item of /api/upload-chunks; plays the role of the Idempotency-Key header
+    idempotency_key: Optional[str] = None
+
+class StreamControl(BaseModel):
+    # In-band control message on /api/stream. Carries the ChunkMetadata fields;
+    # for switch/stop they describe the segment being closed.
+    type: Literal["start", "switch", "stop"]
+    session_id: str
+    language_code: str = Field(..., pattern=r"^[a-z]{2}(-[A-Za-z0-9]+)?$")
+    start_ms: int
+    end_ms: Optional[int] = None  # required for switch/stop
+    next_language_code: Optional[str] = Field(None, pattern=r"^[a-z]{2}(-[A-Za-z0-9]+)?$")  # switch only
+    frame_ms: int = 250  # MediaRecorder timeslice; used to measure window length
+    mime_type: str = "audio/webm"
+
+    def to_chunk_metadata(self) -> "ChunkMetadata":
+        return ChunkMetadata(
+            session_id=self.session_id,
+            language_code=self.language_code,
+            start_ms=self.start_ms,
+            end_ms=self.end_ms,
+        )
+
 class SegmentResponse(BaseModel):
     segment_id: str
     text: Optional[str] = None
     audio_path: str
+    status: str = "done"  # 'pending' | 'done' | 'failed'; 'pending' while queued for background transcription
+
+class SegmentListItem(SegmentResponse):
+    language_code: str
+    start_ms: int
+    end_ms: int
+
+class SegmentPage(BaseModel):
+    segments: List[SegmentListItem]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page; None on the last page
+
+class BulkChunkResult(BaseModel):
+    index: int  # position in the request
+    status_code: int  # what /api/upload-chunk would have answered for this item
+    segment: Optional[SegmentResponse] = None
+    error: Optional[str] = None
+
+class BulkUploadResponse(BaseModel):
+    results: List[BulkChunkResult]
+    succeeded: int
+    failed: int
+
+class DebugSettings(BaseModel):
+    # /api/debug/tracing; omitted fields are left unchanged
+    trace: Optional[bool] = None
+    profile: Optional[bool] = None
+    profile_slow_ms: Optional[int] = Field(None, ge=0)
 
 class EndSessionRequest(BaseModel):
     session_id: str
\ No newline at end of file
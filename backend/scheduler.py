@@ -0,0 +1,240 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, defaultdict, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set, TypeVar
+
+import metrics
+
+# Admission control in front of the ASR provider.
+#
+# Every ASR call asks for a slot first. A slot is granted when
+#   - fewer than max_concurrency calls are running overall,
+#   - fewer than per_session calls are running for the caller's session
+#     (calls made with capped=False, the sub-chunks of a split segment and
+#     the items of a bulk import, are bounded by their caller instead and
+#     only take global slots), and
+#   - the token bucket (rate_per_s, burst) has a token: provider quotas are
+#     requests per minute, so calls are paced instead of bursting into 429s.
+# Callers that cannot start wait in per-session queues, served round-robin,
+# so one session with a burst of chunks delays every other session by at
+# most one call per round instead of by its whole backlog.
+#
+# Waiting is bounded: a call is turned away with Overloaded (429 +
+# Retry-After at the API) when the queues are full, when its estimated wait
+# is over max_wait_s, or when it has waited max_wait_s. A provider 429 also
+# pauses the bucket for the provider's Retry-After and surfaces as
+# Overloaded.
+
+T = TypeVar("T")
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after_s: float):
+        super().__init__(f"ASR overloaded ({reason}); retry after {math.ceil(retry_after_s)}s")
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+def _provider_retry_after(err: BaseException) -> Optional[float]:
+    # openai.RateLimitError and friends: status_code 429, optional Retry-After
+    if getattr(err, "status_code", None) != 429:
+        return None
+    headers = getattr(getattr(err, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 1))
+    except ValueError:
+        return 1.0
+
+
+class AsrScheduler:
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        per_session: int = 8,
+        rate_per_s: float = 0.0,  # 0 = no pacing
+        burst: int = 0,  # bucket size; 0 = one second of rate_per_s
+        max_queue: int = 256,
+        max_session_queue: int = 32,
+        max_wait_s: float = 30.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.per_session = per_session
+        self.rate_per_s = rate_per_s
+        self.burst = burst or max(1, int(rate_per_s))
+        self.max_queue = max_queue
+        self.max_session_queue = max_session_queue
+        self.max_wait_s = max_wait_s
+
+        # Sessions with waiting calls, in round-robin order
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._queued = 0
+        self._running: Dict[str, int] = defaultdict(int)
+        self._active = 0
+        self._granted: Set[asyncio.Future] = set()  # slots held, by the waiter's future
+        self._uncapped: Set[asyncio.Future] = set()  # waiters not counted against their session
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._service_s = 1.0  # moving average of call time, for wait estimates
+
+    async def run(
+        self,
+        session_id: str,
+        call: Callable[[], Awaitable[T]],
+        background: bool = False,
+        capped: bool = True,
+    ) -> T:
+        """Run call() once a slot is free. Background calls (async jobs, which
+        have their own retries) wait as long as it takes instead of being
+        turned away. Uncapped calls skip the per-session limits; their caller
+        bounds how many it makes at once."""
+        t0 = time.monotonic()
+        grant = await self._acquire(session_id, None if background else self.max_wait_s, capped)
+        t1 = time.monotonic()
+        metrics.observe("asr_queue_wait_seconds", t1 - t0)
+        try:
+            return await call()
+        except Exception as e:
+            retry_after = _provider_retry_after(e)
+            if retry_after is None:
+                raise
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            raise self._rejected("provider_rate_limit", retry_after) from e
+        finally:
+            self._service_s = 0.8 * self._service_s + 0.2 * (time.monotonic() - t1)
+            self._release(session_id, grant)
+
+    def snapshot(self) -> dict:
+        return {"running": self._active, "queued": self._queued, "sessions_waiting": len(self._queues)}
+
+    # ---------- admission ----------
+    async def _acquire(self, session_id: str, max_wait_s: Optional[float], capped: bool = True) -> asyncio.Future:
+        # Returns the grant to hand back to _release
+        if max_wait_s is not None:
+            wait = self.estimated_wait_s()
+            if self._queued >= self.max_queue:
+                raise self._rejected("queue_full", wait)
+            if capped and len(self._queues.get(session_id, ())) >= self.max_session_queue:
+                raise self._rejected("session_queue_full", wait)
+            if wait > max_wait_s:
+                raise self._rejected("wait_estimate", wait)
+
+        fut = asyncio.get_running_loop().create_future()
+        if not capped:
+            self._uncapped.add(fut)
+        self._queues.setdefault(session_id, deque()).append(fut)
+        self._queued += 1
+        self._dispatch()
+        self._report()
+        try:
+            # Not wait_for: on 3.11 it swallows a cancel that lands as the
+            # future completes, and the cancelled caller would go on to run
+            async with asyncio.timeout(max_wait_s):
+                await fut
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut in self._granted:
+                # Granted just as we gave up
+                self._release(session_id, fut)
+            else:
+                self._unqueue(session_id, fut)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._rejected("wait_timeout", self.estimated_wait_s()) from None
+            raise
+        return fut
+
+    def estimated_wait_s(self) -> float:
+        # Time for the calls already queued to start
+        throughput = self.max_concurrency / max(self._service_s, 1e-3)
+        if self.rate_per_s:
+            throughput = min(throughput, self.rate_per_s)
+        return max(self._queued / throughput, self._paused_until - time.monotonic())
+
+    def _rejected(self, reason: str, retry_after_s: float) -> Overloaded:
+        metrics.count("asr_rejected_total", reason=reason)
+        return Overloaded(reason.replace("_", " "), max(retry_after_s, 1.0))
+
+    # ---------- dispatch ----------
+    def _token_wait_s(self) -> float:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if not self.rate_per_s:
+            return 0.0
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_per_s)
+        self._refilled_at = now
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate_per_s
+
+    def _dispatch(self):
+        while self._queues and self._active < self.max_concurrency:
+            # Next session, in round-robin order, that is under its own limit
+            # or whose next call does not count against it
+            session_id = next(
+                (
+                    s for s, q in self._queues.items()
+                    if q[0] in self._uncapped or self._running.get(s, 0) < self.per_session
+                ),
+                None,
+            )
+            if session_id is None:
+                return
+            wait = self._token_wait_s()
+            if wait > 0:
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(wait, self._on_timer)
+                return
+            queue = self._queues.pop(session_id)
+            fut = queue.popleft()
+            self._queued -= 1
+            if fut.done():
+                # The waiter was cancelled (or timed out) and has not taken
+                # itself out of the queue yet: drop it, keep the slot
+                self._uncapped.discard(fut)
+                if queue:
+                    self._queues[session_id] = queue
+                    self._queues.move_to_end(session_id, last=False)
+                continue
+            if queue:
+                self._queues[session_id] = queue  # to the back of the round
+            if self.rate_per_s:
+                self._tokens -= 1
+            if fut not in self._uncapped:
+                self._running[session_id] += 1
+            self._active += 1
+            self._granted.add(fut)
+            fut.set_result(None)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+        self._report()
+
+    def _release(self, session_id: str, grant: asyncio.Future):
+        # Once per grant, however many paths try to hand it back
+        if grant not in self._granted:
+            return
+        self._granted.discard(grant)
+        self._active -= 1
+        if grant in self._uncapped:
+            self._uncapped.discard(grant)
+        else:
+            self._running[session_id] -= 1
+            if not self._running[session_id]:
+                del self._running[session_id]
+        self._dispatch()
+        self._report()
+
+    def _unqueue(self, session_id: str, fut: asyncio.Future):
+        queue = self._queues.get(session_id)
+        self._uncapped.discard(fut)
+        if queue is not None and fut in queue:
+            queue.remove(fut)
+            self._queued -= 1
+            if not queue:
+                del self._queues[session_id]
+        self._report()
+
+    def _report(self):
+        metrics.gauge("asr_inflight", self._active)
+        metrics.gauge("asr_queue_depth", self._queued)
@@ -0,0 +1,90 @@
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from audio import FRAME_MS, SAMPLE_RATE, frame_energy_db
+
+# Splitting long segments for parallel transcription.
+#
+# Cuts are placed at the quietest frame inside a search window before each
+# chunk_ms boundary, so they fall between words where possible. Each
+# sub-chunk is padded with overlap_ms of audio on both sides; the words
+# transcribed twice in that overlap are removed again by merge_texts().
+
+
+def plan_chunks(
+    samples: np.ndarray,
+    chunk_ms: int = 30000,
+    search_ms: int = 5000,
+    overlap_ms: int = 500,
+) -> List[Tuple[int, int]]:
+    """Return (start_sample, end_sample) for each sub-chunk, in order."""
+    total = len(samples)
+    chunk = SAMPLE_RATE * chunk_ms // 1000
+    if total <= chunk:
+        return [(0, total)]
+
+    energy = frame_energy_db(samples)
+    frame = SAMPLE_RATE * FRAME_MS // 1000
+    search_frames = max(1, search_ms // FRAME_MS)
+
+    cuts = [0]
+    while total - cuts[-1] > chunk:
+        target_frame = (cuts[-1] + chunk) // frame
+        lo = max(cuts[-1] // frame + 1, target_frame - search_frames)
+        window = energy[lo:target_frame]
+        best = lo + int(np.argmin(window)) if len(window) else target_frame
+        cuts.append(best * frame + frame // 2)
+    cuts.append(total)
+
+    overlap = SAMPLE_RATE * overlap_ms // 1000
+    return [(max(0, a - overlap), min(total, b + overlap)) for a, b in zip(cuts, cuts[1:])]
+
+
+# English words (with apostrophes) and single CJK characters are one token each
+_TOKEN_RE = re.compile(r"[一-鿿]|[^\s一-鿿]+")
+_CJK_RE = re.compile(r"[一-鿿]")
+# CJK characters plus CJK/full-width punctuation: no space on either side
+_CJK_BOUNDARY_RE = re.compile(r"[　-〿一-鿿＀-￯]")
+_STRIP_RE = re.compile(r"[^\w一-鿿']+")
+
+
+def _norm(token: str) -> str:
+    return _STRIP_RE.sub("", token.lower())
+
+
+def _concat(left: str, right: str) -> str:
+    if not left or not right:
+        return left + right
+    if _CJK_BOUNDARY_RE.match(left[-1]) and _CJK_BOUNDARY_RE.match(right[0]):
+        return left + right
+    return left + " " + right
+
+
+def merge_texts(texts: List[Optional[str]], max_overlap_tokens: int = 12) -> str:
+    """Concatenate sub-chunk transcripts in order, dropping the longest run of
+    tokens at the start of each text that repeats the end of the previous one."""
+    out = ""
+    seen: List[str] = []
+    for text in texts:
+        tokens = _TOKEN_RE.findall(text or "")
+        if not tokens:
+            continue
+        tail = [_norm(t) for t in seen[-max_overlap_tokens:]]
+        head = [_norm(t) for t in tokens[:max_overlap_tokens]]
+        drop = 0
+        for k in range(min(len(tail), len(head)), 0, -1):
+            if tail[-k:] == head[:k] and any(head[:k]):
+                drop = k
+                break
+
+        if drop:
+            piece = ""
+            for tok in tokens[drop:]:
+                piece = _concat(piece, tok)
+        else:
+            piece = text.strip()
+        out = _concat(out, piece)
+        seen.extend(tokens[drop:])
+    return out
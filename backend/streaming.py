@@ -0,0 +1,156 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+from models import ChunkMetadata, SegmentResponse, StreamControl
+
+# Streaming transcription over /api/stream.
+#
+# The recorder sends audio frames as binary messages and language switches as
+# JSON control messages (StreamControl). Frames are cut into windows of about
+# window_ms; each full window is transcribed as soon as it fills and its text
+# is pushed back as a "partial". When a segment is closed (switch/stop) the
+# tail window is flushed, the whole segment is recorded like an upload-chunk
+# segment, and a "final" message carries the SegmentResponse. If a window's
+# ASR call failed (a 429 from the scheduler, a provider error) the segment is
+# still recorded, with text None: the caller transcribes the whole segment
+# again in the background and the final carries status "pending".
+#
+# MediaRecorder only writes the container header into the first frame of a
+# recording, so every window after the first is sent to ASR as
+# header + frames-since-last-cut.
+
+Transcribe = Callable[[bytes, str, str, str], Awaitable[Optional[str]]]  # audio, mime, language, session
+Persist = Callable[[ChunkMetadata, bytes, str, Optional[str]], Awaitable[SegmentResponse]]
+Send = Callable[[dict], Awaitable[None]]
+
+
+class StreamSegment:
+    def __init__(self, control: StreamControl):
+        self.session_id = control.session_id
+        self.language_code = control.language_code
+        self.start_ms = control.start_ms
+        self.frame_ms = control.frame_ms
+        self.mime_type = control.mime_type
+        self.frames: List[bytes] = []
+        self.cut_at = 0  # index of the first frame not yet sent to ASR
+        self.windows: List[asyncio.Task] = []
+
+    @property
+    def header(self) -> bytes:
+        return self.frames[0] if self.frames else b""
+
+    def pending_ms(self) -> int:
+        return (len(self.frames) - self.cut_at) * self.frame_ms
+
+    def cut(self) -> Optional[bytes]:
+        if self.cut_at >= len(self.frames):
+            return None
+        window = b"".join(self.frames[self.cut_at:])
+        if self.cut_at > 0:
+            window = self.header + window
+        self.cut_at = len(self.frames)
+        return window
+
+
+class StreamSession:
+    def __init__(self, transcribe: Transcribe, persist: Persist, send: Send, window_ms: int = 5000):
+        self.transcribe = transcribe
+        self.persist = persist
+        self.send = send
+        self.window_ms = window_ms
+        self.segment: Optional[StreamSegment] = None
+        self._closing: List[asyncio.Task] = []
+
+    async def handle_control(self, control: StreamControl):
+        if control.type == "start":
+            if self.segment is not None:
+                raise ValueError("segment already open; send switch or stop first")
+            self.segment = StreamSegment(control)
+            return
+
+        if self.segment is None:
+            raise ValueError(f"{control.type} without an open segment")
+        if control.end_ms is None:
+            raise ValueError(f"{control.type} requires end_ms")
+        if control.type == "switch" and not control.next_language_code:
+            raise ValueError("switch requires next_language_code")
+
+        closing = self.segment
+        self.segment = None
+        if control.type == "switch":
+            self.segment = StreamSegment(
+                control.model_copy(update={"language_code": control.next_language_code, "start_ms": control.end_ms})
+            )
+        # Finish the closed segment in the background so frames for the next
+        # one keep flowing while its tail window is transcribed
+        self._closing.append(asyncio.create_task(self._close(closing, control.to_chunk_metadata())))
+
+    async def handle_audio(self, data: bytes):
+        seg = self.segment
+        if seg is None:
+            raise ValueError("audio frame without an open segment")
+        seg.frames.append(data)
+        if seg.pending_ms() >= self.window_ms:
+            self._launch_window(seg)
+
+    async def drain(self):
+        """Wait until every closed segment has been recorded and its final sent."""
+        await asyncio.gather(*self._closing)
+        self._closing = []
+
+    async def close(self):
+        # Connection dropped: an open segment is abandoned, closed ones still finish
+        if self.segment is not None:
+            await asyncio.gather(*self.segment.windows, return_exceptions=True)
+            self.segment = None
+        await asyncio.gather(*self._closing, return_exceptions=True)
+
+    def _launch_window(self, seg: StreamSegment):
+        window_start_ms = seg.start_ms + seg.cut_at * seg.frame_ms
+        blob = seg.cut()
+        if blob is None:
+            return
+        previous = seg.windows[-1] if seg.windows else None
+        index = len(seg.windows)
+        seg.windows.append(asyncio.create_task(self._run_window(seg, index, window_start_ms, blob, previous)))
+
+    async def _run_window(self, seg, index, window_start_ms, blob, previous) -> Optional[str]:
+        text = await self.transcribe(blob, seg.mime_type, seg.language_code, seg.session_id)
+        # Partials go out in window order even if a later window finishes first
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        await self.send({
+            "type": "partial",
+            "session_id": seg.session_id,
+            "language_code": seg.language_code,
+            "start_ms": seg.start_ms,
+            "window": index,
+            "window_start_ms": window_start_ms,
+            "text": text,
+        })
+        return text
+
+    async def _close(self, seg: StreamSegment, meta: ChunkMetadata):
+        self._launch_window(seg)
+        if not seg.windows:
+            return
+        # Every window settles (and sends its partial) before the final or error
+        texts = await asyncio.gather(*seg.windows, return_exceptions=True)
+        failed = [t for t in texts if isinstance(t, BaseException)]
+        if failed:
+            print("stream: window transcription failed, segment goes to the job queue:", failed[0])
+            text = None
+        else:
+            text = " ".join(t.strip() for t in texts if t and t.strip())
+        try:
+            segment = await self.persist(meta, b"".join(seg.frames), seg.mime_type, text)
+        except Exception as e:
+            await self.send({"type": "error", "start_ms": meta.start_ms, "detail": str(e)})
+            return
+        await self.send({
+            "type": "final",
+            "language_code": meta.language_code,
+            "start_ms": meta.start_ms,
+            "end_ms": meta.end_ms,
+            **segment.model_dump(),
+        })
@@ -1,9 +1,61 @@
 import os
-from supabase import create_client, Client
+import threading
+from typing import TYPE_CHECKING, Optional
 
+if TYPE_CHECKING:
+    from supabase import Client
 
-SUPABASE_URL = os.environ["SUPABASE_URL"]
-SUPABASE_KEY = os.environ["SUPABASE_SERVICE_ROLE_KEY"]
+# Created on first use (normally warmup_supabase() in the app lifespan), not at
+# import; the SDK and httpx are imported then too, off the startup path.
+# supabase-py builds its own httpx sessions with no pool limits, so they are
+# swapped for pooled, metered ones from http_pool.
+SUPABASE_TIMEOUT_S = float(os.getenv("SUPABASE_TIMEOUT_S", "30"))
+STORAGE_TIMEOUT_S = float(os.getenv("STORAGE_TIMEOUT_S", "60"))
 
+_client: Optional["Client"] = None
+_lock = threading.Lock()
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
\ No newline at end of file
+
+def _pooled(name: str, session, timeout_s: float):
+    import http_pool
+
+    client = http_pool.make_client(
+        name, timeout_s, base_url=str(session.base_url), headers=session.headers, client_class=type(session)
+    )
+    session.close()
+    return client
+
+
+def get_supabase() -> "Client":
+    global _client
+    with _lock:
+        if _client is None:
+            from supabase import create_client
+            from supabase.lib.client_options import ClientOptions
+
+            client = create_client(
+                os.environ["SUPABASE_URL"],
+                os.environ["SUPABASE_SERVICE_ROLE_KEY"],
+                options=ClientOptions(
+                    postgrest_client_timeout=SUPABASE_TIMEOUT_S,
+                    storage_client_timeout=STORAGE_TIMEOUT_S,
+                ),
+            )
+            client.postgrest.session = _pooled("postgrest", client.postgrest.session, SUPABASE_TIMEOUT_S)
+            storage = client.storage
+            storage.session = storage._client = _pooled("storage", storage.session, STORAGE_TIMEOUT_S)
+            _client = client
+        return _client
+
+
+def warmup_supabase():
+    # Opens (and keeps alive) a connection to PostgREST and to Storage
+    client = get_supabase()
+    client.table("sessions").select("id").limit(1).execute()
+    client.storage.get_bucket("segments")
+
+
+def close_supabase():
+    global _client
+    with _lock:
+        _client = None
@@ -0,0 +1,54 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asr import LocalWhisperBackend  # noqa: E402
+
+
+def _backend(batch_size: int, batch_wait_ms: int):
+    # Inference stubbed out: records each call and echoes the inputs
+    backend = LocalWhisperBackend(batch_size=batch_size, batch_wait_ms=batch_wait_ms)
+    backend.calls = []
+
+    def infer(audios, language_code):
+        backend.calls.append((language_code, list(audios)))
+        return [a.decode() for a in audios]
+
+    backend._infer = infer
+    return backend
+
+
+def test_same_language_requests_share_a_batch():
+    async def scenario():
+        backend = _backend(batch_size=8, batch_wait_ms=20)
+        texts = await asyncio.gather(
+            backend.transcribe(b"a", "a.webm", "audio/webm", "en"),
+            backend.transcribe(b"b", "b.webm", "audio/webm", "zh"),
+            backend.transcribe(b"c", "c.webm", "audio/webm", "en"),
+        )
+        assert texts == ["a", "b", "c"]
+        assert sorted(backend.calls) == [("en", [b"a", b"c"]), ("zh", [b"b"])]
+
+    asyncio.run(scenario())
+
+
+def test_size_flush_cancels_its_timer():
+    # The first batch fills up and flushes at once; a request that starts the
+    # next batch must wait its own batch_wait_ms, not the first batch's leftover
+    async def scenario():
+        backend = _backend(batch_size=2, batch_wait_ms=200)
+        first = await asyncio.gather(
+            backend.transcribe(b"a", "a.webm", "audio/webm", "en"),
+            backend.transcribe(b"b", "b.webm", "audio/webm", "en"),
+        )
+        assert first == ["a", "b"]
+        await asyncio.sleep(0.12)
+        late = asyncio.ensure_future(backend.transcribe(b"c", "c.webm", "audio/webm", "en"))
+        await asyncio.sleep(0.12)  # past the first batch's deadline, inside ours
+        assert not late.done()
+        assert await asyncio.wait_for(late, 1) == "c"
+        assert backend.calls == [("en", [b"a", b"b"]), ("en", [b"c"])]
+
+    asyncio.run(scenario())
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import AsrScheduler  # noqa: E402
+
+
+def test_cancel_while_queued_as_slot_frees():
+    # A queued call cancelled in the same tick that the running call finishes
+    # must not be granted the slot: the finishing call keeps its result and
+    # the next session's call runs.
+    async def scenario():
+        sched = AsrScheduler(max_concurrency=1, per_session=1)
+        release = asyncio.Event()
+
+        async def held():
+            await release.wait()
+            return "a"
+
+        async def quick(text):
+            return text
+
+        t1 = asyncio.ensure_future(sched.run("a", held))
+        await asyncio.sleep(0)
+        t2 = asyncio.ensure_future(sched.run("b", lambda: quick("b")))
+        t3 = asyncio.ensure_future(sched.run("c", lambda: quick("c")))
+        await asyncio.sleep(0)
+        assert sched.snapshot() == {"running": 1, "queued": 2, "sessions_waiting": 2}
+
+        t2.cancel()
+        release.set()
+        assert await asyncio.wait_for(t1, 1) == "a"
+        assert await asyncio.wait_for(t3, 1) == "c"
+        assert t2.cancelled()
+        assert sched.snapshot() == {"running": 0, "queued": 0, "sessions_waiting": 0}
+        assert not sched._running and not sched._granted
+
+    asyncio.run(scenario())
+
+
+def test_cancel_after_grant_releases_slot_once():
+    async def scenario():
+        sched = AsrScheduler(max_concurrency=1, per_session=1)
+        release = asyncio.Event()
+
+        async def held():
+            await release.wait()
+
+        t1 = asyncio.ensure_future(sched.run("a", held))
+        await asyncio.sleep(0)
+        t1.cancel()
+        await asyncio.wait_for(asyncio.gather(t1, return_exceptions=True), 1)
+        assert sched.snapshot()["running"] == 0
+
+        async def quick():
+            return "b"
+
+        assert await asyncio.wait_for(sched.run("b", quick), 1) == "b"
+        assert sched.snapshot() == {"running": 0, "queued": 0, "sessions_waiting": 0}
+
+    asyncio.run(scenario())
+
+
+def test_uncapped_calls_only_take_global_slots():
+    # Sub-chunks and bulk items run past the session's limit, and do not use
+    # up the session's share for its capped calls
+    async def scenario():
+        sched = AsrScheduler(max_concurrency=4, per_session=1, max_session_queue=1)
+        release = asyncio.Event()
+
+        async def held():
+            await release.wait()
+
+        uncapped = [asyncio.ensure_future(sched.run("a", held, capped=False)) for _ in range(3)]
+        capped = asyncio.ensure_future(sched.run("a", held))
+        await asyncio.sleep(0)
+        assert sched.snapshot() == {"running": 4, "queued": 0, "sessions_waiting": 0}
+        assert sched._running == {"a": 1}
+
+        release.set()
+        await asyncio.wait_for(asyncio.gather(*uncapped, capped), 1)
+        assert sched.snapshot() == {"running": 0, "queued": 0, "sessions_waiting": 0}
+        assert not sched._running and not sched._granted and not sched._uncapped
+
+    asyncio.run(scenario())
@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import SegmentResponse, StreamControl  # noqa: E402
+from streaming import StreamSession  # noqa: E402
+
+
+def test_failed_window_still_records_segment_after_partials():
+    # The first window's ASR call fails while the second is still running: the
+    # segment is persisted anyway (text None, for background transcription)
+    # and its final goes out after every partial.
+    async def scenario():
+        sent, persisted = [], []
+        second_done = asyncio.Event()
+
+        async def transcribe(blob, mime_type, language_code, session_id):
+            if b"B" not in blob:  # later windows carry the header frame too
+                raise RuntimeError("ASR overloaded")
+            await second_done.wait()
+            return "second"
+
+        async def persist(meta, blob, mime_type, text):
+            persisted.append((blob, text))
+            return SegmentResponse(segment_id="seg-1", text=text, audio_path="p", status="pending")
+
+        async def send(msg):
+            sent.append(msg)
+
+        session = StreamSession(transcribe, persist, send, window_ms=500)
+        await session.handle_control(StreamControl(type="start", session_id="s", language_code="en", start_ms=0))
+        for frame in (b"A1", b"A2", b"B1", b"B2"):
+            await session.handle_audio(frame)
+        await session.handle_control(
+            StreamControl(type="stop", session_id="s", language_code="en", start_ms=0, end_ms=1000)
+        )
+        await asyncio.sleep(0.01)
+        second_done.set()
+        await asyncio.wait_for(session.drain(), 1)
+
+        assert persisted == [(b"A1A2B1B2", None)]
+        assert [m["type"] for m in sent] == ["partial", "final"]
+        assert sent[-1]["status"] == "pending"
+
+    asyncio.run(scenario())
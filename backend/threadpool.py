@@ -0,0 +1,59 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# The supabase and openai SDKs are synchronous. Every call into them goes
+# through this bounded pool so the event loop keeps accepting requests while
+# a chunk waits on storage or Whisper.
+IO_WORKERS = int(os.getenv("IO_WORKERS", "32"))
+
+_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+# CPU-bound audio work (decode, VAD, transcode) runs in worker processes so it
+# never holds the GIL the event loop needs. Spawned on first use, or ahead of
+# it by prewarm_cpu_pool(); "spawn" keeps the children clear of the parent's
+# threads and SDK clients.
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 2)))
+
+_process_pool = None
+
+
+def _cpu_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=CPU_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+async def run_cpu(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_cpu_pool(), functools.partial(fn, *args, **kwargs))
+
+
+def _load_audio_worker() -> int:
+    import audio  # noqa: F401  (numpy and the audio helpers)
+
+    return os.getpid()
+
+
+async def prewarm_cpu_pool():
+    # One task per worker: each submit with no idle worker spawns a process, so
+    # the interpreter start and imports are paid now, not by the first chunk
+    await asyncio.gather(*(run_cpu(_load_audio_worker) for _ in range(CPU_WORKERS)))
+
+
+def shutdown_cpu_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
@@ -0,0 +1,202 @@
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+# Per-request traces and slow-request profiles, for chasing individual
+# pathological chunks (metrics.py has the aggregates).
+#
+# Tracing (TRACE_ENABLED): every traced request writes one JSON line to
+# TRACE_PATH ("-" for stdout) with its attributes (session_id, segment_id,
+# language_code, ...) and a span per pipeline stage. metrics.stage() opens the
+# spans, so every timed stage shows up in both places.
+#
+# Profiling (PROFILE_ENABLED): each traced request runs under a pyinstrument
+# sampling profiler; requests slower than PROFILE_SLOW_MS leave a speedscope
+# flame graph in PROFILE_DIR. Requires `pip install -r requirements-debug.txt`.
+#
+# Both can be flipped at runtime through /api/debug/tracing (per process).
+#
+# Trace lines and flame graphs are written by one background thread: rendering
+# a profile can take hundreds of ms, and the request that finished slow must
+# not stall every other request on the event loop while it is written out.
+TRACE_PATH = os.getenv("TRACE_PATH", "traces.jsonl")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_S = float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000
+
+_settings = {
+    "trace": os.getenv("TRACE_ENABLED", "0") == "1",
+    "profile": os.getenv("PROFILE_ENABLED", "0") == "1",
+    "profile_slow_ms": int(os.getenv("PROFILE_SLOW_MS", "5000")),
+}
+
+_current: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+_writes: "queue.Queue" = queue.Queue()
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+
+
+def _profiler_class():
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        return None
+    return Profiler
+
+
+def configure(trace: Optional[bool] = None, profile: Optional[bool] = None, profile_slow_ms: Optional[int] = None) -> dict:
+    if profile and _profiler_class() is None:
+        raise RuntimeError("pyinstrument is not installed")
+    if trace is not None:
+        _settings["trace"] = trace
+    if profile is not None:
+        _settings["profile"] = profile
+    if profile_slow_ms is not None:
+        _settings["profile_slow_ms"] = profile_slow_ms
+    return settings()
+
+
+def settings() -> dict:
+    return dict(_settings)
+
+
+class Trace:
+    def __init__(self, name: str, attrs: dict):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.t0 = time.perf_counter()
+        self.spans = []
+
+    def offset_ms(self) -> float:
+        return round((time.perf_counter() - self.t0) * 1000, 2)
+
+
+@contextmanager
+def trace(name: str, **attrs):
+    """Root of a traced request. No-op unless tracing or profiling is on."""
+    if not (_settings["trace"] or _settings["profile"]):
+        yield None
+        return
+
+    t = Trace(name, attrs)
+    token = _current.set(t)
+    profiler = None
+    if _settings["profile"]:
+        Profiler = _profiler_class()
+        if Profiler is not None:
+            profiler = Profiler(interval=PROFILE_INTERVAL_S, async_mode="enabled")
+            profiler.start()
+    error = None
+    try:
+        yield t
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        duration_ms = t.offset_ms()
+        if profiler is not None:
+            profiler.stop()
+            if duration_ms >= _settings["profile_slow_ms"]:
+                t.attrs["profile"] = _dump_profile(profiler, t)
+        if _settings["trace"]:
+            _write({
+                "trace_id": t.id,
+                "name": t.name,
+                "started_at": t.started_at,
+                "duration_ms": duration_ms,
+                "error": error,
+                **t.attrs,
+                "spans": t.spans,
+            })
+
+
+@contextmanager
+def span(name: str):
+    t = _current.get()
+    if t is None:
+        yield
+        return
+    start = t.offset_ms()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        rec = {"name": name, "start_ms": start, "duration_ms": round(t.offset_ms() - start, 2)}
+        if error:
+            rec["error"] = error
+        t.spans.append(rec)
+
+
+def annotate(**attrs):
+    # Attach attributes learned mid-request (e.g. segment_id) to the current trace
+    t = _current.get()
+    if t is not None:
+        t.attrs.update(attrs)
+
+
+# ---------- background writer ----------
+def _submit(fn, *args):
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_writer_loop, name="tracing-writer", daemon=True)
+            _writer.start()
+    _writes.put((fn, args))
+
+
+def _writer_loop():
+    while True:
+        fn, args = _writes.get()
+        try:
+            fn(*args)
+        except Exception as e:
+            print("tracing: write failed:", e)
+        finally:
+            _writes.task_done()
+
+
+def flush():
+    """Wait until every queued trace line and profile is on disk (shutdown)."""
+    if _writer is not None:
+        _writes.join()
+
+
+def _write(record: dict):
+    _submit(_append_line, json.dumps(record, default=str))
+
+
+def _append_line(line: str):
+    if TRACE_PATH == "-":
+        print(line, flush=True)
+    else:
+        with open(TRACE_PATH, "a") as f:
+            f.write(line + "\n")
+
+
+def _dump_profile(profiler, t: Trace) -> str:
+    # The path goes into the trace now; the flame graph is rendered off the loop
+    ts = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(PROFILE_DIR, f"{ts}-{t.name}-{t.id}.speedscope.json")
+    _submit(_render_profile, profiler, path, t.id)
+    return path
+
+
+def _render_profile(profiler, path: str, trace_id: str):
+    from pyinstrument.renderers import SpeedscopeRenderer
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(path, "w") as f:
+        f.write(profiler.output(SpeedscopeRenderer()))
+    print("slow request profile:", path, "trace_id=", trace_id)
@@ -0,0 +1,83 @@
+"""
+edit_distance.py vs jiwer on long transcripts.
+
+Builds reference / hypothesis pairs by repeating the mixed-script TRIALS
+(normalized as evaluate_trials does) to a range of lengths, checks that WER
+matches jiwer exactly, and times per call:
+  - jiwer.wer                  (the old evaluate_trials.word_error_rate path)
+  - edit_distance.wer          (rapidfuzz core if installed)
+  - pure-Python fallback       (bit-parallel on Python ints)
+  - jiwer.process_words        (jiwer with alignments)
+  - edit_distance.align
+
+    python bench/error_rates.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import edit_distance as ed  # noqa: E402
+import evaluate_trials as et  # noqa: E402
+
+try:
+    import jiwer
+except ImportError:
+    jiwer = None
+
+LENGTHS = (100, 500, 2000, 5000)  # reference words
+
+
+def pair(n_words: int):
+    refs, hyps = [], []
+    for t in et.TRIALS.values():
+        refs.append(et.normalize_keep_mixed(t["reference"]))
+        hyps.append(et.normalize_keep_mixed(t["hypothesis"]))
+    ref_words, hyp_words = " ".join(refs).split(), " ".join(hyps).split()
+    reps = n_words // len(ref_words) + 1
+    ref = " ".join((ref_words * reps)[:n_words])
+    hyp = " ".join((hyp_words * reps)[: int(n_words * len(hyp_words) / len(ref_words))])
+    return ref, hyp
+
+
+def per_call(fn, *args) -> float:
+    n, t0 = 0, time.perf_counter()
+    while True:
+        fn(*args)
+        n += 1
+        elapsed = time.perf_counter() - t0
+        if elapsed > 0.5 and n >= 3:
+            return elapsed / n
+
+
+def main():
+    print(f"rapidfuzz core: {'yes' if ed._rf is not None else 'no'}\n")
+    print(f"{'words':>6}  {'jiwer.wer':>10} {'ed.wer':>10} {'speedup':>8} {'pure-py':>10}   {'process_words':>13} {'ed.align':>10}")
+    for n in LENGTHS:
+        ref, hyp = pair(n)
+        r, h = ref.split(), hyp.split()
+        w = ed.wer(ref, hyp)
+        assert ed._myers_distance(r, h) == ed.distance(r, h)
+        t_ed = per_call(ed.wer, ref, hyp)
+        t_py = per_call(lambda: ed._myers_distance(ref.split(), hyp.split()))
+        t_align = per_call(ed.align, r, h)
+        if jiwer is None:
+            print(f"{n:>6}  {'-':>10} {t_ed * 1e3:>8.2f}ms {'-':>8} {t_py * 1e3:>8.2f}ms   {'-':>13} {t_align * 1e3:>8.2f}ms")
+            continue
+        assert abs(w - jiwer.wer(ref, hyp)) < 1e-12, (n, w, jiwer.wer(ref, hyp))
+        t_jiwer = per_call(jiwer.wer, ref, hyp)
+        t_pw = per_call(jiwer.process_words, ref, hyp)
+        print(
+            f"{n:>6}  {t_jiwer * 1e3:>8.2f}ms {t_ed * 1e3:>8.2f}ms {t_jiwer / t_ed:>7.1f}x {t_py * 1e3:>8.2f}ms"
+            f"   {t_pw * 1e3:>11.2f}ms {t_align * 1e3:>8.2f}ms"
+        )
+
+    ref, hyp = pair(2000)
+    t_mixed = per_call(ed.mixed_error_rate, ref, hyp)
+    t_cer = per_call(ed.cer, ref, hyp)
+    print(f"\n2000 words: mixed-script error rate {t_mixed * 1e3:.2f}ms, CER {t_cer * 1e3:.2f}ms per call")
+
+
+if __name__ == "__main__":
+    main()
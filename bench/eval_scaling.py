@@ -0,0 +1,101 @@
+"""
+Trials/sec of the evaluation engine against the per-trial loop in
+evaluate_trials.py, and how it scales with worker processes.
+
+Builds a synthetic corpus by perturbing the hardcoded TRIALS (dropped and
+swapped words, mis-tagged lines), checks that eval_engine reproduces
+score_trial on a sample, then times:
+  - serial:   evaluate_trials.score_trial per trial
+  - engine:   eval_engine.evaluate at 1, 2, 4, ... workers (up to the core count)
+
+    python bench/eval_scaling.py [n_trials]
+"""
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import eval_engine  # noqa: E402
+import evaluate_trials as et  # noqa: E402
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+SAMPLE = 50
+
+
+def perturb(text: str, rng: random.Random) -> str:
+    lines = []
+    for line in text.splitlines():
+        words = line.split(" ")
+        if len(words) > 3 and rng.random() < 0.5:
+            del words[rng.randrange(1, len(words))]
+        if len(words) > 3 and rng.random() < 0.3:
+            i = rng.randrange(1, len(words) - 1)
+            words[i], words[i + 1] = words[i + 1], words[i]
+        line = " ".join(words)
+        if rng.random() < 0.1:
+            line = line.replace("[EN]", "[ZH]", 1) if "[EN]" in line else line.replace("[ZH]", "[EN]", 1)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def corpus(n: int):
+    rng = random.Random(0)
+    keys = list(et.TRIALS)
+    out = []
+    for i in range(n):
+        key = keys[i % len(keys)]
+        t = et.TRIALS[key]
+        out.append({
+            "trial": f"{key}#{i}",
+            "language": t.get("language"),
+            "tier": t.get("tier"),
+            "reference": t["reference"],
+            "hypothesis": perturb(t["hypothesis"], rng),
+        })
+    return out
+
+
+def same(a, b) -> bool:
+    if isinstance(a, float) and math.isnan(a):
+        return isinstance(b, float) and math.isnan(b)
+    return abs(a - b) < 1e-9
+
+
+def check(trials):
+    rows = eval_engine.score_batch([eval_engine._stringify(t) for t in trials[:SAMPLE]])
+    for t, row in zip(trials, rows):
+        ref = et.score_trial(t["reference"], t["hypothesis"], t["trial"])
+        for k in eval_engine.METRIC_COLUMNS:
+            assert same(ref[k], row[k]), (t["trial"], k, ref[k], row[k])
+    print(f"engine matches score_trial on {len(rows)} sampled trials")
+
+
+def main():
+    trials = corpus(N)
+    check(trials)
+
+    t0 = time.perf_counter()
+    for t in trials:
+        et.score_trial(t["reference"], t["hypothesis"], t["trial"])
+    serial = N / (time.perf_counter() - t0)
+    print(f"{'serial score_trial':<22} {serial:>9.1f} trials/s")
+
+    cores = os.cpu_count() or 1
+    workers = [w for w in (1, 2, 4, 8, 16, 32) if w <= cores] or [1]
+    with tempfile.TemporaryDirectory() as tmp:
+        for w in workers:
+            out = os.path.join(tmp, "scores.parquet")
+            t0 = time.perf_counter()
+            eval_engine.evaluate(iter(trials), out, workers=w)
+            rate = N / (time.perf_counter() - t0)
+            print(f"{f'engine, {w} worker(s)':<22} {rate:>9.1f} trials/s  ({rate / serial:.1f}x serial)")
+    if cores == 1:
+        print("(one core available: worker scaling not measurable on this machine)")
+
+
+if __name__ == "__main__":
+    main()
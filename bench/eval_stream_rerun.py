@@ -0,0 +1,92 @@
+"""
+Full vs incremental runs of eval_stream.py on a synthetic segments export.
+
+Turns each tagged TRIALS hypothesis into one segment per line, replicates it
+across N sessions, and times:
+  - first run:   every session scored
+  - rerun:       nothing changed, every session served from the score cache
+  - edited rerun: EDIT_FRACTION of sessions get one segment re-transcribed
+Peak RSS is printed after each run; it should not grow with N.
+
+    python bench/eval_stream_rerun.py [n_sessions]
+"""
+import csv
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import eval_stream  # noqa: E402
+import evaluate_trials as et  # noqa: E402
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+EDIT_FRACTION = 0.05
+FIELDS = ["id", "session_id", "language_code", "start_ms", "end_ms", "asr_text", "status"]
+
+
+def tagged_trials():
+    out = []
+    for key, t in et.TRIALS.items():
+        lines = et.parse_tagged_lines(t["hypothesis"])
+        if lines:
+            out.append((key, [(ln.tag.lower(), ln.text) for ln in lines]))
+    return out
+
+
+def write_export(path, session_ids, trials, edited=frozenset()):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=FIELDS)
+        w.writeheader()
+        for n, sid in enumerate(session_ids):
+            _, segs = trials[n % len(trials)]
+            for i, (lang, text) in enumerate(segs):
+                if sid in edited and i == 0:
+                    text = text + " (re-transcribed)"
+                w.writerow({
+                    "id": f"{sid[:8]}-{i:04d}", "session_id": sid, "language_code": lang,
+                    "start_ms": i * 5000, "end_ms": i * 5000 + 4800, "asr_text": text, "status": "done",
+                })
+
+
+def run(label, export, refs, out, cache_path):
+    cache = eval_stream.ScoreCache(cache_path)
+    t0 = time.perf_counter()
+    counts = eval_stream.evaluate_sessions(eval_stream.export_segments(export), refs, out, cache)
+    elapsed = time.perf_counter() - t0
+    cache.close()
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{label:<14} {elapsed:7.2f}s  scored={counts['scored']:<6} cached={counts['cached']:<6} peak RSS {rss_mb:.0f} MB")
+
+
+def main():
+    trials = tagged_trials()
+    session_ids = sorted(str(uuid.uuid4()) for _ in range(N))
+    with tempfile.TemporaryDirectory() as tmp:
+        export = os.path.join(tmp, "segments.csv")
+        refs_path = os.path.join(tmp, "refs.jsonl")
+        cache_path = os.path.join(tmp, "scores.sqlite3")
+        out = os.path.join(tmp, "scores.csv")
+
+        with open(refs_path, "w") as f:
+            for n, sid in enumerate(session_ids):
+                f.write(json.dumps({"session_id": sid, "trial": trials[n % len(trials)][0]}) + "\n")
+        refs = eval_stream.load_references(refs_path)
+
+        write_export(export, session_ids, trials)
+        print(f"{N} sessions, {os.path.getsize(export) / 1e6:.1f} MB export")
+        run("first run", export, refs, out, cache_path)
+        run("rerun", export, refs, out, cache_path)
+
+        edited = frozenset(random.Random(0).sample(session_ids, int(N * EDIT_FRACTION)))
+        write_export(export, session_ids, trials, edited)
+        run("edited rerun", export, refs, out, cache_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import re
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+# ----------------------------
+# Edit distance for WER / CER / mixed-script error rate
+# ----------------------------
+# Bit-parallel Levenshtein (Myers 1999, Hyyrö's formulation) over token
+# sequences: O(len(hyp) * len(ref) / 64) word operations, no DP matrix.
+#
+# With rapidfuzz installed (it ships with jiwer), its native implementation
+# does the work: every distinct token is mapped to one character first, so
+# it compares two plain strings instead of hashing Python objects. Without
+# it, the same algorithm runs on Python ints (one bit per reference token),
+# and alignments come from a DP restricted to the band |i - j| <= distance,
+# where every optimal path lies.
+#
+# Error rates are errors / reference tokens, as in jiwer (identical values
+# for WER on whitespace tokens).
+
+EQUAL, SUBSTITUTE, DELETE, INSERT = "equal", "substitute", "delete", "insert"
+
+# (op, ref token or None, hyp token or None)
+AlignOp = Tuple[str, Optional[Hashable], Optional[Hashable]]
+
+CJK = r"\u4e00-\u9fff"
+MIXED_TOKEN_RE = re.compile(rf"[{CJK}]|[^\s{CJK}]+")
+_CJK_CHAR_RE = re.compile(rf"[{CJK}]")
+
+try:
+    from rapidfuzz.distance import Levenshtein as _rf
+except Exception:
+    _rf = None
+
+# Token ids are encoded from U+0100 up to the surrogate range
+_MAX_VOCAB = 0xD800 - 0x100
+
+
+# ----------------------------
+# Tokenizers
+# ----------------------------
+def word_tokens(s: str) -> List[str]:
+    return s.split()
+
+
+def char_tokens(s: str) -> List[str]:
+    # Every character except whitespace
+    return [c for c in s if not c.isspace()]
+
+
+def mixed_tokens(s: str) -> List[str]:
+    # One token per CJK character and per whitespace-free run of anything else
+    # (an English word, a number), so a dropped "充电器" costs three errors and
+    # a dropped "charger" costs one
+    return MIXED_TOKEN_RE.findall(s)
+
+
+# ----------------------------
+# Distance
+# ----------------------------
+def _encode(ref: Sequence[Hashable], hyp: Sequence[Hashable]) -> Optional[Tuple[str, str]]:
+    vocab = {tok: chr(0x100 + i) for i, tok in enumerate(set(ref).union(hyp))}
+    if len(vocab) > _MAX_VOCAB:
+        return None
+    get = vocab.__getitem__
+    return "".join(map(get, ref)), "".join(map(get, hyp))
+
+
+def distance(ref: Sequence[Hashable], hyp: Sequence[Hashable]) -> int:
+    """Levenshtein distance between two token sequences (unit costs)."""
+    if _rf is not None:
+        encoded = _encode(ref, hyp)
+        if encoded is not None:
+            return _rf.distance(*encoded)
+    return _myers_distance(ref, hyp)
+
+
+def _myers_distance(ref: Sequence[Hashable], hyp: Sequence[Hashable]) -> int:
+    m = len(ref)
+    if m == 0:
+        return len(hyp)
+    if not hyp:
+        return m
+
+    peq: Dict[Hashable, int] = {}
+    bit = 1
+    for tok in ref:
+        peq[tok] = peq.get(tok, 0) | bit
+        bit <<= 1
+    mask = bit - 1
+    last = 1 << (m - 1)
+
+    pv, mv, score = mask, 0, m
+    for tok in hyp:
+        eq = peq.get(tok, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+    return score
+
+
+# ----------------------------
+# Alignment
+# ----------------------------
+def align(ref: Sequence[Hashable], hyp: Sequence[Hashable]) -> List[AlignOp]:
+    """Minimal-cost alignment as a list of (op, ref_token, hyp_token)."""
+    if _rf is not None:
+        encoded = _encode(ref, hyp)
+        if encoded is not None:
+            return _rf_align(ref, hyp, _rf.editops(*encoded))
+    return _banded_align(ref, hyp)
+
+
+def _rf_align(ref: Sequence[Hashable], hyp: Sequence[Hashable], editops) -> List[AlignOp]:
+    # rapidfuzz lists only the edits; fill in the matched runs between them
+    ops: List[AlignOp] = []
+    i = j = 0
+    for tag, src, dest in editops:
+        while i < src and j < dest:
+            ops.append((EQUAL, ref[i], hyp[j]))
+            i, j = i + 1, j + 1
+        if tag == "replace":
+            ops.append((SUBSTITUTE, ref[i], hyp[j]))
+            i, j = i + 1, j + 1
+        elif tag == "delete":
+            ops.append((DELETE, ref[i], None))
+            i += 1
+        else:
+            ops.append((INSERT, None, hyp[j]))
+            j += 1
+    while i < len(ref):
+        ops.append((EQUAL, ref[i], hyp[j]))
+        i, j = i + 1, j + 1
+    return ops
+
+
+def _banded_align(ref: Sequence[Hashable], hyp: Sequence[Hashable]) -> List[AlignOp]:
+    n, m = len(ref), len(hyp)
+    k = _myers_distance(ref, hyp)
+    big = n + m + 1
+
+    # Row i holds columns lo(i)..hi(i); back[i][j - lo(i)] is the move into (i, j)
+    los = [0]
+    prev = list(range(min(m, k) + 1))
+    back = [bytearray([3]) * len(prev)]
+    for i in range(1, n + 1):
+        lo, hi = max(0, i - k), min(m, i + k)
+        plo, phi = los[-1], los[-1] + len(prev) - 1
+        cur = [big] * (hi - lo + 1)
+        bp = bytearray(hi - lo + 1)
+        r = ref[i - 1]
+        for j in range(lo, hi + 1):
+            if j == 0:
+                cur[0], bp[0] = i, 2
+                continue
+            best, move = big, 0
+            if plo <= j - 1 <= phi:
+                best = prev[j - 1 - plo] + (r != hyp[j - 1])
+                move = 0 if r == hyp[j - 1] else 1
+            if plo <= j <= phi and prev[j - plo] + 1 < best:
+                best, move = prev[j - plo] + 1, 2
+            if j - 1 >= lo and cur[j - 1 - lo] + 1 < best:
+                best, move = cur[j - 1 - lo] + 1, 3
+            cur[j - lo], bp[j - lo] = best, move
+        los.append(lo)
+        back.append(bp)
+        prev = cur
+
+    ops: List[AlignOp] = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        move = back[i][j - los[i]]
+        if move == 0:
+            ops.append((EQUAL, ref[i - 1], hyp[j - 1]))
+            i, j = i - 1, j - 1
+        elif move == 1:
+            ops.append((SUBSTITUTE, ref[i - 1], hyp[j - 1]))
+            i, j = i - 1, j - 1
+        elif move == 2:
+            ops.append((DELETE, ref[i - 1], None))
+            i -= 1
+        else:
+            ops.append((INSERT, None, hyp[j - 1]))
+            j -= 1
+    ops.reverse()
+    return ops
+
+
+def op_counts(ops: List[AlignOp]) -> Dict[str, int]:
+    counts = {EQUAL: 0, SUBSTITUTE: 0, DELETE: 0, INSERT: 0}
+    for op, _, _ in ops:
+        counts[op] += 1
+    return counts
+
+
+# ----------------------------
+# Error rates
+# ----------------------------
+def error_rate(ref: Sequence[Hashable], hyp: Sequence[Hashable]) -> float:
+    # NaN for an empty reference (undefined; jiwer raises)
+    if not ref:
+        return float("nan")
+    return distance(ref, hyp) / len(ref)
+
+
+def wer(ref: str, hyp: str) -> float:
+    return error_rate(word_tokens(ref), word_tokens(hyp))
+
+
+def cer(ref: str, hyp: str) -> float:
+    return error_rate(char_tokens(ref), char_tokens(hyp))
+
+
+def mixed_error_rate(ref: str, hyp: str) -> float:
+    return error_rate(mixed_tokens(ref), mixed_tokens(hyp))
+
+
+# ----------------------------
+# Alignment view
+# ----------------------------
+def _script(tok: Optional[Hashable]) -> Optional[str]:
+    if tok is None:
+        return None
+    return "zh" if _CJK_CHAR_RE.match(str(tok)) else "en"
+
+
+def switch_boundary_errors(ops: List[AlignOp]) -> Tuple[int, int]:
+    """(errors next to a code switch, all errors). An error is at a switch if
+    the nearest reference tokens on either side of it are in different
+    scripts (English word vs CJK character)."""
+    scripts = [_script(r) for _, r, _ in ops]
+    following: List[Optional[str]] = [None] * len(ops)
+    nxt = None
+    for idx in range(len(ops) - 1, -1, -1):
+        following[idx] = nxt
+        if scripts[idx] is not None:
+            nxt = scripts[idx]
+
+    errors = at_switch = 0
+    prev = None
+    for idx, (op, _, _) in enumerate(ops):
+        if op != EQUAL:
+            errors += 1
+            around = {s for s in (prev, scripts[idx], following[idx]) if s is not None}
+            if len(around) > 1:
+                at_switch += 1
+        if scripts[idx] is not None:
+            prev = scripts[idx]
+    return at_switch, errors
+
+
+def format_alignment(ops: List[AlignOp], width: int = 100) -> str:
+    """Reference / hypothesis / op rows, wrapped at `width` columns. Ops are
+    marked S, D and I; '*' fills the missing side of an insert or delete."""
+    marks = {EQUAL: " ", SUBSTITUTE: "S", DELETE: "D", INSERT: "I"}
+    blocks, ref_row, hyp_row, op_row, used = [], [], [], [], 0
+
+    def cell_width(s: str) -> int:
+        # CJK characters take two columns in a terminal
+        return sum(2 if _CJK_CHAR_RE.match(c) else 1 for c in s)
+
+    def pad(s: str, w: int) -> str:
+        return s + " " * (w - cell_width(s))
+
+    def block(ref_row, hyp_row, op_row) -> str:
+        rows = ("REF: " + " ".join(ref_row), "HYP: " + " ".join(hyp_row), "     " + " ".join(op_row))
+        return "\n".join(row.rstrip() for row in rows)
+
+    for op, r, h in ops:
+        rs = "*" if r is None else str(r)
+        hs = "*" if h is None else str(h)
+        w = max(cell_width(rs), cell_width(hs), 1)
+        if used and used + w + 1 > width:
+            blocks.append(block(ref_row, hyp_row, op_row))
+            ref_row, hyp_row, op_row, used = [], [], [], 0
+        ref_row.append(pad(rs, w))
+        hyp_row.append(pad(hs, w))
+        op_row.append(pad(marks[op], w))
+        used += w + 1
+    if ref_row:
+        blocks.append(block(ref_row, hyp_row, op_row))
+    return "\n\n".join(blocks)
@@ -0,0 +1,326 @@
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import edit_distance as ed
+import evaluate_trials as et
+
+# ----------------------------
+# Corpus-scale evaluation engine
+# ----------------------------
+# Scores the same metrics as evaluate_trials.score_trial, but for thousands of
+# trials at a time:
+#   - every text is normalized once into its mixed / EN / ZH views
+#   - trials are scored in batches on a process pool
+#   - each batch reuses one sacrebleu BLEU/chrF object, extracting each
+#     distinct reference's n-grams once; WER/CER use edit_distance.py
+#   - rows stream to CSV or Parquet as batches finish, so memory stays flat
+#
+# Input is a JSON-lines corpus, one trial per line:
+#   {"trial": "...", "reference": "...", "hypothesis": "...", ...}
+# Other keys (language, tier, session_id, ...) are carried into the output.
+# With no input file, the hardcoded TRIALS from evaluate_trials are scored.
+#
+#   python eval_engine.py corpus.jsonl -o scores.parquet --workers 8
+
+METRIC_COLUMNS = [
+    "bleu_mixed",
+    "chrf_mixed",
+    "wer_mixed",
+    "mer_mixed",
+    "bleu_en_only",
+    "wer_en_only",
+    "chrf_zh_only",
+    "cer_zh_only",
+    "overall_label_purity",
+    "EN_label_purity",
+    "ZH_label_purity",
+    "tagged_lines",
+]
+
+NAN = float("nan")
+QUOTES_RE = re.compile(r"[“”‘’]")
+
+
+# ----------------------------
+# Normalization: once per text
+# ----------------------------
+@dataclass
+class TextViews:
+    mixed: str  # normalize_keep_mixed
+    en: str     # normalize_for_english(extract_english_words(...))
+    zh: str     # normalize_for_chinese_chars
+
+
+def text_views(s: str) -> TextViews:
+    lower = s.strip().lower()
+    # Same results as the evaluate_trials helpers, from one lowercase copy
+    mixed = " ".join(et.PUNCT_RE.sub(" ", QUOTES_RE.sub("", lower)).split())
+    en = " ".join(et.ENG_RE.findall(lower))
+    zh = "".join(et.CJK_RE.findall(s))
+    return TextViews(mixed, en, zh)
+
+
+# ----------------------------
+# Batched metrics
+# ----------------------------
+class _Metrics:
+    # One set of sacrebleu metric objects per worker process
+    def __init__(self):
+        self.bleu = self.chrf = None
+        if et.sacrebleu is not None:
+            from sacrebleu.metrics import BLEU, CHRF
+
+            self.bleu = BLEU()
+            self.chrf = CHRF()
+
+    def bleu_scores(self, pairs) -> List[float]:
+        return _sentence_scores(self.bleu, pairs)
+
+    def chrf_scores(self, pairs) -> List[float]:
+        return _sentence_scores(self.chrf, pairs)
+
+
+def _sentence_scores(metric, pairs) -> List[float]:
+    """Per-pair scores, identical to metric.corpus_score([h], [[r]]). The
+    reference n-grams are extracted once per distinct reference in the batch
+    rather than once per pair, using sacrebleu's per-segment statistics hooks
+    (falls back to corpus_score if those are unavailable)."""
+    out = [NAN] * len(pairs)
+    idx = [i for i, (_, _, ok) in enumerate(pairs) if ok]
+    if metric is None or not idx:
+        return out
+    if not hasattr(metric, "_compute_segment_statistics"):
+        for i in idx:
+            r, h, _ = pairs[i]
+            out[i] = metric.corpus_score([h], [[r]]).score / 100.0
+        return out
+
+    refs = list(dict.fromkeys(pairs[i][0] for i in idx))
+    ref_info = dict(zip(refs, metric._cache_references([refs])))
+    for i in idx:
+        r, h, _ = pairs[i]
+        stats = metric._compute_segment_statistics(metric._preprocess_segment(h), ref_info[r])
+        out[i] = metric._aggregate_and_compute([stats]).score / 100.0
+    return out
+
+
+_metrics: Optional[_Metrics] = None
+
+
+def _get_metrics() -> _Metrics:
+    global _metrics
+    if _metrics is None:
+        _metrics = _Metrics()
+    return _metrics
+
+
+def error_rates(rate, pairs) -> List[float]:
+    return [rate(r, h) if ok else NAN for r, h, ok in pairs]
+
+
+def score_batch(trials: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Score a batch of trials; one output row per input, in order."""
+    m = _get_metrics()
+    views = {}
+
+    def v(s: str) -> TextViews:
+        # References repeat across trials (same script, many sessions)
+        tv = views.get(s)
+        if tv is None:
+            tv = views[s] = text_views(s)
+        return tv
+
+    refs = [v(t["reference"]) for t in trials]
+    hyps = [v(t["hypothesis"]) for t in trials]
+
+    mixed = [(r.mixed, h.mixed, True) for r, h in zip(refs, hyps)]
+    en = [(r.en, h.en, bool(r.en and h.en)) for r, h in zip(refs, hyps)]
+    zh = [(r.zh, h.zh, bool(r.zh and h.zh)) for r, h in zip(refs, hyps)]
+
+    columns = {
+        "bleu_mixed": m.bleu_scores(mixed),
+        "chrf_mixed": m.chrf_scores(mixed),
+        "wer_mixed": error_rates(ed.wer, mixed),
+        "mer_mixed": error_rates(ed.mixed_error_rate, mixed),
+        "bleu_en_only": m.bleu_scores(en),
+        "wer_en_only": error_rates(ed.wer, en),
+        "chrf_zh_only": m.chrf_scores(zh),
+        "cer_zh_only": error_rates(ed.cer, zh),
+    }
+
+    rows = []
+    for i, t in enumerate(trials):
+        row = {k: val for k, val in t.items() if k not in ("reference", "hypothesis")}
+        for name, values in columns.items():
+            row[name] = values[i]
+        lines = et.parse_tagged_lines(t["hypothesis"])
+        purity = et.label_cleanliness(lines) if lines else {}
+        row["overall_label_purity"] = purity.get("overall_purity_avg", NAN)
+        row["EN_label_purity"] = purity.get("EN_purity_avg", NAN)
+        row["ZH_label_purity"] = purity.get("ZH_purity_avg", NAN)
+        row["tagged_lines"] = len(lines)
+        rows.append(row)
+    return rows
+
+
+# ----------------------------
+# Corpus I/O
+# ----------------------------
+def read_corpus(path: Optional[str]) -> Iterator[Dict[str, Any]]:
+    if path is None:
+        for key, t in et.TRIALS.items():
+            yield {"trial": key, "language": t.get("language"), "tier": t.get("tier"),
+                   "reference": t["reference"], "hypothesis": t["hypothesis"]}
+        return
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f):
+            if line.strip():
+                t = json.loads(line)
+                t.setdefault("trial", str(n))
+                yield t
+
+
+def batched(items: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ResultWriter:
+    """Streams rows to .csv or .parquet (pyarrow). Columns are fixed by the
+    first batch."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self.fields: Optional[List[str]] = None
+        self._f = None
+        self._writer = None
+
+    def write(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        if self.fields is None:
+            extra = [k for k in rows[0] if k not in METRIC_COLUMNS]
+            self.fields = extra + METRIC_COLUMNS
+            self._open()
+        if self.parquet:
+            import pyarrow as pa
+
+            table = pa.Table.from_pylist([{k: r.get(k) for k in self.fields} for r in rows], schema=self._schema)
+            self._writer.write_table(table)
+        else:
+            self._writer.writerows({k: r.get(k, "") for k in self.fields} for r in rows)
+
+    def _open(self):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            def arrow_type(k):
+                if k == "tagged_lines":
+                    return pa.int64()
+                return pa.float64() if k in METRIC_COLUMNS else pa.string()
+
+            self._schema = pa.schema([(k, arrow_type(k)) for k in self.fields])
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        else:
+            self._f = open(self.path, "w", newline="", encoding="utf-8")
+            self._writer = csv.DictWriter(self._f, fieldnames=self.fields)
+            self._writer.writeheader()
+
+    def close(self):
+        if self._writer is not None and self.parquet:
+            self._writer.close()
+        if self._f is not None:
+            self._f.close()
+
+
+def _stringify(trial: Dict[str, Any]) -> Dict[str, Any]:
+    # Parquet columns are typed; pass-through keys are written as strings
+    return {k: (v if k in ("reference", "hypothesis") or v is None else str(v)) for k, v in trial.items()}
+
+
+def evaluate(
+    trials: Iterable[Dict[str, Any]],
+    out_path: str,
+    workers: int = 0,
+    batch_size: int = 256,
+) -> Dict[str, Any]:
+    """Score a corpus into out_path. workers=0 uses every core; 1 runs inline.
+    Returns the row count and the mean of each metric."""
+    workers = workers or os.cpu_count() or 1
+    writer = ResultWriter(out_path)
+    sums = {k: 0.0 for k in METRIC_COLUMNS}
+    counts = {k: 0 for k in METRIC_COLUMNS}
+    n = 0
+
+    def consume(rows):
+        nonlocal n
+        writer.write(rows)
+        n += len(rows)
+        for r in rows:
+            for k in METRIC_COLUMNS:
+                val = r.get(k)
+                if isinstance(val, (int, float)) and not math.isnan(val):
+                    sums[k] += val
+                    counts[k] += 1
+
+    batches = (list(map(_stringify, b)) for b in batched(trials, batch_size))
+    try:
+        if workers == 1:
+            for b in batches:
+                consume(score_batch(b))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # A bounded window of batches in flight keeps memory flat and
+                # output in input order
+                pending = []
+                for b in batches:
+                    pending.append(pool.submit(score_batch, b))
+                    if len(pending) >= workers * 2:
+                        consume(pending.pop(0).result())
+                for fut in pending:
+                    consume(fut.result())
+    finally:
+        writer.close()
+
+    return {"trials": n, **{k: (sums[k] / counts[k] if counts[k] else NAN) for k in METRIC_COLUMNS}}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Score a corpus of trials (JSON lines) in parallel.")
+    ap.add_argument("corpus", nargs="?", help="JSON-lines corpus; defaults to the TRIALS in evaluate_trials.py")
+    ap.add_argument("-o", "--output", default="trial_scores.csv", help=".csv or .parquet")
+    ap.add_argument("--workers", type=int, default=0, help="worker processes (0 = all cores)")
+    ap.add_argument("--batch-size", type=int, default=256)
+    args = ap.parse_args()
+
+    if et.sacrebleu is None:
+        print("Missing package: sacrebleu (BLEU/chrF); those columns will be NaN", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    summary = evaluate(read_corpus(args.corpus), args.output, args.workers, args.batch_size)
+    elapsed = time.perf_counter() - t0
+    print(f"Scored {summary['trials']} trials in {elapsed:.2f}s ({summary['trials'] / elapsed:.1f} trials/s)")
+    for k in METRIC_COLUMNS:
+        print(f"  mean {k}: {et.fmt(summary[k])}")
+    print(f"Wrote: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
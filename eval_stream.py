@@ -0,0 +1,301 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from itertools import groupby
+from typing import Any, Dict, Iterator, List, Optional
+
+import eval_engine
+import evaluate_trials as et
+
+# ----------------------------
+# Streaming evaluation from the segments table
+# ----------------------------
+# Instead of pasting hypotheses into TRIALS by hand, read segment rows page by
+# page (from Supabase, or from a local export), rebuild each session's tagged
+# transcript the way /api/end-session does, and score it against the session's
+# reference.
+#
+# Memory stays flat: segments are read in (session_id, start_ms, end_ms) order, so
+# only one session is held at a time, and rows stream to the output file.
+#
+# Scores are cached per session in a SQLite file, keyed by a fingerprint of the
+# reference and the rebuilt transcript; a rerun only re-scores sessions whose
+# segments (or reference) changed.
+#
+#   python eval_stream.py -o session_scores.csv                 # Supabase
+#   python eval_stream.py --export segments.csv --references refs.jsonl
+#
+# References: a JSON-lines file, one session per line, either
+#   {"session_id": "...", "trial": "trial_3_sentence_switch"}   (a TRIALS key)
+#   {"session_id": "...", "reference": "...", "language": "mixed", "tier": 2}
+# With Supabase and no file, sessions whose client_label is a TRIALS key use
+# that trial's reference.
+#
+# A local export must be ordered by session, e.g.
+#   \copy (select id, session_id, language_code, start_ms, end_ms, asr_text, status
+#          from segments order by session_id, start_ms, end_ms) to 'segments.csv' csv header
+
+PAGE_SIZE = int(os.getenv("EVAL_PAGE_SIZE", "1000"))
+CACHE_PATH = os.getenv("EVAL_CACHE_DB", "eval_scores.sqlite3")
+
+# Bump when scoring changes so cached scores are recomputed
+SCORER_VERSION = "2"
+
+SEGMENT_COLUMNS = "id, session_id, language_code, start_ms, end_ms, asr_text, status"
+
+
+# ----------------------------
+# Segment sources
+# ----------------------------
+def supabase_segments(page_size: int = PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+    """Every segment, one keyset page at a time, in (session_id, start_ms, end_ms)
+    order: the order of segments_session_range_key, so each page is an index
+    range scan."""
+    from supabase import create_client
+
+    client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_ROLE_KEY"])
+    last = None
+    while True:
+        q = (
+            client.table("segments")
+            .select(SEGMENT_COLUMNS)
+            .order("session_id")
+            .order("start_ms")
+            .order("end_ms")
+            .limit(page_size)
+        )
+        if last is not None:
+            sid, start, end = last["session_id"], last["start_ms"], last["end_ms"]
+            # The gte bounds the index scan; the or() drops rows up to the cursor
+            q = q.gte("session_id", sid).or_(
+                f"session_id.gt.{sid},"
+                f"and(session_id.eq.{sid},start_ms.gt.{start}),"
+                f"and(session_id.eq.{sid},start_ms.eq.{start},end_ms.gt.{end})"
+            )
+        rows = q.execute().data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last = rows[-1]
+
+
+def export_segments(path: str) -> Iterator[Dict[str, Any]]:
+    """Segments from a .csv or .jsonl export ordered by session_id."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        prev = None
+        for row in rows:
+            sid = row["session_id"]
+            if prev is not None and sid < prev:
+                raise SystemExit(f"{path} is not ordered by session_id (see the export query at the top of eval_stream.py)")
+            prev = sid
+            row["start_ms"] = int(row["start_ms"])
+            row["end_ms"] = int(row["end_ms"])
+            yield row
+
+
+def sessions(segments: Iterator[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    for _, group in groupby(segments, key=lambda r: r["session_id"]):
+        yield sorted(group, key=lambda r: (r["start_ms"], r["end_ms"]))
+
+
+# ----------------------------
+# References
+# ----------------------------
+def load_references(path: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """session_id -> {"trial", "reference", "language", "tier"}"""
+    refs = {}
+    if path is None:
+        from supabase import create_client
+
+        client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_ROLE_KEY"])
+        rows = client.table("sessions").select("id, client_label").in_("client_label", list(et.TRIALS)).execute().data
+        items = [{"session_id": r["id"], "trial": r["client_label"]} for r in rows or []]
+    else:
+        with open(path, encoding="utf-8") as f:
+            items = [json.loads(line) for line in f if line.strip()]
+
+    for item in items:
+        trial = item.get("trial")
+        if "reference" not in item:
+            if trial not in et.TRIALS:
+                raise SystemExit(f"Unknown trial {trial!r} for session {item['session_id']}")
+            t = et.TRIALS[trial]
+            item = {"language": t.get("language"), "tier": t.get("tier"), "reference": t["reference"], **item}
+        refs[item["session_id"]] = {
+            "trial": trial or item["session_id"],
+            "reference": item["reference"],
+            "language": item.get("language"),
+            "tier": item.get("tier"),
+        }
+    return refs
+
+
+# ----------------------------
+# Hypotheses
+# ----------------------------
+def session_transcript(segs: List[Dict[str, Any]]) -> str:
+    # Same string /api/end-session returns (rebuild_session_transcript in sql/schema.sql)
+    return " ".join(f"[{s['language_code']}] {s.get('asr_text') or ''}" for s in segs)
+
+
+def tagged_hypothesis(segs: List[Dict[str, Any]]) -> str:
+    # One "[EN] ..." line per segment: the layout evaluate_trials.parse_tagged_lines
+    # expects, with the same text and order as session_transcript()
+    return "\n".join(f"[{s['language_code'].upper()}] {s.get('asr_text') or ''}" for s in segs)
+
+
+def fingerprint(reference: str, hypothesis: str) -> str:
+    h = hashlib.sha256()
+    for part in (SCORER_VERSION, reference, hypothesis):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+# ----------------------------
+# Score cache
+# ----------------------------
+_SCHEMA = """
+create table if not exists session_scores (
+    session_id text primary key,
+    fingerprint text not null,
+    scores text not null,
+    scored_at timestamp not null default current_timestamp
+);
+"""
+
+
+class ScoreCache:
+    def __init__(self, db_path: str = CACHE_PATH):
+        self._conn = sqlite3.connect(db_path, isolation_level=None)
+        if db_path != ":memory:":
+            self._conn.execute("pragma journal_mode=wal")
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, session_id: str, fp: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "select scores from session_scores where session_id = ? and fingerprint = ?", (session_id, fp)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_many(self, items: List[tuple]):
+        # items: (session_id, fingerprint, scores)
+        self._conn.execute("begin")
+        self._conn.executemany(
+            "insert or replace into session_scores (session_id, fingerprint, scores) values (?, ?, ?)",
+            [(sid, fp, json.dumps(scores)) for sid, fp, scores in items],
+        )
+        self._conn.execute("commit")
+
+    def close(self):
+        self._conn.close()
+
+
+# ----------------------------
+# Driver
+# ----------------------------
+def evaluate_sessions(
+    segments: Iterator[Dict[str, Any]],
+    references: Dict[str, Dict[str, Any]],
+    out_path: str,
+    cache: ScoreCache,
+    batch_size: int = 64,
+) -> Dict[str, int]:
+    counts = {"sessions": 0, "scored": 0, "cached": 0, "no_reference": 0, "incomplete": 0}
+    writer = eval_engine.ResultWriter(out_path)
+
+    pending = []  # (fingerprint, trial, cached scores or None), in session order
+
+    def drain():
+        todo = [t for _, t, scores in pending if scores is None]
+        fresh = iter(eval_engine.score_batch([eval_engine._stringify(t) for t in todo]))
+        rows, new = [], []
+        for fp, t, scores in pending:
+            if scores is None:
+                row = next(fresh)
+                new.append((t["session_id"], fp, {k: row[k] for k in eval_engine.METRIC_COLUMNS}))
+            else:
+                row = {k: v for k, v in eval_engine._stringify(t).items() if k not in ("reference", "hypothesis")}
+                row.update(scores)
+            rows.append(row)
+        if new:
+            cache.put_many(new)
+        writer.write(rows)
+        counts["scored"] += len(new)
+        counts["cached"] += len(pending) - len(new)
+        pending.clear()
+
+    try:
+        for segs in sessions(segments):
+            counts["sessions"] += 1
+            sid = str(segs[0]["session_id"])
+            ref = references.get(sid)
+            if ref is None:
+                counts["no_reference"] += 1
+                continue
+            if any(s.get("status", "done") == "pending" for s in segs):
+                # Still transcribing; score on a later run
+                counts["incomplete"] += 1
+                continue
+            hypothesis = tagged_hypothesis(segs)
+            fp = fingerprint(ref["reference"], hypothesis)
+            trial = {
+                "session_id": sid,
+                "trial": ref["trial"],
+                "language": ref["language"],
+                "tier": ref["tier"],
+                "segments": len(segs),
+                "reference": ref["reference"],
+                "hypothesis": hypothesis,
+            }
+            pending.append((fp, trial, cache.get(sid, fp)))
+            if len(pending) >= batch_size:
+                drain()
+        if pending:
+            drain()
+    finally:
+        writer.close()
+    return counts
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Score sessions straight from the segments table.")
+    ap.add_argument("--export", help="local segments export (.csv or .jsonl) instead of Supabase")
+    ap.add_argument("--references", help="JSON-lines session references (default: sessions.client_label -> TRIALS)")
+    ap.add_argument("-o", "--output", default="session_scores.csv", help=".csv or .parquet")
+    ap.add_argument("--cache", default=CACHE_PATH, help="SQLite score cache")
+    ap.add_argument("--batch-size", type=int, default=64)
+    args = ap.parse_args()
+
+    if args.export and not args.references:
+        ap.error("--references is required with --export")
+    if et.sacrebleu is None:
+        print("Missing package: sacrebleu (BLEU/chrF); those columns will be NaN", file=sys.stderr)
+
+    references = load_references(args.references)
+    segments = export_segments(args.export) if args.export else supabase_segments()
+    cache = ScoreCache(args.cache)
+    t0 = time.perf_counter()
+    try:
+        counts = evaluate_sessions(segments, references, args.output, cache, args.batch_size)
+    finally:
+        cache.close()
+    elapsed = time.perf_counter() - t0
+    print(
+        f"{counts['sessions']} sessions in {elapsed:.2f}s: {counts['scored']} scored, {counts['cached']} unchanged, "
+        f"{counts['no_reference']} without a reference, {counts['incomplete']} still pending"
+    )
+    print(f"Wrote: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ import math
 from dataclasses import dataclass
 from typing import Dict, Any, Tuple, List
 
+import edit_distance as ed
+
 # ----------------------------
 # Manually hardcoded the Transcripts Directly from our 
 # Supabase database tables here (predictions), along with 
@@ -119,17 +121,12 @@ Alright, I’ll stop here. Just reply when you see this. 谢谢。""",
 # Optional libraries
 # ----------------------------
 # sacrebleu gives solid BLEU and chrF
-# jiwer gives word error rate (WER), good for speech evaluation
+# WER / CER / mixed-script error rate come from edit_distance.py (no dependency)
 try:
     import sacrebleu
 except Exception:
     sacrebleu = None
 
-try:
-    from jiwer import wer as jiwer_wer
-except Exception:
-    jiwer_wer = None
-
 
 # ----------------------------
 # Text normalization
@@ -258,9 +255,15 @@ def chrf_score(ref: str, hyp: str) -> float:
     return sacrebleu.corpus_chrf([hyp], [[ref]]).score / 100.0
 
 def word_error_rate(ref: str, hyp: str) -> float:
-    if jiwer_wer is None:
-        return float("nan")
-    return float(jiwer_wer(ref, hyp))
+    return ed.wer(ref, hyp)
+
+def char_error_rate(ref: str, hyp: str) -> float:
+    # CER, the standard Mandarin metric
+    return ed.cer(ref, hyp)
+
+def mixed_error_rate(ref: str, hyp: str) -> float:
+    # An English word or a CJK character each count as one token
+    return ed.mixed_error_rate(ref, hyp)
 
 
 def score_trial(reference: str, hypothesis: str, trial_key: str) -> Dict[str, Any]:
@@ -280,10 +283,12 @@ def score_trial(reference: str, hypothesis: str, trial_key: str) -> Dict[str, An
         "bleu_mixed": bleu_score(ref_mixed, hyp_mixed),
         "chrf_mixed": chrf_score(ref_mixed, hyp_mixed),
         "wer_mixed": word_error_rate(ref_mixed, hyp_mixed),
+        "mer_mixed": mixed_error_rate(ref_mixed, hyp_mixed),
         # Language-specific views
         "bleu_en_only": bleu_score(ref_en, hyp_en) if ref_en and hyp_en else float("nan"),
         "wer_en_only": word_error_rate(ref_en, hyp_en) if ref_en and hyp_en else float("nan"),
         "chrf_zh_only": chrf_score(ref_zh, hyp_zh) if ref_zh and hyp_zh else float("nan"),
+        "cer_zh_only": char_error_rate(ref_zh, hyp_zh) if ref_zh and hyp_zh else float("nan"),
     }
 
     # Extra for tagged hypotheses
@@ -318,10 +323,6 @@ def main():
         print("Missing package: sacrebleu")
         print("Run: pip install sacrebleu")
         return
-    if jiwer_wer is None:
-        print("Missing package: jiwer (WER)")
-        print("Run: pip install jiwer")
-        print("Continuing without WER...")
 
     results = []
     for k, v in TRIALS.items():
@@ -335,9 +336,11 @@ def main():
         "bleu_mixed",
         "chrf_mixed",
         "wer_mixed",
+        "mer_mixed",
         "bleu_en_only",
         "wer_en_only",
         "chrf_zh_only",
+        "cer_zh_only",
         "overall_label_purity",
         "EN_label_purity",
         "ZH_label_purity",
@@ -353,9 +356,11 @@ def main():
             fmt(r["bleu_mixed"]),
             fmt(r["chrf_mixed"]),
             fmt(r["wer_mixed"]),
+            fmt(r["mer_mixed"]),
             fmt(r["bleu_en_only"]),
             fmt(r["wer_en_only"]),
             fmt(r["chrf_zh_only"]),
+            fmt(r["cer_zh_only"]),
             fmt(r["overall_label_purity"]),
             fmt(r["EN_label_purity"]),
             fmt(r["ZH_label_purity"]),
@@ -375,6 +380,22 @@ def main():
     except Exception as e:
         print("\nCould not write CSV:", e)
 
+    # Optional: token alignments (mixed-script), to see where errors fall
+    # relative to code switches
+    try:
+        with open("trial_alignments.txt", "w", encoding="utf-8") as f:
+            for k, v in TRIALS.items():
+                ops = ed.align(
+                    ed.mixed_tokens(normalize_keep_mixed(v["reference"])),
+                    ed.mixed_tokens(normalize_keep_mixed(v["hypothesis"])),
+                )
+                at_switch, errors = ed.switch_boundary_errors(ops)
+                f.write(f"=== {k}: {errors} errors, {at_switch} at a code switch ===\n")
+                f.write(ed.format_alignment(ops) + "\n\n")
+        print("Wrote: trial_alignments.txt")
+    except Exception as e:
+        print("Could not write alignments:", e)
+
 
 if __name__ == "__main__":
     main()
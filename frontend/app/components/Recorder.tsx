@@ -11,6 +11,7 @@ type Segment = {
   end_ms: number;
   text: string | null;
   audio_path?: string;
+  pending?: boolean;
 };
 
 function pickMimeType() {
@@ -33,6 +34,10 @@ function createRecorder(stream: MediaStream) {
 
 export default function Recorder() {
   const backendBase = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000';
+  // Async mode: upload-chunk returns before transcription finishes and we poll for the text
+  const asyncAsr = process.env.NEXT_PUBLIC_ASYNC_ASR === '1';
+  // Streaming mode: frames go over a WebSocket as they are recorded and partial text comes back
+  const streaming = process.env.NEXT_PUBLIC_STREAMING === '1';
 
   const [sessionId, setSessionId] = useState<string | null>(null);
   const [isRecording, setIsRecording] = useState(false);
@@ -43,6 +48,7 @@ export default function Recorder() {
 
   const mediaStreamRef = useRef<MediaStream | null>(null);
   const recorderRef = useRef<MediaRecorder | null>(null);
+  const wsRef = useRef<WebSocket | null>(null);
 
   const sessionStartPerfRef = useRef<number>(0);
   const segmentStartMsRef = useRef<number>(0);
@@ -56,6 +62,7 @@ export default function Recorder() {
     return () => {
       tryStopRecorder();
       tryStopTracks();
+      wsRef.current?.close();
     };
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
@@ -112,6 +119,108 @@ export default function Recorder() {
     return await res.json();
   }
 
+  async function pollSegment(segmentId: string) {
+    for (let attempt = 0; attempt < 120; attempt++) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      try {
+        const res = await fetch(`${backendBase}/api/segment/${segmentId}`);
+        if (!res.ok) continue;
+        const data = await res.json();
+        if (data.status === 'pending') continue;
+        setSegments((prev) =>
+          prev.map((s) => (s.id === segmentId ? { ...s, text: data.text ?? null, pending: false } : s)),
+        );
+        return;
+      } catch {
+        // keep polling
+      }
+    }
+    setSegments((prev) => prev.map((s) => (s.id === segmentId ? { ...s, pending: false } : s)));
+  }
+
+  function sendFrame(data: Blob) {
+    const ws = wsRef.current;
+    if (streaming && ws && ws.readyState === WebSocket.OPEN) ws.send(data);
+  }
+
+  async function openStream(sid: string, lang: Lang, mimeType: string) {
+    const ws = new WebSocket(`${backendBase.replace(/^http/, 'ws')}/api/stream`);
+    await new Promise<void>((resolve, reject) => {
+      ws.onopen = () => resolve();
+      ws.onerror = () => reject(new Error('stream connection failed'));
+    });
+    ws.onerror = () => setError('stream error');
+    ws.onmessage = (evt) => onStreamMessage(JSON.parse(evt.data));
+    ws.send(
+      JSON.stringify({ type: 'start', session_id: sid, language_code: lang, start_ms: 0, frame_ms: 250, mime_type: mimeType }),
+    );
+    wsRef.current = ws;
+  }
+
+  function onStreamMessage(msg: any) {
+    if (msg.type === 'error') {
+      setError(msg.detail || 'stream error');
+      return;
+    }
+    if (msg.type !== 'partial' && msg.type !== 'final') return;
+
+    setSegments((prev) => {
+      // The live segment is the pending entry with the same start_ms
+      const idx = prev.findIndex((s) => s.start_ms === msg.start_ms && s.pending);
+      const live = idx === -1 ? null : prev[idx];
+      const seg: Segment =
+        msg.type === 'partial'
+          ? {
+              language: msg.language_code,
+              start_ms: msg.start_ms,
+              end_ms: live?.end_ms ?? msg.start_ms,
+              text: [live?.text, msg.text].filter(Boolean).join(' '),
+              pending: true,
+            }
+          : {
+              id: msg.segment_id,
+              language: msg.language_code,
+              start_ms: msg.start_ms,
+              end_ms: msg.end_ms,
+              text: msg.text ?? null,
+              audio_path: msg.audio_path,
+              // A window failed server-side and the segment is being transcribed again
+              pending: msg.status === 'pending',
+            };
+      if (idx === -1) return [...prev, seg];
+      const next = [...prev];
+      next[idx] = seg;
+      return next;
+    });
+    if (msg.type === 'final' && msg.status === 'pending') void pollSegment(msg.segment_id);
+  }
+
+  async function flushStreamSegment(sid: string, rec: MediaRecorder, langForSegment: Lang, restartAfter: boolean) {
+    const start_ms = segmentStartMsRef.current;
+    const end_ms = currentRelativeMs();
+
+    // The recorder's last frames are sent by ondataavailable before 'stop' fires
+    await stopRecorderAndWait(rec);
+    segmentChunksRef.current = [];
+    hasAnyAudioRef.current = false;
+
+    const ws = wsRef.current;
+    if (!ws || ws.readyState !== WebSocket.OPEN) return;
+
+    const control = { session_id: sid, language_code: langForSegment, start_ms, end_ms };
+    if (restartAfter) {
+      const next_language_code: Lang = langForSegment === 'en' ? 'zh' : 'en';
+      ws.send(JSON.stringify({ ...control, type: 'switch', next_language_code }));
+    } else {
+      // The server sends the last final and then closes the socket
+      const closed = new Promise<void>((resolve) => ws.addEventListener('close', () => resolve(), { once: true }));
+      ws.send(JSON.stringify({ ...control, type: 'stop' }));
+      await Promise.race([closed, new Promise((resolve) => setTimeout(resolve, 30000))]);
+      wsRef.current = null;
+    }
+    segmentStartMsRef.current = end_ms;
+  }
+
   async function stopRecorderAndWait(rec: MediaRecorder) {
     if (rec.state === 'inactive') return;
 
@@ -144,6 +253,26 @@ export default function Recorder() {
 
     if (!sid || !rec) return;
 
+    if (streaming) {
+      setStatus('');
+      await flushStreamSegment(sid, rec, langForSegment, restartAfter);
+      if (restartAfter && stream) {
+        const newRec = createRecorder(stream);
+        recorderRef.current = newRec;
+
+        newRec.ondataavailable = (evt) => {
+          if (!evt.data || evt.data.size === 0) return;
+          sendFrame(evt.data);
+        };
+
+        newRec.onerror = () => setError('recorder error');
+        newRec.start(250);
+      } else {
+        recorderRef.current = null;
+      }
+      return;
+    }
+
     const start_ms = segmentStartMsRef.current;
     const end_ms = currentRelativeMs();
 
@@ -173,6 +302,7 @@ export default function Recorder() {
           if (!evt.data || evt.data.size === 0) return;
           hasAnyAudioRef.current = true;
           segmentChunksRef.current.push(evt.data);
+          sendFrame(evt.data);
         };
 
         newRec.onerror = () => setError('recorder error');
@@ -198,6 +328,7 @@ export default function Recorder() {
     try {
       const form = new FormData();
       form.append('metadata_json', JSON.stringify(meta));
+      if (asyncAsr) form.append('async_mode', 'true');
 
       const ext = extFromMime(blobType);
       form.append('file', blob, `segment-${start_ms}-${end_ms}.${ext}`);
@@ -223,8 +354,11 @@ export default function Recorder() {
           end_ms,
           text: data.text ?? null,
           audio_path: data.audio_path,
+          pending: data.status === 'pending',
         },
       ]);
+
+      if (data.status === 'pending') void pollSegment(data.segment_id);
     } catch (e: any) {
       setError(e?.message || 'segment upload failed');
       setSegments((prev) => [
@@ -249,6 +383,7 @@ export default function Recorder() {
         if (!evt.data || evt.data.size === 0) return;
         hasAnyAudioRef.current = true;
         segmentChunksRef.current.push(evt.data);
+        sendFrame(evt.data);
       };
 
       newRec.onerror = () => setError('recorder error');
@@ -284,12 +419,15 @@ export default function Recorder() {
         if (!evt.data || evt.data.size === 0) return;
         hasAnyAudioRef.current = true;
         segmentChunksRef.current.push(evt.data);
+        sendFrame(evt.data);
       };
 
       rec.onerror = () => {
         setError('recorder error');
       };
 
+      if (streaming) await openStream(sid, 'en', rec.mimeType || pickMimeType() || 'audio/webm');
+
       rec.start(250);
       setIsRecording(true);
       setStatus('');
@@ -300,6 +438,8 @@ export default function Recorder() {
       setSessionId(null);
       tryStopRecorder();
       tryStopTracks();
+      wsRef.current?.close();
+      wsRef.current = null;
     }
   }
 
@@ -432,7 +572,7 @@ export default function Recorder() {
                 </span>
                 {s.audio_path ? <code style={{ color: '#666' }}>{s.audio_path}</code> : null}
               </div>
-              <div style={{ marginTop: 6, whiteSpace: 'pre-wrap' }}>{s.text ?? '(no transcript returned)'}</div>
+              <div style={{ marginTop: 6, whiteSpace: 'pre-wrap' }}>{s.text ?? (s.pending ? '(transcribing...)' : '(no transcript returned)')}</div>
             </div>
           ))}
           {segments.length === 0 ? <div style={{ color: '#666' }}>No segments yet.</div> : null}
@@ -22,18 +22,267 @@ start_ms int not null, -- client-side elapsed ms when chunk started
 end_ms int not null, -- client-side elapsed ms when chunk ended
 asr_text text, -- transcription result
 confidence numeric, -- optional if your ASR returns it
-audio_path text not null -- Supabase storage path to raw chunk
+audio_path text not null, -- Supabase storage path to raw chunk
+status text not null default 'done', -- 'pending' while an async-mode transcription is queued, then 'done' or 'failed'
+idempotency_key text -- client Idempotency-Key, or 'session_id:start_ms:end_ms' when none was sent
 );
 
 
--- Simple view to aggregate transcript per session by time
+-- Existing deployments: add columns introduced after the initial schema
+alter table segments add column if not exists status text not null default 'done';
+alter table segments add column if not exists idempotency_key text;
+
+
+-- Databases from before the index below can hold duplicate rows for one time
+-- range (retried uploads recorded twice); keep the earliest of each so the
+-- index can be built. A no-op once the index exists
+delete from segments s
+using (
+select id, row_number() over (partition by session_id, start_ms, end_ms order by created_at, id) as n
+from segments
+) d
+where s.id = d.id and d.n > 1;
+
+-- A chunk is recorded once per session time range; retried uploads upsert
+-- against this index and get the original row back
+create unique index if not exists segments_session_range_key
+on segments (session_id, start_ms, end_ms);
+
+-- Idempotency keys are client-generated, so they are only unique per session
+drop index if exists segments_idempotency_key;
+create unique index if not exists segments_session_idempotency_key
+on segments (session_id, idempotency_key)
+where idempotency_key is not null;
+
+-- Per-session reads (rebuild_session_transcript, the session_transcripts view,
+-- /api/session/{id}/segments pages) filter on session_id and order by
+-- start_ms: segments_session_range_key already serves them as its
+-- (session_id, start_ms) prefix, so no separate index is needed.
+
+-- Time-range analytics (created_at between ...). Rows arrive in created_at
+-- order, so a BRIN index covers millions of rows in a few pages
+create index if not exists segments_created_at_brin
+on segments using brin (created_at);
+
+
+-- Per-session transcript, maintained incrementally as segments arrive so
+-- /api/end-session reads one row instead of aggregating the whole session
+create table if not exists session_transcript_state (
+session_id uuid primary key references sessions(id) on delete cascade,
+transcript text not null default '',
+last_start_ms int not null default -1, -- start_ms of the latest segment appended
+segment_count int not null default 0,
+stale boolean not null default false, -- set on out-of-order inserts, edits and deletes; cleared by rebuild
+updated_at timestamptz not null default now()
+);
+
+
+-- In-order inserts append to the transcript; anything else marks it stale
+create or replace function append_segment_to_transcript() returns trigger
+language plpgsql as $$
+declare
+piece text := '[' || new.language_code || '] ' || coalesce(new.asr_text, '');
+begin
+insert into session_transcript_state (session_id, transcript, last_start_ms, segment_count)
+values (new.session_id, piece, new.start_ms, 1)
+on conflict (session_id) do update set
+transcript = case
+when session_transcript_state.stale or new.start_ms < session_transcript_state.last_start_ms
+then session_transcript_state.transcript
+else session_transcript_state.transcript || ' ' || piece
+end,
+stale = session_transcript_state.stale or new.start_ms < session_transcript_state.last_start_ms,
+last_start_ms = greatest(session_transcript_state.last_start_ms, new.start_ms),
+segment_count = session_transcript_state.segment_count + 1,
+updated_at = now();
+return new;
+end $$;
+
+create or replace function mark_session_transcript_stale() returns trigger
+language plpgsql as $$
+declare
+sid uuid;
+begin
+if tg_op = 'DELETE' then
+sid := old.session_id;
+else
+sid := new.session_id;
+end if;
+update session_transcript_state
+set stale = true, updated_at = now()
+where session_id = sid;
+return null;
+end $$;
+
+drop trigger if exists segments_append_transcript on segments;
+create trigger segments_append_transcript
+after insert on segments
+for each row execute function append_segment_to_transcript();
+
+drop trigger if exists segments_stale_transcript on segments;
+create trigger segments_stale_transcript
+after update of asr_text, language_code, start_ms or delete on segments
+for each row execute function mark_session_transcript_stale();
+
+
+-- Rebuild a stale transcript from the segments it needs (language, text, order)
+create or replace function rebuild_session_transcript(sid uuid) returns text
+language plpgsql as $$
+declare
+result text;
+begin
+-- Wait for in-flight appends so the aggregate below sees their rows
+perform 1 from session_transcript_state where session_id = sid for update;
+
+insert into session_transcript_state (session_id, transcript, last_start_ms, segment_count, stale, updated_at)
+select sid,
+coalesce(string_agg('[' || seg.language_code || '] ' || coalesce(seg.asr_text, ''), ' ' order by seg.start_ms), ''),
+coalesce(max(seg.start_ms), -1),
+count(*),
+false,
+now()
+from segments seg
+where seg.session_id = sid
+on conflict (session_id) do update set
+transcript = excluded.transcript,
+last_start_ms = excluded.last_start_ms,
+segment_count = excluded.segment_count,
+stale = false,
+updated_at = excluded.updated_at
+returning transcript into result;
+return result;
+end $$;
+
+
+-- Sessions recorded before session_transcript_state existed have no row, or
+-- only a row for the segments appended since: mark them stale so their
+-- first read rebuilds the full transcript. Idempotent
+insert into session_transcript_state (session_id, last_start_ms, segment_count, stale)
+select session_id, max(start_ms), count(*), true
+from segments
+group by session_id
+on conflict (session_id) do update set stale = true, updated_at = now()
+where session_transcript_state.segment_count <> excluded.segment_count;
+
+
+-- Transcript per session, served from the incremental state when it is fresh
 create or replace view session_transcripts as
 select s.id as session_id,
-string_agg(
-'[' || seg.language_code || '] ' || coalesce(seg.asr_text, ''),
-' ',
-order by seg.start_ms
-) as transcript
+case
+when t.stale then (
+select string_agg('[' || seg.language_code || '] ' || coalesce(seg.asr_text, ''), ' ' order by seg.start_ms)
+from segments seg
+where seg.session_id = s.id
+)
+else t.transcript
+end as transcript
 from sessions s
-left join segments seg on seg.session_id = s.id
-group by s.id;
\ No newline at end of file
+left join session_transcript_state t on t.session_id = s.id;
+
+
+-- Content-addressed audio (backend STORAGE_LAYOUT=cas): objects are named by
+-- the SHA-256 of their bytes (cas/ab/cd/<hash>.<ext>) and shared by every
+-- segment with the same audio. refcount is the number of segments whose
+-- audio_path points at the object; objects nobody has referenced for the
+-- backend's CAS_GC_GRACE_S are removed by its cleanup job.
+create table if not exists audio_objects (
+path text primary key,
+size_bytes bigint not null,
+refcount int not null default 0,
+unreferenced_since timestamptz default now(), -- null while refcount > 0
+deleting_since timestamptz, -- set while the cleanup job removes the object from storage
+created_at timestamptz not null default now()
+);
+
+alter table audio_objects add column if not exists deleting_since timestamptz;
+
+create index if not exists audio_objects_unreferenced
+on audio_objects (unreferenced_since)
+where refcount = 0;
+
+
+-- Called before uploading an object. True when the caller must upload it:
+-- the object is new, or no segment references it yet (an earlier upload may
+-- have failed, or it is waiting for cleanup, whose grace period restarts).
+-- Null while the cleanup job is removing the object: an upload now would be
+-- deleted with it, so the caller retries once forget_audio_objects has run
+create or replace function claim_audio_object(p text, size bigint) returns boolean
+language sql as $$
+insert into audio_objects (path, size_bytes) values (p, size)
+on conflict (path) do update set
+unreferenced_since = case when audio_objects.refcount = 0 then now() else audio_objects.unreferenced_since end
+where audio_objects.deleting_since is null
+returning refcount = 0;
+$$;
+
+-- Segment inserts, audio_path updates and deletes (including session deletes,
+-- via the cascade) move the counts; paths outside audio_objects are ignored
+create or replace function count_audio_object_refs() returns trigger
+language plpgsql as $$
+begin
+if tg_op in ('UPDATE', 'DELETE') then
+update audio_objects set
+refcount = refcount - 1,
+unreferenced_since = case when refcount = 1 then now() else unreferenced_since end
+where path = old.audio_path;
+end if;
+if tg_op in ('INSERT', 'UPDATE') then
+update audio_objects set refcount = refcount + 1, unreferenced_since = null
+where path = new.audio_path;
+end if;
+return null;
+end $$;
+
+drop trigger if exists segments_audio_object_refs on segments;
+create trigger segments_audio_object_refs
+after insert or update of audio_path or delete on segments
+for each row execute function count_audio_object_refs();
+
+-- Cleanup is two steps, so an object whose storage remove fails keeps its
+-- row and is collected again:
+--   collect_audio_objects  marks up to max_objects objects unreferenced for
+--                          longer than grace_s as being deleted (claims wait
+--                          on them) and returns their paths; the caller
+--                          removes them from storage
+--   forget_audio_objects   then drops those rows and returns the paths it
+--                          skipped: objects a segment referenced while they
+--                          were being removed, whose bytes are now gone
+--   release_audio_objects  instead unmarks them when the remove failed, so
+--                          claims go ahead and the next pass tries again
+-- Rows left marked for 10 minutes (a pass that died between the steps) are
+-- collected again.
+drop function if exists forget_audio_objects(text[], int);
+
+create or replace function collect_audio_objects(grace_s int, max_objects int) returns setof text
+language sql as $$
+update audio_objects set deleting_since = now()
+where path in (
+select path from audio_objects
+where refcount = 0
+and (
+(deleting_since is null and unreferenced_since < now() - make_interval(secs => grace_s))
+or deleting_since < now() - interval '10 minutes'
+)
+order by unreferenced_since
+limit max_objects
+for update skip locked
+)
+returning path;
+$$;
+
+create or replace function forget_audio_objects(paths text[]) returns setof text
+language plpgsql as $$
+begin
+delete from audio_objects
+where path = any(paths) and deleting_since is not null and refcount = 0;
+-- Anything left was referenced mid-removal: unmark it and report it
+return query
+update audio_objects set deleting_since = null
+where path = any(paths)
+returning path;
+end $$;
+
+create or replace function release_audio_objects(paths text[]) returns void
+language sql as $$
+update audio_objects set deleting_since = null where path = any(paths);
+$$;